@@ -0,0 +1,130 @@
+import numpy as np
+from ortools.sat.python import cp_model
+from trabajos import ProgresoSolver, resolver_con_progreso
+
+# Número de clases que deben cambiar entre dos alternativas, como fracción de las
+# clases del mejor horario (si no se indica una distancia fija)
+FRACCION_DISTANCIA = 0.05
+
+# Peor objetivo aceptado para una alternativa, como fracción del mejor encontrado
+TOLERANCIA = 0.05
+
+# Tiempo de cada búsqueda de alternativas, como fracción del de la primera resolución
+# (sin bajar de TIEMPO_MINIMO segundos): es un tope, las búsquedas con pista suelen
+# terminar antes; si se agota se usa la mejor encontrada
+FRACCION_TIEMPO = 2.0
+TIEMPO_MINIMO = 1.0
+
+
+# Callback que además de reportar el avance guarda las variables activas de cada solución
+# Así las soluciones intermedias de una misma búsqueda también sirven de alternativas.
+class ColectorSoluciones(ProgresoSolver):
+    def __init__(self, progreso, indices):
+        ProgresoSolver.__init__(self, progreso)
+        self.indices = indices
+        self.encontradas = []
+
+    def on_solution_callback(self):
+        ProgresoSolver.on_solution_callback(self)
+        valores = np.asarray(self.Response().solution, dtype=np.int64)[self.indices]
+        self.encontradas.append((self.ObjectiveValue(), np.flatnonzero(valores > 0)))
+
+
+# Función para saber si una solución cambia al menos `distancia` clases de cada elegida
+# Es el mismo criterio que imponen los no-goods: de las clases de cada elegida tienen
+# que desaparecer al menos `distancia`.
+def _distinta(clases, elegidas, distancia):
+    return all(len(e) - np.intersect1d(clases, e).size >= distancia for e in elegidas)
+
+
+# Función para leer del objetivo del modelo el valor de cada clase (el mayor
+# coeficiente entre sus variables, en el sentido de maximizar)
+def valor_clases(model, indices, claves, clases):
+    objetivo = model.Proto().objective
+    peso = np.zeros(int(indices.max()) + 1)
+    variables = np.asarray(objetivo.vars, dtype=np.int64)
+    coeficientes = np.asarray(objetivo.coeffs, dtype=float) * (objetivo.scaling_factor or 1)
+    dentro = variables < len(peso)
+    peso[variables[dentro]] = coeficientes[dentro]
+    orden = np.argsort(claves, kind='stable')
+    unicas, inicios = np.unique(claves[orden], return_index=True)
+    maximos = np.maximum.reduceat(peso[indices][orden], inicios)
+    return maximos[np.searchsorted(unicas, clases)]
+
+
+# Función para agregar el no-good de una alternativa elegida
+# Con hamming=True se exige que al menos `distancia` de sus clases desaparezcan: es
+# el no-good exacto, pero una suma sobre todas sus variables debilita la cota y en
+# instancias grandes cada alternativa tarda mucho más que la primera resolución.
+# Por defecto se prohíben sus `distancia` clases de menor valor (desempates al azar):
+# solo fija variables en 0, el modelo sigue siendo igual de fácil y la pista de la
+# alternativa anterior casi completa sigue siendo válida.
+def agregar_no_good(model, indices, claves, clases, distancia, hamming=False, rng=None):
+    if hamming:
+        prohibidas, limite = clases, len(clases) - distancia
+    else:
+        rng = rng or np.random.default_rng()
+        orden = rng.permutation(len(clases))
+        valor = valor_clases(model, indices, claves, clases)[orden]
+        prohibidas, limite = clases[orden[np.argsort(valor, kind='stable')[:distancia]]], 0
+    variables = [model.GetBoolVarFromProtoIndex(int(i)) for i in indices[np.isin(claves, prohibidas)]]
+    model.Add(cp_model.LinearExpr.Sum(variables) <= limite)
+
+
+# Función para encontrar hasta k horarios distintos y casi óptimos con un mismo modelo
+# 1. Se resuelve una vez; el callback guarda todas las soluciones que encuentra.
+# 2. De ellas se eligen las que están dentro de la tolerancia y a la distancia pedida.
+# 3. Mientras falten, se agrega un no-good por cada elegida nueva y se vuelve a
+#    resolver el mismo modelo, con la última alternativa como pista (hint) y con un
+#    tiempo límite proporcional al de la primera resolución.
+# `indices` son los índices en el proto de las variables de decisión y `claves` la
+# clase que representa cada una: la distancia se mide en clases, de modo que dos
+# horarios que solo permutan salones equivalentes no cuentan como alternativas (por
+# defecto cada variable es su propia clase). Devuelve (estado de la primera
+# resolución, lista de (objetivo, posiciones activas en `indices`)). `parametros` son
+# parámetros del CpSolver (nombre -> valor).
+def buscar_alternativas(model, indices, k, progreso, claves=None, distancia=None, tolerancia=TOLERANCIA,
+                        tiempo_por_alternativa=None, hamming=False, semilla=None, parametros=None):
+    claves = np.arange(len(indices)) if claves is None else np.asarray(claves)
+    rng = np.random.default_rng(semilla)
+    solver = cp_model.CpSolver()
+    for nombre, valor in (parametros or {}).items():
+        setattr(solver.parameters, nombre, valor)
+    if semilla is not None:
+        solver.parameters.random_seed = semilla
+    colector = ColectorSoluciones(progreso, indices)
+    status = resolver_con_progreso(solver, model, progreso, colector)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return status, []
+
+    mejor, activas = colector.encontradas[-1]
+    elegidas = [(mejor, activas)]
+    clases = [np.unique(claves[activas])]
+    piso = mejor - tolerancia * abs(mejor)
+    distancia = distancia or max(1, int(np.ceil(FRACCION_DISTANCIA * len(clases[0]))))
+    solver.parameters.max_time_in_seconds = tiempo_por_alternativa or max(TIEMPO_MINIMO, FRACCION_TIEMPO * solver.WallTime())
+    agregadas = 0
+
+    while len(elegidas) < k:
+        for objetivo, candidata in sorted(colector.encontradas, key=lambda s: -s[0]):
+            clases_candidata = np.unique(claves[candidata])
+            if len(elegidas) < k and objetivo >= piso and _distinta(clases_candidata, clases, distancia):
+                elegidas.append((objetivo, candidata))
+                clases.append(clases_candidata)
+        if len(elegidas) >= k:
+            break
+
+        for e in clases[agregadas:]:
+            agregar_no_good(model, indices, claves, e, distancia, hamming, rng)
+        agregadas = len(clases)
+        model.ClearHints()
+        for i in indices[elegidas[-1][1]]:
+            model.AddHint(model.GetBoolVarFromProtoIndex(int(i)), True)
+
+        progreso.reportar(etapa=f"buscando alternativa {len(elegidas) + 1} de {k}")
+        colector = ColectorSoluciones(progreso, indices)
+        estado = resolver_con_progreso(solver, model, progreso, colector)
+        if estado not in (cp_model.OPTIMAL, cp_model.FEASIBLE) or colector.encontradas[-1][0] < piso:
+            break
+
+    return status, elegidas
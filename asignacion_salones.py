@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ortools.graph.python import min_cost_flow
+
+# Por debajo de este número de franjas no compensa levantar procesos
+MIN_FRANJAS_PARALELO = 64
+
+# Función para asignar salones a las clases de una sola franja (dia, hora_inicio)
+# Se resuelve como flujo máximo de costo mínimo:
+#   fuente -> profesor (cap 1) -> clase -> salón (cap 1) -> sumidero
+# El costo de cada arco clase -> salón es la capacidad desperdiciada.
+# Devuelve el índice del salón asignado a cada clase, o -1 si quedó sin salón.
+def asignar_franja(profesores, alumnos, capacidades):
+    n_clases = len(alumnos)
+    asignacion = np.full(n_clases, -1, dtype=np.int64)
+
+    clase_idx, salon_idx = np.nonzero(capacidades[None, :] >= alumnos[:, None])
+    if len(clase_idx) == 0:
+        return asignacion
+
+    _, profesor_idx = np.unique(profesores, return_inverse=True)
+    n_profesores = profesor_idx.max() + 1
+    n_salones = len(capacidades)
+
+    fuente = 0
+    base_profesor = 1
+    base_clase = base_profesor + n_profesores
+    base_salon = base_clase + n_clases
+    sumidero = base_salon + n_salones
+
+    smcf = min_cost_flow.SimpleMinCostFlow()
+    smcf.add_arcs_with_capacity_and_unit_cost(
+        np.zeros(n_profesores, dtype=np.int32),
+        base_profesor + np.arange(n_profesores, dtype=np.int32),
+        np.ones(n_profesores, dtype=np.int64),
+        np.zeros(n_profesores, dtype=np.int64))
+    smcf.add_arcs_with_capacity_and_unit_cost(
+        (base_profesor + profesor_idx).astype(np.int32),
+        base_clase + np.arange(n_clases, dtype=np.int32),
+        np.ones(n_clases, dtype=np.int64),
+        np.zeros(n_clases, dtype=np.int64))
+    arcos = smcf.add_arcs_with_capacity_and_unit_cost(
+        (base_clase + clase_idx).astype(np.int32),
+        (base_salon + salon_idx).astype(np.int32),
+        np.ones(len(clase_idx), dtype=np.int64),
+        (capacidades[salon_idx] - alumnos[clase_idx]).astype(np.int64))
+    smcf.add_arcs_with_capacity_and_unit_cost(
+        base_salon + np.arange(n_salones, dtype=np.int32),
+        np.full(n_salones, sumidero, dtype=np.int32),
+        np.ones(n_salones, dtype=np.int64),
+        np.zeros(n_salones, dtype=np.int64))
+    smcf.set_node_supply(fuente, n_clases)
+    smcf.set_node_supply(sumidero, -n_clases)
+
+    if smcf.solve_max_flow_with_min_cost() != smcf.OPTIMAL:
+        return asignacion
+
+    usados = smcf.flows(arcos) > 0
+    asignacion[clase_idx[usados]] = salon_idx[usados]
+    return asignacion
+
+
+def _asignar_lote(lote, capacidades):
+    return [asignar_franja(profesores, alumnos, capacidades) for profesores, alumnos in lote]
+
+
+# Función para asignar salones a todo el horario, franja por franja
+# Las franjas son independientes entre sí, así que se resuelven en paralelo.
+# Devuelve un arreglo con el índice posicional del salón de cada fila (-1 sin salón).
+def asignar_salones(horario_df, df_materias, df_salones, max_workers=None):
+    alumnos_por_materia = df_materias.drop_duplicates('nombre').set_index('nombre')['alumnos']
+    alumnos = horario_df['materia'].map(alumnos_por_materia).fillna(np.inf).to_numpy(dtype=np.float64)
+    profesores = horario_df['profesor'].to_numpy()
+    capacidades = df_salones['capacidad_alumnos'].to_numpy(dtype=np.float64)
+
+    franjas = list(horario_df.groupby(['dia', 'hora_inicio'], sort=False).indices.values())
+    tareas = [(profesores[filas], alumnos[filas]) for filas in franjas]
+
+    if len(tareas) < MIN_FRANJAS_PARALELO or max_workers == 1:
+        resultados = _asignar_lote(tareas, capacidades)
+    else:
+        n_lotes = (max_workers or os.cpu_count() or 1) * 4
+        lotes = [tareas[i::n_lotes] for i in range(n_lotes)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            por_lote = list(executor.map(_asignar_lote, lotes, [capacidades] * n_lotes))
+        resultados = [None] * len(tareas)
+        for i, parcial in enumerate(por_lote):
+            resultados[i::n_lotes] = parcial
+
+    asignacion = np.full(len(horario_df), -1, dtype=np.int64)
+    for filas, resultado in zip(franjas, resultados):
+        asignacion[filas] = resultado
+    return asignacion
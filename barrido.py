@@ -0,0 +1,193 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ingesta import cargar_tablas
+from modelo_datos import Instancia
+from horario_generator import (entrenar_modelo, experiencia_por_par, disponibilidad_por_franja, generate_schedule,
+                               horario_desde_individuo, puntaje_y_conflictos)
+from datelive import generar_horario
+from validacion import validar_horario
+
+# Colecciones que forman una instancia, en el orden que esperan los generadores
+ENDPOINTS = ('profesores', 'materias', 'salones', 'horarios_disponibles', 'profesor_materia')
+
+# Valores por defecto de cada parámetro ajustable, por motor
+ESPACIOS = {
+    'ga': {
+        'cxpb': [0.5, 0.7, 0.9],
+        'mutpb': [0.1, 0.2, 0.3],
+        'ngen': [50],
+        'penalizacion': [5, 10, 20],
+    },
+    'datelive': {
+        'min_alumnos': [15, 25, 35],
+        'peso_clase': [1, 5],
+        'peso_experiencia': [0, 1, 2],
+        'peso_calificacion': [0, 1, 2],
+    },
+}
+
+# Datos compartidos por todos los escenarios de un proceso de trabajo
+_DATOS = {}
+
+# Parámetros del CpSolver durante un barrido: un hilo por escenario, ya que los
+# escenarios corren en paralelo (un proceso por núcleo)
+PARAMETROS_SOLVER_BARRIDO = {'num_workers': 1}
+
+
+# Función para generar todos los escenarios de una grilla, repetidos por semilla
+def escenarios_grilla(espacio, semillas):
+    nombres = list(espacio)
+    return [dict(zip(nombres, valores), semilla=semilla)
+            for valores in itertools.product(*(espacio[n] for n in nombres))
+            for semilla in semillas]
+
+
+# Función para sortear `n` combinaciones del espacio, repetidas por semilla
+def escenarios_aleatorios(espacio, n, semillas, semilla=0):
+    rng = random.Random(semilla)
+    total = 1
+    for valores in espacio.values():
+        total *= len(valores)
+    combinaciones = set()
+    while len(combinaciones) < min(n, total):
+        combinaciones.add(tuple(rng.choice(valores) for valores in espacio.values()))
+    return [dict(zip(espacio, valores), semilla=s) for valores in sorted(combinaciones) for s in semillas]
+
+
+# Función que corre una vez por proceso: prepara la instancia compartida
+# Las tablas viajan una sola vez a cada proceso y cada escenario solo recibe sus parámetros.
+def _inicializar(motor, tablas):
+    _DATOS['tablas'] = tablas
+    instancia = Instancia.desde_json(*tablas)
+    _DATOS['instancia'] = instancia
+    if motor == 'ga':
+        _DATOS['model'] = entrenar_modelo(instancia)
+        _DATOS['experiencia'] = experiencia_por_par(instancia)
+        _DATOS['disponibilidad'] = disponibilidad_por_franja(instancia)
+
+
+# Función para contar las violaciones de un horario con validar_horario (choques,
+# capacidad, habilitación y disponibilidad), igual para todos los motores
+def contar_conflictos(horario_df, instancia):
+    if horario_df is None or len(horario_df) == 0:
+        return 0
+    return len(validar_horario(horario_df, instancia))
+
+
+# Función para medir un horario de datelive sin depender de los pesos del objetivo
+# Clases programadas más la suma, sin ponderar, de experiencia y calificación de cada
+# clase (del mejor registro profesor-materia del par, el que elegiría el modelo).
+def calidad_horario(horario_df, instancia):
+    if horario_df is None or len(horario_df) == 0:
+        return 0.0
+    pares = (instancia.pm_profesor.astype(np.int64) * instancia.n_materias + instancia.pm_materia).astype(np.int64)
+    puntos = pd.Series(instancia.pm_experiencia + instancia.pm_calificacion).groupby(pares).max()
+    clases = (instancia.codigos_profesor(horario_df['profesor_id'].to_numpy()).astype(np.int64) * instancia.n_materias +
+              instancia.codigos_materia(horario_df['materia_id'].to_numpy()))
+    return float(len(horario_df) + puntos.reindex(clases).fillna(0).sum())
+
+
+# Función para ejecutar un escenario y resumirlo en una fila de la tabla
+# `calidad` se compara entre configuraciones; para datelive `objetivo` es el valor
+# ponderado que optimizó el modelo, que solo se compara con los mismos pesos.
+def _ejecutar_escenario(motor, parametros):
+    inicio = time.perf_counter()
+    if motor == 'ga':
+        best = generate_schedule(_DATOS['instancia'], _DATOS['model'], verbose=False, **parametros)
+        puntaje, _ = puntaje_y_conflictos(best, _DATOS['instancia'], _DATOS['model'], _DATOS['experiencia'],
+                                          _DATOS['disponibilidad'])
+        fila = {'estado': 'OK', 'calidad': float(puntaje), 'fitness': best.fitness.values[0],
+                'conflictos': contar_conflictos(horario_desde_individuo(best, _DATOS['instancia']), _DATOS['instancia']),
+                'clases': len(best)}
+    else:
+        result = generar_horario(*_DATOS['tablas'], guardar=False, parametros_solver=PARAMETROS_SOLVER_BARRIDO, **parametros)
+        horario = result.get('horario')
+        fila = {'estado': result['status'], 'calidad': calidad_horario(horario, _DATOS['instancia']),
+                'objetivo': result.get('objetivo'),
+                'conflictos': contar_conflictos(horario, _DATOS['instancia']), 'clases': 0 if horario is None else len(horario)}
+    fila['duracion'] = time.perf_counter() - inicio
+    return dict(parametros, **fila)
+
+
+# Función para correr los escenarios en paralelo y devolver una fila por escenario
+def ejecutar_barrido(motor, tablas, escenarios, max_workers=None):
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=_inicializar, initargs=(motor, tablas)) as executor:
+        filas = list(executor.map(_ejecutar_escenario, itertools.repeat(motor), escenarios))
+    return pd.DataFrame(filas)
+
+
+# Función para comparar configuraciones: promedia las semillas de cada combinación
+# Ordena primero por menos conflictos y luego por mayor calidad.
+def comparar(resultados):
+    parametros = [c for c in resultados.columns
+                  if c not in ('semilla', 'estado', 'calidad', 'objetivo', 'fitness', 'conflictos', 'clases', 'duracion')]
+    tabla = resultados.groupby(parametros, dropna=False).agg(
+        calidad=('calidad', 'mean'),
+        calidad_std=('calidad', 'std'),
+        conflictos=('conflictos', 'mean'),
+        clases=('clases', 'mean'),
+        duracion=('duracion', 'mean'),
+        semillas=('semilla', 'count'),
+    ).reset_index()
+    return tabla.sort_values(['conflictos', 'calidad'], ascending=[True, False]).reset_index(drop=True)
+
+
+# Función para leer las tablas de un snapshot de datos.py o de la API
+def cargar_datos(snapshot=None):
+    if snapshot:
+        with open(snapshot, encoding='utf-8') as archivo:
+            dataset = json.load(archivo)
+        return tuple(dataset[endpoint] for endpoint in ENDPOINTS)
+    return cargar_tablas()
+
+
+# Función para leer '--param nombre=v1,v2,...' como lista de valores
+def leer_parametro(texto):
+    nombre, valores = texto.split('=', 1)
+    return nombre, [json.loads(valor) for valor in valores.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Barrido de parámetros y semillas de los generadores de horarios')
+    parser.add_argument('--motor', choices=sorted(ESPACIOS), default='ga')
+    parser.add_argument('--snapshot', default=None, help='Archivo JSON de datos.py; si no se indica, se usa la API')
+    parser.add_argument('--param', action='append', default=[], help='Valores de un parámetro: nombre=v1,v2,...')
+    parser.add_argument('--aleatorio', type=int, default=None, help='Número de combinaciones al azar (por defecto, toda la grilla)')
+    parser.add_argument('--semillas', type=int, nargs='+', default=[42])
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--salida', default=None, help='Archivo .csv o .parquet con todos los escenarios')
+    args = parser.parse_args()
+
+    espacio = dict(ESPACIOS[args.motor])
+    espacio.update(leer_parametro(texto) for texto in args.param)
+    if args.aleatorio:
+        escenarios = escenarios_aleatorios(espacio, args.aleatorio, args.semillas)
+    else:
+        escenarios = escenarios_grilla(espacio, args.semillas)
+
+    tablas = cargar_datos(args.snapshot)
+    if any(tabla is None for tabla in tablas):
+        print('No se pudieron cargar los datos')
+        return
+
+    print(f'{len(escenarios)} escenarios de {args.motor}')
+    resultados = ejecutar_barrido(args.motor, tablas, escenarios, args.procesos)
+    print(comparar(resultados).to_string(index=False))
+
+    if args.salida:
+        if args.salida.endswith('.csv'):
+            resultados.to_csv(args.salida, index=False)
+        else:
+            resultados.to_parquet(args.salida, index=False)
+        print(f'Resultados guardados en {args.salida}')
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,25 @@
+import io
 import streamlit as st
 import pandas as pd
 import numpy as np
 from ortools.sat.python import cp_model
 import requests
-from faker import Faker
-
-# Inicializar Faker
-fake = Faker()
+from modelo_datos import Instancia
+from persistencia import asignar_grupos, guardar_horario
+from sesion import huella_datos
+from modelos_cp import clave_modelo, modelo_en_cache, agregar_exclusividad
+from planificacion import contar_modelo_cp, rechazar_modelo_cp
+from trabajos import Progreso, enviar_trabajo, seguir_trabajo
+from alternativas import buscar_alternativas
+from diagnostico import diagnosticar_instancia, hay_errores, mensajes
+from extraccion import horario_desde_codigos, horario_a_json, exportar_horario
+from vistas import mostrar_vista_horario
 
 # URL base para las solicitudes a la API
 BASE_URL = "http://localhost:8000/api"
 
 # Función para obtener los datos desde la API
+@st.cache_data
 def get_data(endpoint):
     try:
         response = requests.get(f"{BASE_URL}/{endpoint}")
@@ -23,6 +31,11 @@ def get_data(endpoint):
 
 
 min_alumnos = 25
+
+# Parámetros del CpSolver. Los salones compartidos entre profesores hacen que el
+# presolve de CP-SAT tarde mucho más que la búsqueda (28 s de 33 s con 200 salones
+# y 4000 horarios, contra 7.5 s en total sin presolve, con el mismo óptimo).
+PARAMETROS_SOLVER = {'cp_model_presolve': False}
 # Función para enviar los datos a la API
 def post_data(endpoint, data):
     try:
@@ -33,10 +46,6 @@ def post_data(endpoint, data):
         st.error(f"Error al enviar datos a {endpoint}: {str(e)}")
         return None
 
-# Función para generar un acrónimo único para el grupo
-def generar_acronimo():
-    return fake.unique.bothify(text='??##', letters='ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-
 # Función para preprocesar los datos
 def preprocesar_datos(profesores, materias, salones, horarios_disponibles, profesor_materia):
     df_profesores = pd.DataFrame(profesores)
@@ -47,125 +56,134 @@ def preprocesar_datos(profesores, materias, salones, horarios_disponibles, profe
     
     return df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia
 
-# Función para generar el horario y hacer el POST a la API
-def generar_horario(profesores, materias, salones, horarios_disponibles, profesor_materia):
-    df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia = preprocesar_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
-    
-    st.write("Datos preprocesados:")
-    st.write(f"Profesores: {len(df_profesores)}")
-    st.write(f"Materias: {len(df_materias)}")
-    st.write(f"Salones: {len(df_salones)}")
-    st.write(f"Horarios disponibles: {len(df_horarios_disponibles)}")
-    st.write(f"Relaciones profesor-materia: {len(df_profesor_materia)}")
-    
+# Función para construir el modelo CP-SAT del horario
+# Devuelve el modelo y los arreglos que relacionan cada variable (su índice en el
+# proto) con sus códigos (horario i, salón j, profesor-materia k), o None si no hay variables.
+def construir_modelo(instancia, min_alumnos, peso_clase, peso_experiencia, peso_calificacion):
     model = cp_model.CpModel()
     
-    # Variables
-    clases = {}
-    for i, horario in df_horarios_disponibles.iterrows():
-        for j, salon in df_salones.iterrows():
-            for k, prof_mat in df_profesor_materia.iterrows():
-                clave = (i, j, k)
-                clases[clave] = model.NewBoolVar(f'clase_h{i}_s{j}_pm{k}')
+    # Variables: solo las combinaciones (horario i, salón j, profesor-materia k) que pueden valer 1.
+    # 3. Respetar la disponibilidad de los profesores -> el profesor de k es el del horario i
+    # 4. No exceder la capacidad del salón -> alumnos de la materia de k <= capacidad de j
+    # 7. No crear clase si no hay suficientes alumnos -> alumnos de la materia de k >= min_alumnos
+    # Cualquier otra combinación queda fija en 0, así que no se crea.
+    horario_par, pm_par = instancia.pares_disponibilidad()
+    alumnos_par = instancia.materia_alumnos[instancia.pm_materia[pm_par]]
+    par_idx, salon_idx = np.nonzero((instancia.salon_capacidad[None, :] >= alumnos_par[:, None]) & (alumnos_par[:, None] >= min_alumnos))
+    horario_idx = horario_par[par_idx]
+    pm_idx = pm_par[par_idx]
     
-    st.write(f"Variables creadas: {len(clases)}")
+    if len(par_idx) == 0:
+        return None
+    
+    variables = [model.NewBoolVar(f'clase_h{i}_s{j}_pm{k}') for i, j, k in zip(horario_idx.tolist(), salon_idx.tolist(), pm_idx.tolist())]
+    indices = np.array([variable.Index() for variable in variables], dtype=np.int64)
     
     # Restricciones para la generacion de la clase
-    restricciones_aplicadas = 0
     # 1. Un profesor no puede dar más de una clase al mismo tiempo
-    for i, horario in df_horarios_disponibles.iterrows():
-        for profesor_id in df_profesores['id']:
-            model.Add(sum(clases[(i, j, k)] 
-                          for j in df_salones.index 
-                          for k in df_profesor_materia[df_profesor_materia['profesor_id'] == profesor_id].index) <= 1)
-            restricciones_aplicadas += 1
-
     # 2. Un salón no puede tener más de una clase al mismo tiempo
-    for i, horario in df_horarios_disponibles.iterrows():
-        for j in df_salones.index:
-            model.Add(sum(clases[(i, j, k)] for k in df_profesor_materia.index) <= 1)
-            restricciones_aplicadas += 1
+    # Ambas por ventanas de horarios que se cruzan (ver agregar_exclusividad).
+    agregar_exclusividad(model, variables, instancia, horario_idx, salon_idx)
 
-    # 3. Respetar la disponibilidad de los profesores
-    for i, horario in df_horarios_disponibles.iterrows():
-        for k, prof_mat in df_profesor_materia.iterrows():
-            if prof_mat['profesor_id'] != horario['profesor_id']:
-                for j in df_salones.index:
-                    model.Add(clases[(i, j, k)] == 0)
-                    restricciones_aplicadas += 1
-    
-    # 4. No exceder la capacidad del salón
-    for j, salon in df_salones.iterrows():
-        for i in df_horarios_disponibles.index:
-            model.Add(sum(clases[(i, j, k)] * df_materias.loc[df_profesor_materia.loc[k, 'materia_id'], 'alumnos']
-                          for k in df_profesor_materia.index) <= salon['capacidad_alumnos'])
+    # 6. Función objetivo: maximizar clases asignadas y puntaje de profesores (experiencia y calificación)
+    puntaje = np.rint(peso_clase + peso_experiencia * instancia.pm_experiencia[pm_idx] +
+                      peso_calificacion * instancia.pm_calificacion[pm_idx]).astype(np.int64)
+    model.Maximize(sum(variable * int(p) for variable, p in zip(variables, puntaje)))
+    
+    return model, {'indices': indices, 'horario_idx': horario_idx, 'salon_idx': salon_idx, 'pm_idx': pm_idx}
 
-    # 5. Priorizar profesores con mayor experiencia y calificación
-    for k, prof_mat in df_profesor_materia.iterrows():
-        score = prof_mat['experiencia'] + prof_mat['calificacion_alumno']
-        for i in df_horarios_disponibles.index:
-            for j in df_salones.index:
-                model.Add(clases[(i, j, k)] * score >= 0)  # Esto aumentará el valor de la función objetivo para profesores con mayor puntaje
-    
-    # 6. Función objetivo: maximizar clases asignadas y puntaje de profesores
-    model.Maximize(sum(clases.values()) + 
-                   sum(clases[(i, j, k)] * (df_profesor_materia.loc[k, 'experiencia'] + df_profesor_materia.loc[k, 'calificacion_alumno'])
-                       for i in df_horarios_disponibles.index
-                       for j in df_salones.index
-                       for k in df_profesor_materia.index))
-    
-    # 7. Nueva restricción: No crear clase si no hay suficientes alumnos
-    for i in df_horarios_disponibles.index:
-        for j in df_salones.index:
-            for k, prof_mat in df_profesor_materia.iterrows():
-                materia_id = prof_mat['materia_id']
-                alumnos = df_materias.loc[materia_id, 'alumnos']
-                model.Add(clases[(i, j, k)] == 0).OnlyEnforceIf(model.NewBoolVar(f'not_enough_students_{i}_{j}_{k}'))
-                model.Add(alumnos >= min_alumnos).OnlyEnforceIf(clases[(i, j, k)])
-    
-    # Resolver el modelo
-    solver = cp_model.CpSolver()
-    st.write("Resolviendo el modelo...")
-    status = solver.Solve(model)
-    
-    st.write(f"Estado de la solución: {solver.StatusName(status)}")
+# Función para generar el horario y hacer el POST a la API
+# Corre como trabajo en segundo plano: no usa Streamlit y reporta el avance en `progreso`.
+# min_alumnos, los pesos del objetivo y la semilla se pueden ajustar con barrido.py;
+# con guardar=False no se escribe en la API. Con alternativas > 1 se devuelven además
+# hasta ese número de horarios distintos y casi óptimos (se guarda solo el mejor).
+# parametros_solver se agregan a PARAMETROS_SOLVER.
+def generar_horario(profesores, materias, salones, horarios_disponibles, profesor_materia, progreso=None,
+                    min_alumnos=min_alumnos, peso_clase=1, peso_experiencia=1, peso_calificacion=1,
+                    semilla=None, guardar=True, alternativas=1, parametros_solver=None):
+    progreso = progreso or Progreso()
+    df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia = preprocesar_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
+    
+    instancia = Instancia(df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia)
+    
     result = {
-        "status": solver.StatusName(status),
+        "status": None,
+        "datos": {
+            "profesores": len(df_profesores),
+            "materias": len(df_materias),
+            "salones": len(df_salones),
+            "horarios_disponibles": len(df_horarios_disponibles),
+            "profesor_materia": len(df_profesor_materia),
+        },
         "horario_generado": [],
         "warnings": [],
         "errors": []
     }
     
+    # Diagnóstico previo en tiempo lineal: datos imposibles fallan antes de construir el modelo
+    problemas = diagnosticar_instancia(instancia, min_alumnos=min_alumnos)
+    result["warnings"].extend(mensajes([p for p in problemas if p['severidad'] != 'error']))
+    if hay_errores(problemas):
+        result["status"] = "INFEASIBLE"
+        result["errors"].extend(mensajes([p for p in problemas if p['severidad'] == 'error']))
+        return result
+    
+    # Tamaño del modelo antes de crearlo: un modelo desbocado se rechaza sin asignar memoria
+    variables, restricciones, _ = contar_modelo_cp(instancia, min_alumnos)
+    rechazo = rechazar_modelo_cp(variables, restricciones)
+    if rechazo:
+        result["status"] = "RECHAZADO"
+        result["errors"].append(rechazo)
+        return result
+    
+    # El modelo construido se guarda en disco: con los mismos datos y opciones se carga directamente
+    clave = clave_modelo('datelive', huella_datos(df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia),
+                         min_alumnos=min_alumnos, peso_clase=peso_clase, peso_experiencia=peso_experiencia,
+                         peso_calificacion=peso_calificacion)
+    model, arreglos, en_cache = modelo_en_cache(clave, lambda: construir_modelo(instancia, min_alumnos, peso_clase, peso_experiencia, peso_calificacion))
+    
+    if model is None:
+        result["status"] = "INFEASIBLE"
+        result["errors"].append("Ninguna combinación de horario, salón y profesor-materia cumple disponibilidad, capacidad y mínimo de alumnos")
+        return result
+    
+    indices, horario_idx, salon_idx, pm_idx = (arreglos[n] for n in ('indices', 'horario_idx', 'salon_idx', 'pm_idx'))
+    result["variables"] = len(indices)
+    result["modelo_en_cache"] = en_cache
+    progreso.reportar(etapa=f"modelo con {len(indices)} variables" + (" (en caché)" if en_cache else ""))
+    
+    # Resolver el modelo (y, si se piden, las alternativas sobre el mismo modelo)
+    # Una clase es el par (horario, profesor-materia): cambiar solo de salón no es otra alternativa
+    claves = horario_idx.astype(np.int64) * len(instancia.pm_profesor) + pm_idx
+    status, elegidas = buscar_alternativas(model, indices, alternativas, progreso, claves, semilla=semilla,
+                                           parametros=dict(PARAMETROS_SOLVER, **(parametros_solver or {})))
+    
+    result["status"] = status.name
+    
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        for i, horario in df_horarios_disponibles.iterrows():
-            for j, salon in df_salones.iterrows():
-                for k, prof_mat in df_profesor_materia.iterrows():
-                    if solver.BooleanValue(clases[(i, j, k)]):
-                        try:
-                            materia = df_materias.loc[df_materias['id'] == prof_mat['materia_id']].iloc[0]
-                            profesor = df_profesores.loc[df_profesores['id'] == prof_mat['profesor_id']].iloc[0]
-                            
-                            if materia['alumnos'] >= min_alumnos:
-                                clase_data = {
-                                    'grupo': generar_acronimo(),
-                                    'dia_semana': horario['dia'],
-                                    'hora_inicio': str(horario['hora_inicio']),
-                                    'hora_fin': str(horario['hora_fin']),
-                                    'alumnos': int(materia['alumnos']),
-                                    'materia_id': int(materia['id']),
-                                    'salon_id': int(salon['id']),
-                                    'profesor_id': int(profesor['id'])
-                                }
-                                result["horario_generado"].append(clase_data)
-                                
-                                # Enviar la clase generada a la API
-                                post_data('clases', clase_data)
-                            else:
-                                result["son muy pocos alumnos, no se sube"].append(f"La materia {materia['nombre']} no tiene suficientes alumnos ({materia['alumnos']}) para crear una clase.")
-                        except IndexError:
-                            result["errors"].append(f"Error al acceder a los datos de materia o profesor para la combinación: materia_id={prof_mat['materia_id']}, profesor_id={prof_mat['profesor_id']}")
-                        except Exception as e:
-                            result["errors"].append(f"Error inesperado al procesar una clase: {str(e)}")
+        horarios = [asignar_grupos(horario_desde_codigos(instancia, horario_idx[a], salon_idx[a], pm_idx[a]))
+                    for _, a in elegidas]
+        horario = horarios[0]
+        result["objetivo"] = elegidas[0][0]
+        result["horario"] = horario
+        result["horario_generado"] = horario_a_json(horario)
+        if alternativas > 1:
+            mejor = claves[elegidas[0][1]]
+            result["alternativas"] = [{'objetivo': objetivo, 'clases': len(a),
+                                       'cambios': len(mejor) - np.intersect1d(claves[a], mejor).size, 'horario': h}
+                                      for (objetivo, a), h in zip(elegidas, horarios)]
+            if len(elegidas) < alternativas:
+                result["warnings"].append(f"Solo se encontraron {len(elegidas)} de {alternativas} alternativas dentro de la tolerancia")
+        
+        # Guardar en la API solo lo que cambió respecto al horario persistido
+        if guardar:
+            progreso.reportar(etapa="guardando horario")
+            resumen = guardar_horario(horario, instancia)
+            if resumen is None:
+                result["errors"].append("No se pudo leer el horario persistido; no se guardaron cambios")
+            else:
+                result["errors"].extend(resumen.pop('errores'))
+                result["persistencia"] = resumen
         
         if not result["horario_generado"]:
             result["warnings"].append("No se pudo generar ninguna clase que cumpla con todas las restricciones.")
@@ -201,13 +219,37 @@ def main():
     if all([profesores, materias, salones, horarios_disponibles, profesor_materia]):
         st.success("Todos los datos se cargaron correctamente")
         
+        # El resultado queda en la sesión: descargar o interactuar no vuelve a resolver
+        alternativas = int(st.number_input('Horarios alternativos', min_value=1, max_value=10, value=1))
+        huella = huella_datos(profesores, materias, salones, horarios_disponibles, profesor_materia, alternativas)
+        # La generación corre como trabajo en segundo plano; la página sigue su progreso
         if st.button('Generar Horario para los profesores'):
-            with st.spinner('Generando horario...'):
-                horario_df = generar_horario(profesores, materias, salones, horarios_disponibles, profesor_materia)
-            
+            enviar_trabajo('datelive', huella, profesores, materias, salones, horarios_disponibles, profesor_materia,
+                           alternativas=alternativas)
+        
+        entrada = seguir_trabajo('datelive', huella)
+        if entrada is not None:
+            horario_df = entrada['resultado']
             if horario_df is not None:
-                st.success('Horario generado con éxito')
-                st.write(horario_df)
+                st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+                horario = horario_df.get('horario')
+                st.write({k: v for k, v in horario_df.items() if k not in ('horario', 'alternativas')})
+                opciones = horario_df.get('alternativas')
+                if opciones:
+                    st.dataframe(pd.DataFrame(opciones).drop(columns='horario').rename_axis('alternativa'))
+                    elegida = st.selectbox('Ver alternativa', range(len(opciones)),
+                                           format_func=lambda i: f"{i}: objetivo {opciones[i]['objetivo']:.0f}, {opciones[i]['cambios']} cambios")
+                    horario = opciones[elegida]['horario']
+                    if elegida > 0 and st.button('Guardar esta alternativa en la API'):
+                        instancia = Instancia.desde_json(profesores, materias, salones, horarios_disponibles, profesor_materia)
+                        resumen = guardar_horario(horario, instancia)
+                        if resumen is not None:
+                            for error in resumen['errores']:
+                                st.error(error)
+                            st.success(f"Clases insertadas: {resumen['insertadas']}, actualizadas: {resumen['actualizadas']}, eliminadas: {resumen['eliminadas']}")
+                if horario is not None:
+                    mostrar_vista_horario(horario, profesores, materias, salones, clave='datelive')
+                    st.download_button('Descargar horario (Parquet)', exportar_horario(horario, io.BytesIO()).getvalue(), file_name='horario.parquet')
             else:
                 st.error('No fue posible generar el horario')
     else:
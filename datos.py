@@ -1,140 +1,207 @@
+import argparse
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from faker import Faker
 from datetime import datetime, timedelta
 
-# Crear una instancia de Faker
-fake = Faker('es_ES')
-
 # URL de tu API
 base_url = 'http://localhost:8000/api'
 
+# Semilla fija para que el conjunto de datos sea reproducible
+SEMILLA = 42
+
+# Número máximo de peticiones simultáneas contra la API
+CONCURRENCIA = 16
+
 # Horarios permitidos (bloques de dos consecutivos)
-horarios_inicio = ["06:00","6:45", "07:30", "08:15","09:00","9:45", "10:30","11:15", "12:00","12:45", "13:30","14:15", "15:00","15:45","16:30", "17:15", "18:30", "20:15"]
+horarios_inicio = ["06:00", "06:45", "07:30", "08:15", "09:00", "09:45", "10:30", "11:15", "12:00", "12:45", "13:30", "14:15", "15:00", "15:45", "16:30", "17:15", "18:30", "20:15"]
+
+# Máximo de materias que puede tener asignadas un profesor
+MAX_MATERIAS_POR_PROFESOR = 3
 
 # Crear profesores
-def crear_profesores(num):
-    profesores_ids = []
-    for _ in range(num):
-        data = {
+def crear_profesores(fake, num):
+    profesores = []
+    for i in range(num):
+        profesores.append({
+            'id': i + 1,
             'tipo_cedula': fake.random_element(elements=('Cédula de Ciudadanía', 'Cédula de Extrangería','Targeta de Identidad','Registro Civil','Pasaporte')),
             'cedula': fake.unique.random_number(digits=10),
             'nombre': fake.name(),
             'tipo_contrato': fake.random_element(elements=('Cátedra', 'Planta', 'Tiempo Completo')),
             'estado': fake.random_element(elements=('Activo', 'Inactivo', 'En proceso')),
             'image_path': fake.image_url(),
-        }
-        response = requests.post(f'{base_url}/profesores', json=data)
-        if response.status_code == 201:
-            profesores_ids.append(response.json()['id'])
-        print(f'Profesor creado: {response.status_code}')
-    return profesores_ids
+        })
+    return profesores
 
 # Crear materias
-def crear_materias(num):
-    materias_ids = []
-    for _ in range(num):
-        data = {
+def crear_materias(fake, num):
+    materias = []
+    for i in range(num):
+        materias.append({
+            'id': i + 1,
             'codigo': fake.word(),
             'nombre': fake.word(),
             'alumnos': fake.random_int(min=10, max=45),
             'bloques': fake.random_int(min=1, max=3),
-        }
-        response = requests.post(f'{base_url}/materias', json=data)
-        if response.status_code == 201:
-            materias_ids.append(response.json()['id'])
-        else:
-            print(f"Error al crear materia: {response.status_code}")
-    return materias_ids
+        })
+    return materias
 
 # Crear salones
-def crear_salones(num):
-    salones_ids = []
-    for _ in range(num):
-        data = {
+def crear_salones(fake, num):
+    salones = []
+    for i in range(num):
+        salones.append({
+            'id': i + 1,
             'codigo': fake.word(),
             'capacidad_alumnos': fake.random_int(min=20, max=100),
             'tipo': fake.random_element(elements=('Teórico', 'Laboratorio')),
-        }
-        response = requests.post(f'{base_url}/salones', json=data)
-        if response.status_code == 201:
-            salones_ids.append(response.json()['id'])
-        print(f'Salón creado: {response.status_code}')
-    return salones_ids
+        })
+    return salones
 
-# Crear horarios disponibles con bloques consecutivos
-def crear_horarios_disponibles(profesor_ids, max_bloques_por_profesor):
+# Crear horarios disponibles con bloques consecutivos (dos bloques de 45 minutos el mismo día)
+def crear_horarios_disponibles(fake, profesor_ids, max_bloques_por_profesor):
+    horarios = []
     for profesor_id in profesor_ids:
-        bloques_creados = 0
-        while bloques_creados < max_bloques_por_profesor:
+        for _ in range(max_bloques_por_profesor):
+            dia = fake.day_of_week()
             hora_inicio = fake.random_element(horarios_inicio)
             hora_fin = (datetime.strptime(hora_inicio, "%H:%M") + timedelta(minutes=45)).strftime("%H:%M")
             hora_inicio_bloque2 = hora_fin
             hora_fin_bloque2 = (datetime.strptime(hora_inicio_bloque2, "%H:%M") + timedelta(minutes=45)).strftime("%H:%M")
 
-            # Crear primer bloque
-            data1 = {
-                'dia': fake.day_of_week(),
-                'hora_inicio': hora_inicio,
-                'hora_fin': hora_fin,
-                'profesor_id': profesor_id,
-            }
-            response1 = requests.post(f'{base_url}/horarios_disponibles', json=data1)
-            print(f'Horario disponible creado: {response1.status_code} - {hora_inicio} a {hora_fin}')
-
-            # Crear segundo bloque
-            data2 = {
-                'dia': fake.day_of_week(),
-                'hora_inicio': hora_inicio_bloque2,
-                'hora_fin': hora_fin_bloque2,
-                'profesor_id': profesor_id,
-            }
-            response2 = requests.post(f'{base_url}/horarios_disponibles', json=data2)
-            print(f'Horario disponible creado: {response2.status_code} - {hora_inicio_bloque2} a {hora_fin_bloque2}')
-
-            bloques_creados += 1
+            horarios.append({'dia': dia, 'hora_inicio': hora_inicio, 'hora_fin': hora_fin, 'profesor_id': profesor_id})
+            horarios.append({'dia': dia, 'hora_inicio': hora_inicio_bloque2, 'hora_fin': hora_fin_bloque2, 'profesor_id': profesor_id})
+    return horarios
 
 # Crear profesor_materia asegurando que cada profesor tenga un máximo de 3 materias
-def crear_profesor_materia(profesor_ids, materia_ids, num):
+def crear_profesor_materia(fake, profesor_ids, materia_ids, num):
     if not materia_ids:
         print("No se crearon materias, abortando asignación de profesor a materia.")
-        return
-    
-    # Diccionario para controlar cuántas materias tiene asignadas cada profesor
-    materias_por_profesor = {profesor_id: 0 for profesor_id in profesor_ids}
+        return []
+
+    # Diccionario para controlar qué materias tiene asignadas cada profesor
+    materias_por_profesor = {profesor_id: set() for profesor_id in profesor_ids}
+    profesor_materia = []
 
     for _ in range(num):
         profesor_id = fake.random_element(profesor_ids)
-        
-        # Verificar si el profesor ya tiene asignadas 3 materias
-        if materias_por_profesor[profesor_id] >= 3:
-            continue  # Saltar a la siguiente iteración si ya tiene 3 materias
-        
-        # Asignar una materia
         materia_id = fake.random_element(materia_ids)
-        data = {
+
+        # Saltar si el profesor ya tiene 3 materias o ya tiene esta materia
+        asignadas = materias_por_profesor[profesor_id]
+        if len(asignadas) >= MAX_MATERIAS_POR_PROFESOR or materia_id in asignadas:
+            continue
+
+        asignadas.add(materia_id)
+        profesor_materia.append({
             'profesor_id': profesor_id,
             'materia_id': materia_id,
             'experiencia': fake.random_int(min=1, max=10),
             'calificacion_alumno': fake.random_int(min=1, max=5),
-        }
-        response = requests.post(f'{base_url}/profesor_materia', json=data)
-        
+        })
+    return profesor_materia
+
+# Generar el conjunto de datos completo con ids locales (1..n)
+def generar_dataset(num_materias, num_profesores, num_salones, num_horarios_por_profesor, num_profesor_materia, semilla=SEMILLA):
+    fake = Faker('es_ES')
+    fake.seed_instance(semilla)
+
+    materias = crear_materias(fake, num_materias)
+    profesores = crear_profesores(fake, num_profesores)
+    salones = crear_salones(fake, num_salones)
+    profesor_ids = [profesor['id'] for profesor in profesores]
+    materia_ids = [materia['id'] for materia in materias]
+
+    return {
+        'materias': materias,
+        'profesores': profesores,
+        'salones': salones,
+        'horarios_disponibles': crear_horarios_disponibles(fake, profesor_ids, num_horarios_por_profesor),
+        'profesor_materia': crear_profesor_materia(fake, profesor_ids, materia_ids, num_profesor_materia),
+    }
+
+# Guardar el conjunto de datos en un archivo JSON en lugar de enviarlo a la API
+def guardar_snapshot(dataset, ruta):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(dataset, archivo, ensure_ascii=False)
+
+# Crear una sesión HTTP con un pool de conexiones del tamaño de la concurrencia
+def crear_sesion(concurrencia):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrencia, pool_maxsize=concurrencia)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# Enviar los registros de un endpoint en paralelo (como máximo `concurrencia` a la vez)
+# Devuelve la lista de ids asignados por la API (None en las que fallaron).
+def publicar_registros(session, executor, endpoint, registros):
+    def publicar(data):
+        try:
+            response = session.post(f'{base_url}/{endpoint}', json=data)
+        except requests.RequestException:
+            return None
         if response.status_code == 201:
-            materias_por_profesor[profesor_id] += 1  # Incrementar el conteo de materias para ese profesor
-            print(f'Profesor-Materia creada: {response.status_code} para el profesor {profesor_id}')
-        else:
-            print(f'Error al crear Profesor-Materia: {response.status_code}')
-
-# Generar datos
-num_materias = 100
-num_profesores = 100
-num_salones = 100
-num_horarios_por_profesor = 2  # Máximo 3 bloques de 2 consecutivos
-num_profesor_materia = min(num_profesores * 3, num_materias)
-
-# Llamar a las funciones para generar los datos
-materias_ids = crear_materias(num_materias)
-profesores_ids = crear_profesores(num_profesores)
-salones_ids = crear_salones(num_salones)
-crear_horarios_disponibles(profesores_ids, num_horarios_por_profesor)
-crear_profesor_materia(profesores_ids, materias_ids, num_profesor_materia)
+            return response.json().get('id')
+        return None
+
+    ids = list(executor.map(publicar, registros))
+    errores = sum(1 for id_api in ids if id_api is None)
+    print(f'{endpoint}: {len(ids) - errores} creados, {errores} errores')
+    return ids
+
+# Enviar el conjunto de datos a la API, traduciendo los ids locales a los de la API
+def publicar_dataset(dataset, concurrencia=CONCURRENCIA):
+    session = crear_sesion(concurrencia)
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        mapas = {}
+        for endpoint in ('materias', 'profesores', 'salones'):
+            registros = dataset[endpoint]
+            cuerpos = [{k: v for k, v in registro.items() if k != 'id'} for registro in registros]
+            ids = publicar_registros(session, executor, endpoint, cuerpos)
+            mapas[endpoint] = {registro['id']: id_api for registro, id_api in zip(registros, ids) if id_api is not None}
+
+        horarios = [
+            dict(horario, profesor_id=mapas['profesores'][horario['profesor_id']])
+            for horario in dataset['horarios_disponibles']
+            if horario['profesor_id'] in mapas['profesores']
+        ]
+        publicar_registros(session, executor, 'horarios_disponibles', horarios)
+
+        profesor_materia = [
+            dict(pm, profesor_id=mapas['profesores'][pm['profesor_id']], materia_id=mapas['materias'][pm['materia_id']])
+            for pm in dataset['profesor_materia']
+            if pm['profesor_id'] in mapas['profesores'] and pm['materia_id'] in mapas['materias']
+        ]
+        publicar_registros(session, executor, 'profesor_materia', profesor_materia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar datos de prueba para el generador de horarios')
+    parser.add_argument('--materias', type=int, default=100)
+    parser.add_argument('--profesores', type=int, default=100)
+    parser.add_argument('--salones', type=int, default=100)
+    parser.add_argument('--horarios-por-profesor', type=int, default=2, help='Bloques de 2 consecutivos por profesor (máximo 3)')
+    parser.add_argument('--profesor-materia', type=int, default=None, help='Intentos de asignación profesor-materia')
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA)
+    parser.add_argument('--snapshot', default=None, help='Ruta de un archivo JSON; si se indica, no se usa la API')
+    args = parser.parse_args()
+
+    num_profesor_materia = args.profesor_materia
+    if num_profesor_materia is None:
+        num_profesor_materia = min(args.profesores * MAX_MATERIAS_POR_PROFESOR, args.materias)
+
+    dataset = generar_dataset(args.materias, args.profesores, args.salones, args.horarios_por_profesor, num_profesor_materia, args.semilla)
+
+    if args.snapshot:
+        guardar_snapshot(dataset, args.snapshot)
+        print(f'Snapshot guardado en {args.snapshot}')
+    else:
+        publicar_dataset(dataset, args.concurrencia)
+
+if __name__ == '__main__':
+    main()
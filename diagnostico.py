@@ -0,0 +1,185 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+# Máximo de elementos que se listan en cada problema
+MAX_ELEMENTOS = 10
+
+
+# Función para registrar un problema encontrado en el diagnóstico
+def problema(severidad, tipo, mensaje, elementos=()):
+    elementos = [e.item() if hasattr(e, 'item') else e for e in elementos]
+    return {'severidad': severidad, 'tipo': tipo, 'mensaje': mensaje, 'elementos': elementos[:MAX_ELEMENTOS]}
+
+
+# Función para saber si algún problema impide resolver
+def hay_errores(problemas):
+    return any(p['severidad'] == 'error' for p in problemas)
+
+
+# Función para convertir los problemas a mensajes legibles
+def mensajes(problemas):
+    salida = []
+    for p in problemas:
+        detalle = f" (p. ej.: {', '.join(map(str, p['elementos']))})" if p['elementos'] else ''
+        salida.append(f"{p['mensaje']}{detalle}")
+    return salida
+
+
+# Función para detectar en tiempo lineal datos que hacen imposible (o inútil) el horario
+# Con requiere_todas=True (todas las materias deben dictarse) los problemas que
+# dejan materias sin poder programarse son errores; si no, son advertencias.
+def diagnosticar_instancia(instancia, min_alumnos=0, requiere_todas=False):
+    problemas = []
+    severidad = 'error' if requiere_todas else 'advertencia'
+    nombres = instancia.materia_nombres
+
+    if instancia.n_salones == 0:
+        return [problema('error', 'salones', 'No hay salones registrados')]
+    if len(instancia.disp_profesor) == 0:
+        return [problema('error', 'disponibilidad', 'Ningún profesor tiene horarios disponibles')]
+    if len(instancia.pm_profesor) == 0:
+        return [problema('error', 'profesor_materia', 'No hay relaciones profesor-materia registradas')]
+
+    # Materias que no caben en ningún salón
+    capacidad_maxima = int(instancia.salon_capacidad.max())
+    grandes = np.flatnonzero(instancia.materia_alumnos > capacidad_maxima)
+    if len(grandes):
+        problemas.append(problema(severidad, 'capacidad',
+                                  f"{len(grandes)} materias tienen más alumnos que el salón más grande ({capacidad_maxima})",
+                                  nombres[grandes]))
+
+    # Materias por debajo del mínimo de alumnos
+    pequenas = np.flatnonzero(instancia.materia_alumnos < min_alumnos)
+    if len(pequenas):
+        problemas.append(problema(severidad, 'min_alumnos',
+                                  f"{len(pequenas)} materias tienen menos de {min_alumnos} alumnos",
+                                  nombres[pequenas]))
+
+    # Materias sin ningún profesor habilitado
+    profesores_por_materia = np.bincount(instancia.pm_materia, minlength=instancia.n_materias)
+    sin_profesor = np.flatnonzero(profesores_por_materia == 0)
+    if len(sin_profesor):
+        problemas.append(problema(severidad, 'sin_profesor',
+                                  f"{len(sin_profesor)} materias no tienen profesor en profesor_materia",
+                                  nombres[sin_profesor]))
+
+    # Profesores con materias asignadas pero sin disponibilidad
+    disponibilidad = np.bincount(instancia.disp_profesor, minlength=instancia.n_profesores)
+    con_materias = np.bincount(instancia.pm_profesor, minlength=instancia.n_profesores) > 0
+    sin_disponibilidad = np.flatnonzero(con_materias & (disponibilidad == 0))
+    if len(sin_disponibilidad):
+        problemas.append(problema('advertencia', 'sin_disponibilidad',
+                                  f"{len(sin_disponibilidad)} profesores con materias no tienen horarios disponibles",
+                                  instancia.profesor_ids[sin_disponibilidad]))
+
+    # Materias cuyos profesores habilitados no tienen ningún horario
+    materias_con_horario = np.zeros(instancia.n_materias, dtype=bool)
+    materias_con_horario[instancia.pm_materia[disponibilidad[instancia.pm_profesor] > 0]] = True
+    sin_horario = np.flatnonzero(~materias_con_horario & (profesores_por_materia > 0))
+    if len(sin_horario):
+        problemas.append(problema(severidad, 'sin_horario',
+                                  f"{len(sin_horario)} materias solo tienen profesores sin disponibilidad",
+                                  nombres[sin_horario]))
+
+    # Demanda semanal frente a la oferta de horarios de profesores habilitados
+    oferta = int(disponibilidad[con_materias].sum())
+    demanda = instancia.n_materias
+    if requiere_todas and demanda > oferta:
+        problemas.append(problema('error', 'oferta',
+                                  f"Se necesitan al menos {demanda} clases pero solo hay {oferta} horarios de profesores habilitados"))
+
+    return problemas
+
+
+# Función para diagnosticar la asignación de salones sobre un horario ya fijado (godness)
+def diagnosticar_asignacion(horario_df, df_materias, df_salones):
+    problemas = []
+    if len(df_salones) == 0:
+        return [problema('error', 'salones', 'No hay salones registrados')]
+
+    capacidad_maxima = df_salones['capacidad_alumnos'].max()
+    grandes = df_materias.loc[df_materias['alumnos'] > capacidad_maxima, 'nombre']
+    if len(grandes):
+        problemas.append(problema('error', 'capacidad',
+                                  f"{len(grandes)} materias tienen más alumnos que el salón más grande ({capacidad_maxima})",
+                                  grandes.tolist()))
+
+    ausentes = sorted(set(df_materias['nombre']) - set(horario_df['materia']))
+    if ausentes:
+        problemas.append(problema('error', 'sin_clases',
+                                  f"{len(ausentes)} materias no aparecen en ninguna clase del horario",
+                                  ausentes))
+
+    return problemas
+
+
+# Agrupa restricciones del modelo bajo literales de suposición (assumptions)
+# Cada grupo se activa con model.Add(...).OnlyEnforceIf(grupos.literal('nombre')).
+class GruposRestricciones:
+    def __init__(self, model):
+        self.model = model
+        self.literales = {}
+        self.nombres = {}
+
+    def literal(self, nombre):
+        if nombre not in self.literales:
+            literal = self.model.NewBoolVar(f'grupo_{nombre}')
+            self.literales[nombre] = literal
+            self.nombres[literal.Index()] = nombre
+        return self.literales[nombre]
+
+    # Reconstruye los grupos de un modelo leído de disco a partir de los índices de sus literales
+    @classmethod
+    def restaurar(cls, model, nombres, indices):
+        grupos = cls(model)
+        for nombre, indice in zip(nombres, indices):
+            literal = model.GetBoolVarFromProtoIndex(int(indice))
+            grupos.literales[str(nombre)] = literal
+            grupos.nombres[int(indice)] = str(nombre)
+        return grupos
+
+    # Índices de los literales de cada grupo, para guardarlos junto al modelo
+    def arreglos(self):
+        return {'grupo_nombres': np.array(list(self.literales), dtype=str),
+                'grupo_indices': np.array([l.Index() for l in self.literales.values()], dtype=np.int64)}
+
+    def activar(self, nombres=None):
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions([self.literales[n] for n in (self.literales if nombres is None else nombres)])
+
+
+# Función para encontrar un grupo mínimo de restricciones en conflicto
+# Primero se pide a CP-SAT un conjunto suficiente de suposiciones y luego se
+# reduce solo ese núcleo quitando grupos uno a uno mientras el modelo siga siendo
+# infactible. Cada intento de reducción tiene un tope corto (max_time_reduccion):
+# si no se prueba la infactibilidad a tiempo, el grupo se queda en el núcleo.
+def explicar_infactibilidad(grupos, max_time_in_seconds=10.0, max_time_reduccion=1.0):
+    def infactible(nombres, tope):
+        grupos.activar(nombres)
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = 1
+        solver.parameters.max_time_in_seconds = tope
+        return solver.Solve(grupos.model) == cp_model.INFEASIBLE, solver
+
+    def nucleo_de(solver):
+        return [grupos.nombres[i] for i in solver.SufficientAssumptionsForInfeasibility() if i in grupos.nombres]
+
+    es_infactible, solver = infactible(None, max_time_in_seconds)
+    if not es_infactible:
+        grupos.activar()
+        return None
+
+    nucleo = nucleo_de(solver)
+    for nombre in list(nucleo):
+        if nombre not in nucleo:
+            continue
+        reducido = [n for n in nucleo if n != nombre]
+        if not reducido:
+            continue
+        es_infactible, solver = infactible(reducido, max_time_reduccion)
+        if es_infactible:
+            # El nuevo núcleo puede ser aún más chico que `reducido`
+            nucleo = [n for n in reducido if n in set(nucleo_de(solver))] or reducido
+
+    grupos.activar()
+    return nucleo
@@ -1,47 +1,151 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
+from ingesta import ESQUEMAS, BufferColumnas, iterar_registros, leer_pagina, muestrear_tabla, minutos_a_hora
 
-# URL base para las solicitudes a la API
-BASE_URL = "http://localhost:8000/api"
+# Colecciones que se pueden explorar
+COLECCIONES = ('profesores', 'materias', 'salones', 'horarios_disponibles', 'profesor_materia')
+
+# Filas por página del explorador y por bloque al recorrer una colección completa
+TAMANO_PAGINA = 50
+TAMANO_BLOQUE = 5000
+
+# Ancho de los intervalos de los histogramas de capacidad y de alumnos
+ANCHO_HISTOGRAMA = 10
+
+
+# Función para contar valores agrupados en intervalos de ANCHO_HISTOGRAMA
+def histograma(valores):
+    valores = pd.Series(valores)
+    return (valores[valores >= 0] // ANCHO_HISTOGRAMA * ANCHO_HISTOGRAMA).value_counts()
+
+
+# Estadísticas de una colección que se actualizan con cada página o bloque leído
+# Cada página cuenta una sola vez; si cambia el tamaño de página se empieza de nuevo.
+class Estadisticas:
+    def __init__(self, tamano):
+        self.tamano = tamano
+        self.filas = 0
+        self.total = None
+        self.bloques = set()
+        self.completa = False
+        self.capacidad = pd.Series(dtype=np.int64)
+        self.alumnos = pd.Series(dtype=np.int64)
+        self.por_dia = pd.Series(dtype=np.int64)
+
+    def agregar(self, bloque, tabla):
+        if bloque in self.bloques:
+            return
+        self.bloques.add(bloque)
+        self.filas += len(tabla)
+        if 'capacidad_alumnos' in tabla:
+            self.capacidad = self.capacidad.add(histograma(tabla['capacidad_alumnos']), fill_value=0)
+        if 'alumnos' in tabla:
+            self.alumnos = self.alumnos.add(histograma(tabla['alumnos']), fill_value=0)
+        if 'dia' in tabla:
+            self.por_dia = self.por_dia.add(tabla['dia'].astype(str).value_counts(), fill_value=0)
+
+
+# Función para leer una página una sola vez entre reruns
+@st.cache_data(ttl=60)
+def cargar_pagina(endpoint, pagina, tamano):
+    return leer_pagina(endpoint, pagina, tamano)
+
+
+# Función para leer una muestra aleatoria una sola vez por semilla
+@st.cache_data(ttl=60)
+def cargar_muestra(endpoint, n, semilla):
+    return muestrear_tabla(endpoint, n, semilla=semilla)
+
+
+# Función para mostrar una tabla tipada con las horas en 'HH:MM'
+def para_mostrar(endpoint, tabla):
+    tabla = tabla.copy()
+    for columna, tipo in ESQUEMAS[endpoint].items():
+        if tipo == 'hora' and columna in tabla:
+            tabla[columna] = minutos_a_hora(tabla[columna].astype(int)).to_numpy()
+    return tabla
+
+
+# Función para mostrar el resumen acumulado de una colección
+def mostrar_estadisticas(estadisticas):
+    total = estadisticas.total if estadisticas.total is not None else '?'
+    alcance = 'colección completa' if estadisticas.completa else f"{len(estadisticas.bloques)} páginas leídas"
+    st.write(f"Filas vistas: {estadisticas.filas:,} de {total} ({alcance})")
+    if len(estadisticas.capacidad):
+        st.write("Capacidad de los salones:")
+        st.bar_chart(estadisticas.capacidad.sort_index())
+    if len(estadisticas.alumnos):
+        st.write("Alumnos por materia:")
+        st.bar_chart(estadisticas.alumnos.sort_index())
+    if len(estadisticas.por_dia):
+        st.write("Horarios disponibles por día:")
+        st.bar_chart(estadisticas.por_dia)
+
+
+# Función para recorrer toda la colección por bloques, actualizando el resumen en pantalla
+def recorrer_coleccion(endpoint, estadisticas, contenedor):
+    buffer = BufferColumnas(ESQUEMAS[endpoint])
+    bloque = 0
+    for i, registro in enumerate(iterar_registros(endpoint), start=1):
+        buffer.agregar(registro)
+        if i % TAMANO_BLOQUE == 0:
+            estadisticas.agregar(('bloque', bloque), buffer.a_dataframe())
+            buffer, bloque = BufferColumnas(ESQUEMAS[endpoint]), bloque + 1
+            with contenedor.container():
+                mostrar_estadisticas(estadisticas)
+    estadisticas.agregar(('bloque', bloque), buffer.a_dataframe())
+    estadisticas.completa = True
+    estadisticas.total = estadisticas.filas
 
-# Función para obtener los datos desde la API
-def get_data(endpoint):
-    try:
-        response = requests.get(f"{BASE_URL}/{endpoint}")
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        st.error(f"Error al obtener datos de {endpoint}: {str(e)}")
-        return None
 
 # Aplicación Streamlit simplificada
 def main():
     st.title('Generador de Horarios UTS - Depuración')
-    
-    st.write("Esta es una versión simplificada para depuración.")
-    
-    # Botón para cargar datos
-    if st.button('Cargar Datos'):
-        with st.spinner('Cargando datos...'):
-            profesores = get_data('profesores')
-            materias = get_data('materias')
-            salones = get_data('salones')
-            horarios_disponibles = get_data('horarios_disponibles')
-            profesor_materia = get_data('profesor_materia')
-        
-        if all([profesores, materias, salones, horarios_disponibles, profesor_materia]):
-            st.success("Todos los datos se cargaron correctamente")
-            
-            # Mostrar una muestra de los datos
-            st.subheader("Muestra de datos:")
-            st.write("Profesores:", pd.DataFrame(profesores[:5]))
-            st.write("Materias:", pd.DataFrame(materias[:5]))
-            st.write("Salones:", pd.DataFrame(salones[:5]))
-            st.write("Horarios disponibles:", pd.DataFrame(horarios_disponibles[:5]))
-            st.write("Profesor-Materia:", pd.DataFrame(profesor_materia[:5]))
+
+    st.write("Explorador de datos: solo se piden a la API las páginas o muestras que se muestran.")
+
+    endpoint = st.sidebar.selectbox('Colección', COLECCIONES)
+    modo = st.sidebar.radio('Ver', ['Páginas', 'Muestra aleatoria'])
+    tamano = int(st.sidebar.number_input('Filas por página', min_value=10, max_value=1000, value=TAMANO_PAGINA))
+
+    todas = st.session_state.setdefault('estadisticas', {})
+    if endpoint not in todas or (todas[endpoint].tamano != tamano and not todas[endpoint].completa):
+        todas[endpoint] = Estadisticas(tamano)
+    estadisticas = todas[endpoint]
+
+    try:
+        if modo == 'Páginas':
+            paginas = -(-estadisticas.total // tamano) if estadisticas.total else None
+            pagina = int(st.number_input('Página', min_value=1, value=1, step=1, key=f'pagina_{endpoint}'))
+            if paginas:
+                pagina = min(pagina, paginas)
+            tabla, total = cargar_pagina(endpoint, pagina, tamano)
+            if total is not None and not estadisticas.completa:
+                estadisticas.total = total
+            if not estadisticas.completa:
+                estadisticas.agregar(('pagina', pagina), tabla)
+            st.write(f"Página {pagina}" + (f" de {paginas}" if paginas else '') + ":")
+            if len(tabla) < tamano:
+                st.info("Última página")
         else:
-            st.error('No se pudieron cargar todos los datos necesarios. Por favor, verifica la conexión con la API.')
+            semilla = int(st.number_input('Semilla', min_value=0, value=0, step=1))
+            tabla, aleatoria = cargar_muestra(endpoint, tamano, semilla)
+            if not aleatoria:
+                st.info("Sin muestreo al azar (la API no informa el total o la colección cabe en una página): se muestran las primeras filas")
+        st.dataframe(para_mostrar(endpoint, tabla))
+
+        st.subheader("Resumen")
+        contenedor = st.empty()
+        if st.button('Recorrer colección completa'):
+            estadisticas = todas[endpoint] = Estadisticas(tamano)
+            with st.spinner('Recorriendo colección...'):
+                recorrer_coleccion(endpoint, estadisticas, contenedor)
+        with contenedor.container():
+            mostrar_estadisticas(estadisticas)
+    except requests.RequestException as e:
+        st.error(f"Error al obtener datos de {endpoint}: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+# Columnas que acepta /api/clases
+COLUMNAS_API = ['grupo', 'dia_semana', 'hora_inicio', 'hora_fin', 'alumnos', 'materia_id', 'salon_id', 'profesor_id']
+
+
+# Función para leer de una sola vez el valor de varias variables del modelo
+def valores_solucion(solver, indices):
+    return np.asarray(solver.ResponseProto().solution, dtype=np.int64)[indices]
+
+
+# Función para extraer las clases activas de una solución CP-SAT
+# `indices` es el índice en el proto de cada variable guardada y
+# horario_idx / salon_idx / pm_idx son los códigos (i, j, k) de esa variable en la
+# Instancia. Solo se recorre la lista dispersa de variables creadas; los
+# atributos de profesor, materia y salón se unen por indexación de arreglos.
+def extraer_horario(solver, indices, horario_idx, salon_idx, pm_idx, instancia):
+    activas = valores_solucion(solver, indices) > 0
+    return horario_desde_codigos(instancia, horario_idx[activas], salon_idx[activas], pm_idx[activas])
+
+
+# Función para armar el DataFrame tipado de un horario a partir de códigos (i, j, k)
+def horario_desde_codigos(instancia, horario_idx, salon_idx, pm_idx):
+    profesor = instancia.pm_profesor[pm_idx]
+    materia = instancia.pm_materia[pm_idx]
+    df = instancia.codigos_a_dataframe(profesor, materia, salon_idx,
+                                       instancia.disp_dia[horario_idx],
+                                       instancia.disp_inicio[horario_idx],
+                                       instancia.disp_fin[horario_idx])
+    df['dia_semana'] = pd.Categorical(df['dia_semana'], categories=instancia.dias)
+    df['materia_nombre'] = instancia.materia_nombres[materia]
+    df['salon_codigo'] = instancia.salon_codigos[salon_idx]
+    df['profesor_cedula'] = instancia.profesor_cedulas[profesor]
+    return df
+
+
+# Función para convertir el horario extraído a la lista de dicts que espera la API
+def horario_a_json(df):
+    df = df[[columna for columna in COLUMNAS_API if columna in df.columns]].copy()
+    df['dia_semana'] = df['dia_semana'].astype(str)
+    return df.to_dict('records')
+
+
+# Función para exportar el horario en formato columnar (Parquet o Arrow/Feather)
+def exportar_horario(df, ruta):
+    if str(ruta).endswith(('.arrow', '.feather')):
+        df.reset_index(drop=True).to_feather(ruta)
+    else:
+        df.to_parquet(ruta, index=False)
+    return ruta
@@ -5,11 +5,19 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 import requests
 from ortools.sat.python import cp_model
+from asignacion_salones import asignar_salones
+from modelo_datos import horas_a_minutos
+from sesion import huella_datos, ejecutar_con_cache, obtener_resultado
+from diagnostico import diagnosticar_asignacion, hay_errores, mensajes, GruposRestricciones, explicar_infactibilidad
+from extraccion import valores_solucion
+from modelos_cp import clave_modelo, modelo_en_cache
+from planificacion import rechazar_modelo_cp
 
 # URL base para las solicitudes a la API
 BASE_URL = "http://localhost:8000/api"
 
 # Función para obtener los datos desde la API
+@st.cache_data
 def get_data(endpoint):
     try:
         response = requests.get(f"{BASE_URL}/{endpoint}")
@@ -54,61 +62,110 @@ def preparar_datos_ml(df_profesores, df_materias, df_salones, df_horarios_dispon
     df_combined['materia_encoded'] = le.fit_transform(df_combined[nombre_materia_col])
 
     # Crear características
-    X = df_combined[['dia_encoded', 'hora_inicio', 'hora_fin', 'profesor_encoded', 'materia_encoded', 'experiencia', 'calificacion_alumno']]
-    X['hora_inicio'] = pd.to_datetime(X['hora_inicio']).dt.hour + pd.to_datetime(X['hora_inicio']).dt.minute / 60
-    X['hora_fin'] = pd.to_datetime(X['hora_fin']).dt.hour + pd.to_datetime(X['hora_fin']).dt.minute / 60
+    # Las horas se convierten una sola vez a minutos y luego a horas decimales
+    X = df_combined[['dia_encoded', 'hora_inicio', 'hora_fin', 'profesor_encoded', 'materia_encoded', 'experiencia', 'calificacion_alumno']].assign(
+        hora_inicio=horas_a_minutos(df_combined['hora_inicio']) / 60,
+        hora_fin=horas_a_minutos(df_combined['hora_fin']) / 60)
 
     return X, df_combined
 
 
 
 # Función para aplicar restricciones al horario generado
+# Con horas y profesores fijos, cada franja (dia, hora) es un emparejamiento
+# clase-salón independiente. Solo se recurre a CP-SAT cuando la restricción
+# entre franjas (todas las materias al menos una vez) no queda cubierta.
 def aplicar_restricciones(horario_df, df_profesores, df_materias, df_salones):
+    horario_df = horario_df.reset_index(drop=True)
+
+    # Diagnóstico previo en tiempo lineal: si los datos hacen imposible el horario, no se resuelve nada
+    problemas = diagnosticar_asignacion(horario_df, df_materias, df_salones)
+    if hay_errores(problemas):
+        st.error("No se puede generar el horario con estos datos:")
+        for mensaje in mensajes(problemas):
+            st.error(mensaje)
+        return None
+
+    asignacion = asignar_salones(horario_df, df_materias, df_salones)
+
+    asignadas = asignacion >= 0
+    horario_actualizado = horario_df.loc[asignadas, ['dia', 'hora_inicio', 'hora_fin', 'profesor', 'materia']].copy()
+    horario_actualizado['salon'] = df_salones['codigo'].to_numpy()[asignacion[asignadas]]
+
+    if set(df_materias['nombre']) <= set(horario_actualizado['materia']):
+        return horario_actualizado.reset_index(drop=True)
+
+    return aplicar_restricciones_cp(horario_df, df_profesores, df_materias, df_salones)
+
+# Función para construir el modelo CP-SAT completo de asignación de salones
+# Devuelve el modelo y los arreglos que relacionan cada variable (su índice en el
+# proto) con su clase i y su salón j, más los literales de los grupos de restricciones.
+def construir_modelo_cp(horario_df, df_materias, df_salones):
     model = cp_model.CpModel()
     
-    # Crear variables
-    clases = {}
-    for i, clase in horario_df.iterrows():
-        for j, salon in df_salones.iterrows():
-            clases[(i, j)] = model.NewBoolVar(f'clase_{i}_salon_{j}')
+    # Cada familia de restricciones (y la cobertura de cada materia) queda bajo
+    # un literal de suposición, para poder explicar una infactibilidad
+    grupos = GruposRestricciones(model)
+    
+    # Crear variables: una por clase i y salón j, en orden (i, j)
+    n_clases, n_salones = len(horario_df), len(df_salones)
+    fila_idx = np.repeat(np.arange(n_clases), n_salones)
+    salon_idx = np.tile(np.arange(n_salones), n_clases)
+    variables = [model.NewBoolVar(f'clase_{i}_salon_{j}') for i, j in zip(fila_idx.tolist(), salon_idx.tolist())]
+    
+    # Variables de cada clase: variables[i * n_salones:(i + 1) * n_salones]
+    def de_clases(filas, salon=None):
+        if salon is not None:
+            return [variables[i * n_salones + salon] for i in filas]
+        return [variables[k] for i in filas for k in range(i * n_salones, (i + 1) * n_salones)]
     
     # Restricción 1: Un profesor no puede dar más de una clase al mismo tiempo
-    for dia in horario_df['dia'].unique():
-        for hora in horario_df['hora_inicio'].unique():
-            for profesor in horario_df['profesor'].unique():
-                clases_simultaneas = [
-                    clases[(i, j)]
-                    for i, clase in horario_df.iterrows()
-                    for j in df_salones.index
-                    if clase['dia'] == dia and clase['hora_inicio'] == hora and clase['profesor'] == profesor
-                ]
-                if clases_simultaneas:
-                    model.Add(sum(clases_simultaneas) <= 1)
+    literal = grupos.literal('un profesor por franja')
+    for filas in horario_df.groupby(['dia', 'hora_inicio', 'profesor'], sort=False).indices.values():
+        model.Add(cp_model.LinearExpr.Sum(de_clases(filas)) <= 1).OnlyEnforceIf(literal)
     
     # Restricción 2: Un salón no puede tener más de una clase al mismo tiempo
-    for dia in horario_df['dia'].unique():
-        for hora in horario_df['hora_inicio'].unique():
-            for j in df_salones.index:
-                clases_simultaneas = [
-                    clases[(i, j)]
-                    for i, clase in horario_df.iterrows()
-                    if clase['dia'] == dia and clase['hora_inicio'] == hora
-                ]
-                if clases_simultaneas:
-                    model.Add(sum(clases_simultaneas) <= 1)
-    
-    # Restricción 3: Respetar la capacidad de los salones
-    for i, clase in horario_df.iterrows():
-        materia = df_materias[df_materias['nombre'] == clase['materia']].iloc[0]
-        for j, salon in df_salones.iterrows():
-            model.Add(clases[(i, j)] * materia['alumnos'] <= salon['capacidad_alumnos'])
+    literal = grupos.literal('un salón por franja')
+    for filas in horario_df.groupby(['dia', 'hora_inicio'], sort=False).indices.values():
+        for j in range(n_salones):
+            model.Add(cp_model.LinearExpr.Sum(de_clases(filas, j)) <= 1).OnlyEnforceIf(literal)
+    
+    # Restricción 3: Respetar la capacidad de los salones (las combinaciones que no caben valen 0)
+    literal = grupos.literal('capacidad de los salones')
+    alumnos = df_materias.drop_duplicates('nombre').set_index('nombre')['alumnos'].reindex(horario_df['materia']).to_numpy()
+    capacidad = df_salones['capacidad_alumnos'].to_numpy()
+    for k in np.flatnonzero(alumnos[fila_idx] > capacidad[salon_idx]).tolist():
+        model.AddImplication(literal, variables[k].Not())
     
     # Restricción 4: Asegurar que todas las materias se impartan al menos una vez
+    por_materia = horario_df.groupby('materia', sort=False).indices
     for materia in df_materias['nombre']:
-        model.Add(sum(clases[(i, j)]
-                      for i, clase in horario_df.iterrows()
-                      if clase['materia'] == materia
-                      for j in df_salones.index) >= 1)
+        filas = por_materia.get(materia, [])
+        model.Add(cp_model.LinearExpr.Sum(de_clases(filas)) >= 1).OnlyEnforceIf(grupos.literal(f'dictar la materia {materia}'))
+    
+    grupos.activar()
+    arreglos = {
+        'indices': np.array([variable.Index() for variable in variables], dtype=np.int64),
+        'fila_idx': fila_idx,
+        'salon_idx': salon_idx,
+    }
+    arreglos.update(grupos.arreglos())
+    return model, arreglos
+
+# Función para aplicar restricciones con el modelo CP-SAT completo
+def aplicar_restricciones_cp(horario_df, df_profesores, df_materias, df_salones):
+    # Una variable por clase y salón: si no cabe en el presupuesto no se construye
+    rechazo = rechazar_modelo_cp(len(horario_df) * len(df_salones))
+    if rechazo:
+        st.error(rechazo)
+        return None
+    
+    # La clave usa solo las columnas que lee construir_modelo_cp: el salón que predijo
+    # el bosque no entra en el modelo y cambiaría la clave en cada ejecución
+    clave = clave_modelo('godness', huella_datos(horario_df[['dia', 'hora_inicio', 'profesor', 'materia']],
+                                                 df_materias[['nombre', 'alumnos']], df_salones[['capacidad_alumnos']]))
+    model, arreglos, _ = modelo_en_cache(clave, lambda: construir_modelo_cp(horario_df, df_materias, df_salones))
+    grupos = GruposRestricciones.restaurar(model, arreglos['grupo_nombres'], arreglos['grupo_indices'])
     
     # Resolver el modelo
     solver = cp_model.CpSolver()
@@ -116,21 +173,16 @@ def aplicar_restricciones(horario_df, df_profesores, df_materias, df_salones):
     
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         # Actualizar el horario con las asignaciones de salones
-        horario_actualizado = []
-        for i, clase in horario_df.iterrows():
-            for j, salon in df_salones.iterrows():
-                if solver.BooleanValue(clases[(i, j)]):
-                    horario_actualizado.append({
-                        'dia': clase['dia'],
-                        'hora_inicio': clase['hora_inicio'],
-                        'hora_fin': clase['hora_fin'],
-                        'profesor': clase['profesor'],
-                        'materia': clase['materia'],
-                        'salon': salon['codigo']
-                    })
-        return pd.DataFrame(horario_actualizado)
+        activas = valores_solucion(solver, arreglos['indices']) > 0
+        horario_actualizado = horario_df.loc[arreglos['fila_idx'][activas], ['dia', 'hora_inicio', 'hora_fin', 'profesor', 'materia']].copy()
+        horario_actualizado['salon'] = df_salones['codigo'].to_numpy()[arreglos['salon_idx'][activas]]
+        return horario_actualizado.reset_index(drop=True)
     else:
         st.error("No se pudo encontrar una solución que cumpla todas las restricciones")
+        if status == cp_model.INFEASIBLE:
+            conflicto = explicar_infactibilidad(grupos)
+            if conflicto:
+                st.error(f"Restricciones en conflicto: {', '.join(conflicto)}")
         return None
 
 # Función para generar el horario con machine learning y aplicar restricciones
@@ -190,14 +242,16 @@ def main():
             st.write("Horarios Disponibles:", pd.DataFrame(horarios_disponibles).head())
             st.write("Profesor-Materia:", pd.DataFrame(profesor_materia).head())
         
-        # Generar horario
+        # Generar horario (el resultado queda en la sesión para los siguientes reruns)
+        huella = huella_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
         if st.button('Generar Horario'):
             with st.spinner('Generando horario...'):
-                horario = generar_horario_ml(profesores, materias, salones, horarios_disponibles, profesor_materia)
-            
-            if horario is not None:
-                st.success("Horario generado con éxito")
-                st.write(horario)
+                ejecutar_con_cache('godness', huella, generar_horario_ml, profesores, materias, salones, horarios_disponibles, profesor_materia)
+        
+        entrada = obtener_resultado('godness', huella)
+        if entrada is not None and entrada['resultado'] is not None:
+            st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+            st.write(entrada['resultado'])
     else:
         st.error("Error al cargar algunos de los datos.")
 
@@ -1,11 +1,19 @@
 import streamlit as st
 import random
+from collections import OrderedDict
+from functools import partial
 import numpy as np
 import pandas as pd
 from deap import base, creator, tools, algorithms
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
 import requests
+from modelo_datos import DIAS, BLOQUES, BLOQUES_MINUTOS, Clase, Instancia
+from persistencia import asignar_grupos, guardar_horario
+from sesion import huella_datos, guardar_resultado
+from trabajos import Progreso, enviar_trabajo, seguir_trabajo
+from validacion import _cubrimiento, validar_horario, resumen_violaciones, reparar_horario
+from diagnostico import mensajes
+from vistas import mostrar_vista_horario
 
 # URL base para las solicitudes a la API
 BASE_URL = "http://localhost:8000/api"
@@ -21,20 +29,8 @@ def get_data(endpoint):
         st.error(f"Error al obtener datos de {endpoint}: {str(e)}")
         return None
 
-# Definir los días de la semana y los bloques de horario
-DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
-BLOQUES = ['06:00-07:30', '07:30-09:00', '09:00-10:30', '10:30-12:00', '12:00-13:30', 
-           '13:30-15:00', '15:00-16:30', '16:30-18:00', '18:00-19:30', '19:30-21:00']
-
-# Actualizar el LabelEncoder para manejar nuevas etiquetas
-def update_label_encoder(le, new_labels):
-    le_classes = set(le.classes_)
-    new_classes = set(new_labels)
-    combined_classes = np.array(sorted(le_classes.union(new_classes)))
-    le.classes_ = combined_classes
-    return le
-
-# Preparar datos para el modelo de ML
+# Preparar datos para el modelo de ML (se conserva entre reruns de Streamlit)
+@st.cache_resource
 def prepare_data():
     profesores = get_data('profesores')
     materias = get_data('materias')
@@ -42,26 +38,27 @@ def prepare_data():
     horarios_disponibles = get_data('horarios_disponibles')
     profesor_materia = get_data('profesor_materia')
 
-    df_profesores = pd.DataFrame(profesores)
-    df_materias = pd.DataFrame(materias)
-    df_salones = pd.DataFrame(salones)
-    df_horarios_disponibles = pd.DataFrame(horarios_disponibles)
-    df_profesor_materia = pd.DataFrame(profesor_materia)
-
-    le_profesores = LabelEncoder()
-    le_materias = LabelEncoder()
+    instancia = Instancia.desde_json(profesores, materias, salones, horarios_disponibles, profesor_materia)
+    model = entrenar_modelo(instancia)
 
-    # Codificar los IDs de profesores y materias
-    df_profesor_materia['profesor_encoded'] = le_profesores.fit_transform(df_profesor_materia['profesor_id'])
-    df_profesor_materia['materia_encoded'] = le_materias.fit_transform(df_profesor_materia['materia_id'])
+    huella = huella_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
+    return instancia, model, huella
 
-    X = df_profesor_materia[['profesor_encoded', 'materia_encoded', 'experiencia', 'calificacion_alumno']]
-    y = df_profesor_materia['calificacion_alumno']
+# Función para entrenar el modelo que puntúa las asignaciones profesor-materia
+def entrenar_modelo(instancia):
+    # Los códigos compactos de la instancia ya son enteros densos, no hace falta LabelEncoder
+    X = np.column_stack([instancia.pm_profesor, instancia.pm_materia, instancia.pm_experiencia, instancia.pm_calificacion])
+    y = instancia.pm_calificacion
 
     model = RandomForestClassifier(n_estimators=100, random_state=42)
     model.fit(X, y)
+    return model
 
-    return df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia, model, le_profesores, le_materias
+# Penalización por conflicto en la fitness (parámetro ajustable con barrido.py)
+PENALIZACION_CONFLICTO = 10
+
+# Máximo de genomas distintos que recuerda la caché de fitness
+TAMANO_CACHE_FITNESS = 100_000
 
 # Crear el tipo de fitness
 creator.create("FitnessMax", base.Fitness, weights=(1.0,))
@@ -70,130 +67,265 @@ creator.create("Individual", list, fitness=creator.FitnessMax)
 # Inicializar toolbox
 toolbox = base.Toolbox()
 
-# Función para crear un gen (una clase)
-def create_class(df_profesores, df_materias, df_salones):
-    profesor = random.choice(df_profesores['id'].tolist())
-    materia = random.choice(df_materias['id'].tolist())
-    salon = random.choice(df_salones['id'].tolist())
-    dia = random.choice(DIAS)
-    bloque = random.choice(BLOQUES)
+# Función para crear un gen (una clase) como tupla de códigos enteros
+# (profesor, materia, salon, dia, bloque)
+def create_class(instancia):
+    profesor = random.randrange(instancia.n_profesores)
+    materia = random.randrange(instancia.n_materias)
+    salon = random.randrange(instancia.n_salones)
+    dia = random.randrange(len(DIAS))
+    bloque = random.randrange(len(BLOQUES))
     return (profesor, materia, salon, dia, bloque)
 
-# Función de evaluación con manejo de errores y depuración
-def evalSchedule(individual, df_profesores, df_materias, df_salones, df_profesor_materia, model, le_profesores, le_materias):
+# Función para medir un individuo: puntaje del modelo y número de conflictos
+# Cuenta como conflicto lo mismo que validar_horario: choques, capacidad, materia sin
+# habilitación del profesor y clase fuera de su disponibilidad.
+def puntaje_y_conflictos(individual, instancia, model, experiencia, disponibilidad):
     conflicts = 0
-    profesor_schedule = {}
-    salon_schedule = {}
-    total_score = 0
-    
-    unseen_labels_profesores = set()
-    unseen_labels_materias = set()
+    profesor_schedule = set()
+    salon_schedule = set()
 
-    for clase in individual:
-        profesor, materia, salon, dia, bloque = clase
-        
+    for profesor, materia, salon, dia, bloque in individual:
         # Verificar conflictos
         if (profesor, dia, bloque) in profesor_schedule or (salon, dia, bloque) in salon_schedule:
             conflicts += 1
         else:
-            profesor_schedule[(profesor, dia, bloque)] = materia
-            salon_schedule[(salon, dia, bloque)] = materia
-        
-        # Verificar capacidad del salón
-        capacidad_salon = df_salones[df_salones['id'] == salon]['capacidad_alumnos'].values[0]
-        alumnos_materia = df_materias[df_materias['id'] == materia]['alumnos'].values[0]
-        if alumnos_materia > capacidad_salon:
-            conflicts += 1
-        
-        # Usar el modelo de ML para evaluar la idoneidad de la asignación
-        if profesor in le_profesores.classes_ and materia in le_materias.classes_:
-            profesor_encoded = le_profesores.transform([profesor])[0]
-            materia_encoded = le_materias.transform([materia])[0]
-            experiencia = df_profesor_materia[(df_profesor_materia['profesor_id'] == profesor) & 
-                                              (df_profesor_materia['materia_id'] == materia)]['experiencia'].values
-            if len(experiencia) > 0:
-                X_pred = [[profesor_encoded, materia_encoded, experiencia[0], 0]]  # 0 es un placeholder para calificacion_alumno
-                score = model.predict(X_pred)[0]
-                total_score += score
-            else:
-                conflicts += 1  # Si no hay registro de profesor-materia, lo consideramos un conflicto
-        else:
-            if profesor not in le_profesores.classes_:
-                unseen_labels_profesores.add(profesor)
-            if materia not in le_materias.classes_:
-                unseen_labels_materias.add(materia)
-            conflicts += 1  # Penalizar etiquetas no vistas
-    
-    if unseen_labels_profesores:
-        st.error(f"Profesores no reconocidos por el LabelEncoder: {unseen_labels_profesores}")
-    if unseen_labels_materias:
-        st.error(f"Materias no reconocidas por el LabelEncoder: {unseen_labels_materias}")
+            profesor_schedule.add((profesor, dia, bloque))
+            salon_schedule.add((salon, dia, bloque))
+
+    genes = np.array(individual, dtype=np.int32).reshape(-1, 5)
+
+    # Verificar capacidad del salón
+    conflicts += int(np.count_nonzero(instancia.materia_alumnos[genes[:, 1]] > instancia.salon_capacidad[genes[:, 2]]))
+
+    # Si no hay registro de profesor-materia, lo consideramos un conflicto
+    exp = np.array([experiencia.get((profesor, materia), -1) for profesor, materia, *_ in individual])
+    registradas = exp >= 0
+    conflicts += int(np.count_nonzero(~registradas))
+
+    # Verificar que el bloque caiga dentro de la disponibilidad del profesor
+    conflicts += int(np.count_nonzero(~disponibilidad[genes[:, 0], genes[:, 3], genes[:, 4]]))
+
+    # Usar el modelo de ML para evaluar la idoneidad de las asignaciones (una sola predicción por individuo)
+    total_score = 0
+    if registradas.any():
+        X_pred = np.column_stack([genes[registradas, 0], genes[registradas, 1], exp[registradas],
+                                  np.zeros(np.count_nonzero(registradas))])  # 0 es un placeholder para calificacion_alumno
+        total_score = model.predict(X_pred).sum()
+
+    return total_score, conflicts
+
+# Función para marcar las franjas (profesor, día, bloque) cubiertas por la disponibilidad
+# Devuelve un arreglo booleano n_profesores × DIAS × BLOQUES. Un bloque vale solo si
+# cabe entero en un tramo continuo de disponibilidad del profesor ese día, con los
+# horarios contiguos unidos igual que en validar_horario.
+def disponibilidad_por_franja(instancia):
+    # Días de la disponibilidad como índice en DIAS (sin distinguir mayúsculas)
+    posicion = {dia.lower(): i for i, dia in enumerate(DIAS)}
+    dia_gen = np.array([posicion.get(dia.lower(), -1) for dia in instancia.dias], dtype=np.int64)[instancia.disp_dia]
+    validas = dia_gen >= 0
+    if not validas.any():
+        return np.zeros((instancia.n_profesores, len(DIAS), len(BLOQUES)), dtype=bool)
+    base = int(max(instancia.disp_fin.max(), BLOQUES_MINUTOS.max())) + 1
+    claves, fines = _cubrimiento(instancia.disp_profesor[validas].astype(np.int64) * len(DIAS) + dia_gen[validas],
+                                 instancia.disp_inicio[validas], instancia.disp_fin[validas], base)
+
+    profesor, dia, bloque = np.meshgrid(np.arange(instancia.n_profesores), np.arange(len(DIAS)),
+                                        np.arange(len(BLOQUES)), indexing='ij')
+    grupo = profesor.astype(np.int64) * len(DIAS) + dia
+    punto = grupo * base + BLOQUES_MINUTOS[bloque, 0]
+    tramo = np.searchsorted(claves, punto, side='right') - 1
+    valido = np.maximum(tramo, 0)
+    return (tramo >= 0) & (claves[valido] // base == grupo) & (fines[valido] >= BLOQUES_MINUTOS[bloque, 1])
+
+# Índices precalculados para muestrear genes factibles
+# Por materia: profesores habilitados (profesor_materia) y primer salón que la
+# contiene en la lista de salones ordenada por capacidad. Por profesor: franjas
+# (día, bloque) que su disponibilidad cubre enteras (disponibilidad_por_franja).
+class IndicesFactibles:
+    def __init__(self, instancia, disponibilidad):
+        orden = np.argsort(instancia.pm_materia, kind='stable')
+        cortes = np.searchsorted(instancia.pm_materia[orden], np.arange(instancia.n_materias + 1))
+        self.profesores = [instancia.pm_profesor[orden[a:b]].tolist() for a, b in zip(cortes[:-1], cortes[1:])]
+
+        self.franjas = [[] for _ in range(instancia.n_profesores)]
+        for profesor, dia, bloque in np.argwhere(disponibilidad).tolist():
+            self.franjas[profesor].append((dia, bloque))
+
+        self.salones_orden = np.argsort(instancia.salon_capacidad, kind='stable').tolist()
+        self.primer_salon = np.searchsorted(instancia.salon_capacidad[self.salones_orden], instancia.materia_alumnos, side='left').tolist()
+
+# Función para muestrear un gen factible para una materia
+# Si algún índice está vacío (materia sin profesor, profesor sin franjas, materia
+# sin salón que la contenga) ese componente se sortea como en create_class.
+def create_class_factible(instancia, indices, materia):
+    profesores = indices.profesores[materia]
+    profesor = random.choice(profesores) if profesores else random.randrange(instancia.n_profesores)
+    franjas = indices.franjas[profesor]
+    dia, bloque = random.choice(franjas) if franjas else (random.randrange(len(DIAS)), random.randrange(len(BLOQUES)))
+    primero = indices.primer_salon[materia]
+    if primero < len(indices.salones_orden):
+        salon = indices.salones_orden[random.randrange(primero, len(indices.salones_orden))]
+    else:
+        salon = random.randrange(instancia.n_salones)
+    return (profesor, materia, salon, dia, bloque)
+
+# Función para crear un individuo factible: un gen por materia, en orden
+def crear_individuo_factible(instancia, indices):
+    return creator.Individual(create_class_factible(instancia, indices, materia) for materia in range(instancia.n_materias))
+
+# Mutación que vuelve a muestrear genes con el muestreo factible (misma materia)
+def mutar_genes(individual, instancia, indices, indpb):
+    for i, gen in enumerate(individual):
+        if random.random() < indpb:
+            individual[i] = create_class_factible(instancia, indices, gen[1])
+    return individual,
+
+# Función de evaluación
+def evalSchedule(individual, instancia, model, experiencia, disponibilidad, penalizacion=PENALIZACION_CONFLICTO):
+    total_score, conflicts = puntaje_y_conflictos(individual, instancia, model, experiencia, disponibilidad)
 
     # La fitness es una combinación de la puntuación del modelo y los conflictos
-    fitness = total_score - (conflicts * 10)  # Penalizamos fuertemente los conflictos
+    fitness = total_score - (conflicts * penalizacion)  # Penalizamos fuertemente los conflictos
     return fitness,
 
+# Caché LRU de fitness por genoma
+# La selección por torneo produce muchos clones y el cruce entre padres iguales
+# devuelve hijos idénticos: esos individuos se resuelven con una búsqueda en el
+# diccionario en lugar de un evalSchedule completo. La clave es el genoma mismo
+# (tupla de genes): con un hash como clave dos genomas distintos podrían compartir fitness.
+class CacheFitness:
+    def __init__(self, evaluar, maximo=TAMANO_CACHE_FITNESS):
+        self.evaluar = evaluar
+        self.maximo = maximo
+        self.valores = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __call__(self, individual):
+        clave = tuple(individual)
+        valor = self.valores.get(clave)
+        if valor is not None:
+            self.valores.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+        self.fallos += 1
+        valor = self.evaluar(individual)
+        self.valores[clave] = valor
+        if len(self.valores) > self.maximo:
+            self.valores.popitem(last=False)
+        return valor
+
+# Función para armar el diccionario de experiencia por par (profesor, materia), en códigos compactos
+def experiencia_por_par(instancia):
+    return dict(zip(zip(instancia.pm_profesor.tolist(), instancia.pm_materia.tolist()), instancia.pm_experiencia.tolist()))
+
 # Algoritmo principal
-def generate_schedule(df_profesores, df_materias, df_salones, df_profesor_materia, model, le_profesores, le_materias):
+# Mismo esquema que algorithms.eaSimple, pero con un punto de control por generación
+# para reportar el progreso y atender cancelaciones cuando corre como trabajo.
+# Con factible=True la población inicial y la mutación usan el muestreo factible;
+# con factible=False se usa el muestreo uniforme original (útil para comparar en barrido.py).
+def generate_schedule(instancia, model, progreso=None, cxpb=0.5, mutpb=0.2, ngen=50, semilla=42,
+                      penalizacion=PENALIZACION_CONFLICTO, poblacion=300, verbose=True, factible=True):
+    progreso = progreso or Progreso()
+    experiencia = experiencia_por_par(instancia)
+    disponibilidad = disponibilidad_por_franja(instancia)
+
     # Registrar funciones en el toolbox
-    toolbox.register("attr_class", create_class, df_profesores, df_materias, df_salones)
-    toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_class, n=len(df_materias))
+    if factible:
+        indices = IndicesFactibles(instancia, disponibilidad)
+        toolbox.register("individual", crear_individuo_factible, instancia, indices)
+        toolbox.register("mutate", mutar_genes, instancia=instancia, indices=indices, indpb=0.05)
+    else:
+        toolbox.register("attr_class", create_class, instancia)
+        toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_class, n=instancia.n_materias)
+        toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.05)
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-    toolbox.register("evaluate", evalSchedule, df_profesores=df_profesores, df_materias=df_materias, 
-                     df_salones=df_salones, df_profesor_materia=df_profesor_materia, 
-                     model=model, le_profesores=le_profesores, le_materias=le_materias)
+    cache = CacheFitness(partial(evalSchedule, instancia=instancia, model=model, experiencia=experiencia,
+                                  disponibilidad=disponibilidad, penalizacion=penalizacion))
+    toolbox.register("evaluate", cache)
     toolbox.register("mate", tools.cxTwoPoint)
-    toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.05)
     toolbox.register("select", tools.selTournament, tournsize=3)
 
-    random.seed(42)
-    pop = toolbox.population(n=300)
+    random.seed(semilla)
+    pop = toolbox.population(n=poblacion)
     hof = tools.HallOfFame(1)
     stats = tools.Statistics(lambda ind: ind.fitness.values)
     stats.register("avg", np.mean)
     stats.register("std", np.std)
     stats.register("min", np.min)
     stats.register("max", np.max)
-    
-    pop, log = algorithms.eaSimple(pop, toolbox, cxpb=0.5, mutpb=0.2, ngen=50, 
-                                   stats=stats, halloffame=hof, verbose=True)
-    
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals', 'aciertos', 'fallos'] + stats.fields
+
+    for gen in range(ngen + 1):
+        progreso.verificar()
+        if gen > 0:
+            pop = algorithms.varAnd(toolbox.select(pop, len(pop)), toolbox, cxpb, mutpb)
+
+        # Evaluar solo los individuos nuevos o modificados (los repetidos salen de la caché)
+        aciertos, fallos = cache.aciertos, cache.fallos
+        invalid_ind = [ind for ind in pop if not ind.fitness.valid]
+        for ind, fit in zip(invalid_ind, map(toolbox.evaluate, invalid_ind)):
+            ind.fitness.values = fit
+
+        hof.update(pop)
+        logbook.record(gen=gen, nevals=len(invalid_ind), aciertos=cache.aciertos - aciertos,
+                       fallos=cache.fallos - fallos, **stats.compile(pop))
+        if verbose:
+            print(logbook.stream)
+        progreso.reportar(etapa='evolucionando', generacion=gen, total=ngen, mejor=hof[0].fitness.values[0])
+
     return hof[0]
 
+# Función para generar el mejor horario como DataFrame listo para mostrar y guardar
+def generar_mejor_horario(instancia, model, progreso=None, **parametros):
+    best = generate_schedule(instancia, model, progreso, **parametros)
+    return horario_desde_individuo(best, instancia)
+
+# Función para convertir un individuo (lista de genes) al DataFrame del horario
+def horario_desde_individuo(individual, instancia):
+    clases = [Clase(profesor, materia, salon, dia, *BLOQUES_MINUTOS[bloque]) for profesor, materia, salon, dia, bloque in individual]
+    return asignar_grupos(instancia.clases_a_dataframe(clases))
+
 # Función principal de Streamlit
 def main():
     st.title('Generador de Horarios UTS con Machine Learning')
     
     st.write("Preparando datos...")
-    df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia, model, le_profesores, le_materias = prepare_data()
+    instancia, model, huella = prepare_data()
     st.write("Datos preparados.")
 
+    # La generación corre como trabajo en segundo plano; la página sigue su progreso
     if st.button('Generar Horario'):
-        with st.spinner('Generando horario...'):
-            best = generate_schedule(df_profesores, df_materias, df_salones, df_profesor_materia, model, le_profesores, le_materias)
-        
-        st.success("Horario generado con éxito")
-        
-        # Crear DataFrame con el mejor horario
-        mejor_horario = pd.DataFrame(best, columns=['profesor_id', 'materia_id', 'salon_id', 'dia', 'hora_inicio'])
-        mejor_horario['hora_fin'] = mejor_horario['hora_inicio'].apply(lambda x: x.split('-')[1])
-        mejor_horario['hora_inicio'] = mejor_horario['hora_inicio'].apply(lambda x: x.split('-')[0])
-        mejor_horario['grupo'] = mejor_horario.index + 1
-        mejor_horario['alumnos'] = mejor_horario['materia_id'].map(df_materias.set_index('id')['alumnos'])
-
-        st.write(mejor_horario)
-
-        if st.button('Guardar Horario en la Base de Datos'):
+        enviar_trabajo('ga', huella, instancia, model)
+
+    # El horario queda en la sesión: guardar o interactuar no obliga a regenerarlo
+    entrada = seguir_trabajo('ga', huella)
+    if entrada is not None:
+        mejor_horario = entrada['resultado']
+        st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+        mostrar_vista_horario(mejor_horario, instancia=instancia, clave='ga')
+
+        # El guardado rechaza horarios con violaciones: se muestran y se ofrece quitarlas
+        violaciones = validar_horario(mejor_horario, instancia)
+        if len(violaciones):
+            for mensaje in mensajes(resumen_violaciones(violaciones)):
+                st.warning(mensaje)
+            clases_malas = violaciones['fila'].nunique()
+            if st.button(f'Reparar horario (quitar {clases_malas} de {len(mejor_horario)} clases con violaciones)'):
+                guardar_resultado('ga', huella, reparar_horario(mejor_horario, instancia), **entrada['metricas'])
+                st.rerun()
+
+        if st.button('Guardar Horario en la Base de Datos', disabled=len(violaciones) > 0):
             with st.spinner('Guardando horario...'):
-                for _, row in mejor_horario.iterrows():
-                    data = row.to_dict()
-                    response = requests.post(f"{BASE_URL}/clases", json=data)
-                    if response.status_code != 201:
-                        st.error(f"Error al guardar clase: {response.status_code}")
-                    else:
-                        st.success(f"Clase guardada con éxito: {response.json()['id']}")
-
-            st.success("Proceso completado. El horario ha sido guardado en la base de datos.")
+                resumen = guardar_horario(mejor_horario, instancia)
+
+            if resumen is not None:
+                for error in resumen['errores']:
+                    st.error(f"Error al guardar clase: {error}")
+                st.success(f"Proceso completado. Clases insertadas: {resumen['insertadas']}, "
+                           f"actualizadas: {resumen['actualizadas']}, eliminadas: {resumen['eliminadas']}.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,214 @@
+import itertools
+import json
+import streamlit as st
+import numpy as np
+import pandas as pd
+import requests
+from array import array
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# URL base para las solicitudes a la API
+BASE_URL = "http://localhost:8000/api"
+
+# Registros por página al pedir colecciones paginadas
+TAMANO_PAGINA = 5000
+
+# Tipo de cada columna por colección:
+#   'id'  -> int32          'int' -> int32          'int64' -> int64
+#   'hora' -> minutos desde medianoche (int16)      'cat' -> categórica
+#   'str' -> texto
+ESQUEMAS = {
+    'profesores': {'id': 'id', 'tipo_cedula': 'cat', 'cedula': 'int64', 'nombre': 'str',
+                   'tipo_contrato': 'cat', 'estado': 'cat', 'image_path': 'str'},
+    'materias': {'id': 'id', 'codigo': 'str', 'nombre': 'str', 'alumnos': 'int', 'bloques': 'int'},
+    'salones': {'id': 'id', 'codigo': 'str', 'capacidad_alumnos': 'int', 'tipo': 'cat'},
+    'horarios_disponibles': {'id': 'id', 'dia': 'cat', 'hora_inicio': 'hora', 'hora_fin': 'hora', 'profesor_id': 'id'},
+    'profesor_materia': {'id': 'id', 'profesor_id': 'id', 'materia_id': 'id',
+                         'experiencia': 'int', 'calificacion_alumno': 'int'},
+    'clases': {'id': 'id', 'grupo': 'str', 'dia_semana': 'cat', 'hora_inicio': 'hora', 'hora_fin': 'hora',
+               'alumnos': 'int', 'materia_id': 'id', 'salon_id': 'id', 'profesor_id': 'id'},
+}
+
+CODIGOS_ARRAY = {'id': 'i', 'int': 'i', 'int64': 'q', 'hora': 'h'}
+TIPOS_NUMPY = {'id': np.int32, 'int': np.int32, 'int64': np.int64, 'hora': np.int16}
+
+# Valor usado cuando un registro no trae la columna
+FALTANTE = -1
+
+
+# Función para convertir 'HH:MM' o 'HH:MM:SS' a minutos desde medianoche
+def hora_a_minutos(hora):
+    if hora is None:
+        return FALTANTE
+    partes = str(hora).split(':')
+    return int(partes[0]) * 60 + int(partes[1])
+
+
+# Función para convertir minutos desde medianoche de vuelta a 'HH:MM'
+def minutos_a_hora(minutos):
+    if isinstance(minutos, (pd.Series, np.ndarray)):
+        minutos = pd.Series(minutos)
+        return (minutos // 60).map('{:02d}'.format) + ':' + (minutos % 60).map('{:02d}'.format)
+    return f"{int(minutos) // 60:02d}:{int(minutos) % 60:02d}"
+
+
+# Acumula registros directamente en buffers por columna, sin guardar los dicts
+class BufferColumnas:
+    def __init__(self, esquema):
+        self.esquema = esquema
+        self.buffers = {}
+        self.categorias = {}
+        for columna, tipo in esquema.items():
+            if tipo == 'cat':
+                self.buffers[columna] = array('h')
+                self.categorias[columna] = {}
+            elif tipo == 'str':
+                self.buffers[columna] = []
+            else:
+                self.buffers[columna] = array(CODIGOS_ARRAY[tipo])
+
+    def agregar(self, registro):
+        for columna, tipo in self.esquema.items():
+            valor = registro.get(columna)
+            if tipo == 'hora':
+                self.buffers[columna].append(hora_a_minutos(valor))
+            elif tipo == 'cat':
+                if valor is None:
+                    self.buffers[columna].append(FALTANTE)
+                else:
+                    categorias = self.categorias[columna]
+                    self.buffers[columna].append(categorias.setdefault(valor, len(categorias)))
+            elif tipo == 'str':
+                self.buffers[columna].append(valor)
+            else:
+                self.buffers[columna].append(FALTANTE if valor is None else int(valor))
+
+    def a_dataframe(self):
+        columnas = {}
+        for columna, tipo in self.esquema.items():
+            buffer = self.buffers[columna]
+            if tipo == 'cat':
+                codigos = np.frombuffer(buffer, dtype=np.int16) if len(buffer) else np.zeros(0, dtype=np.int16)
+                columnas[columna] = pd.Categorical.from_codes(codigos, categories=list(self.categorias[columna]))
+            elif tipo == 'str':
+                columnas[columna] = pd.Series(buffer, dtype=object)
+            elif len(buffer):
+                columnas[columna] = np.frombuffer(buffer, dtype=TIPOS_NUMPY[tipo])
+            else:
+                columnas[columna] = np.zeros(0, dtype=TIPOS_NUMPY[tipo])
+        return pd.DataFrame(columnas)
+
+
+# Lector tipo archivo sobre los fragmentos de una respuesta HTTP (para ijson)
+class _FlujoRespuesta:
+    def __init__(self, primero, resto):
+        self.pendiente = primero
+        self.resto = resto
+
+    def read(self, n=-1):
+        while self.pendiente == b'' or (n >= 0 and len(self.pendiente) < n):
+            fragmento = next(self.resto, None)
+            if fragmento is None:
+                break
+            self.pendiente += fragmento
+        if n < 0:
+            n = len(self.pendiente)
+        datos, self.pendiente = self.pendiente[:n], self.pendiente[n:]
+        return datos
+
+
+# Función para recorrer los registros de una colección página por página
+# Acepta respuestas paginadas ({"data": [...], "next_page_url": ...}) y listas
+# planas; estas últimas se leen en streaming con ijson cuando está instalado.
+# `filtros` se agrega a la consulta de la primera página (p. ej. {'updated_since': ...}).
+def iterar_registros(endpoint, session=None, tamano_pagina=TAMANO_PAGINA, filtros=None):
+    session = session or requests.Session()
+    url = f"{BASE_URL}/{endpoint}"
+    params = {'page': 1, 'per_page': tamano_pagina, **(filtros or {})}
+
+    while url:
+        with session.get(url, params=params, stream=True) as response:
+            response.raise_for_status()
+            fragmentos = response.iter_content(chunk_size=1 << 16)
+            primero = next(fragmentos, b'')
+            if ijson is not None and primero.lstrip()[:1] == b'[':
+                yield from ijson.items(_FlujoRespuesta(primero, fragmentos), 'item', use_float=True)
+                return
+            pagina = json.loads(primero + b''.join(fragmentos))
+
+        if isinstance(pagina, list):
+            yield from pagina
+            return
+
+        yield from pagina.get('data', [])
+        url = pagina.get('next_page_url') or (pagina.get('links') or {}).get('next')
+        params = None
+
+
+# Función para leer una sola página de una colección sin descargar el resto
+# Devuelve (tabla, total); total es None si la API no lo informa. Si la API
+# ignora la paginación y responde la lista completa, se lee en streaming solo
+# hasta el final de la página pedida y se cierra la conexión.
+def leer_pagina(endpoint, pagina=1, tamano_pagina=TAMANO_PAGINA, session=None):
+    session = session or requests.Session()
+    buffer = BufferColumnas(ESQUEMAS[endpoint])
+    params = {'page': pagina, 'per_page': tamano_pagina}
+    with session.get(f"{BASE_URL}/{endpoint}", params=params, stream=True) as response:
+        response.raise_for_status()
+        fragmentos = response.iter_content(chunk_size=1 << 16)
+        primero = next(fragmentos, b'')
+        if primero.lstrip()[:1] == b'[':
+            if ijson is not None:
+                registros = ijson.items(_FlujoRespuesta(primero, fragmentos), 'item', use_float=True)
+            else:
+                registros = iter(json.loads(primero + b''.join(fragmentos)))
+            inicio = (pagina - 1) * tamano_pagina
+            for registro in itertools.islice(registros, inicio, inicio + tamano_pagina):
+                buffer.agregar(registro)
+            return buffer.a_dataframe(), None
+        datos = json.loads(primero + b''.join(fragmentos))
+    for registro in datos.get('data', []):
+        buffer.agregar(registro)
+    return buffer.a_dataframe(), datos.get('total', (datos.get('meta') or {}).get('total'))
+
+
+# Función para tomar una muestra de una colección pidiendo unas pocas páginas al azar
+# Necesita que la API informe el total; si no, la muestra son las primeras `n` filas.
+# Devuelve (tabla, aleatoria).
+def muestrear_tabla(endpoint, n, paginas=5, semilla=None, session=None):
+    session = session or requests.Session()
+    tamano = max(1, -(-n // paginas))
+    primera, total = leer_pagina(endpoint, 1, tamano, session)
+    if total is None or total <= n:
+        return leer_pagina(endpoint, 1, n, session)[0], False
+    ultima = -(-total // tamano)
+    elegidas = np.random.default_rng(semilla).choice(np.arange(1, ultima + 1), size=min(paginas, ultima), replace=False)
+    partes = [primera if p == 1 else leer_pagina(endpoint, int(p), tamano, session)[0] for p in sorted(elegidas)]
+    muestra = pd.concat(partes, ignore_index=True)
+    for columna, tipo in ESQUEMAS[endpoint].items():
+        if tipo == 'cat':
+            muestra[columna] = muestra[columna].astype('category')
+    return muestra, True
+
+
+# Función para cargar una colección de la API directamente en columnas tipadas
+def cargar_tabla(endpoint, session=None):
+    buffer = BufferColumnas(ESQUEMAS[endpoint])
+    try:
+        for registro in iterar_registros(endpoint, session):
+            buffer.agregar(registro)
+    except requests.RequestException as e:
+        st.error(f"Error al obtener datos de {endpoint}: {str(e)}")
+        return None
+    return buffer.a_dataframe()
+
+
+# Función para cargar las cinco colecciones usadas por los generadores
+def cargar_tablas():
+    session = requests.Session()
+    return tuple(cargar_tabla(endpoint, session) for endpoint in
+                 ('profesores', 'materias', 'salones', 'horarios_disponibles', 'profesor_materia'))
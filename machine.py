@@ -2,12 +2,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from ortools.sat.python import cp_model
 import requests
 from faker import Faker
+from ingesta import cargar_tabla, cargar_tablas, minutos_a_hora
+from sesion import huella_datos, ejecutar_con_cache, obtener_resultado
+from modelo_datos import Instancia, horas_a_minutos
+from validacion import validar_horario, resumen_violaciones
+from diagnostico import mensajes
+from vistas import mostrar_vista_horario
 
 # Nuevas importaciones para machine learning
 from sklearn.preprocessing import OneHotEncoder
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
 from tensorflow.keras.optimizers import Adam
@@ -24,6 +32,13 @@ fake = Faker()
 # URL base para las solicitudes a la API
 BASE_URL = "http://localhost:8000/api"
 
+# Tamaño de lote para el entrenamiento y la predicción
+TAMANO_LOTE = 32
+TAMANO_LOTE_PREDICCION = 1024
+
+# Mínimo de filas para separar un conjunto de validación al entrenar
+MIN_FILAS_VALIDACION = 5
+
 # Función para obtener los datos desde la API
 def get_data(endpoint):
     try:
@@ -48,30 +63,94 @@ def post_data(endpoint, data):
 def generar_acronimo():
     return fake.unique.bothify(text='??##', letters='ABCDEFGHIJKLMNOPQRSTUVWXYZ')
 
-def preprocesar_datos_ml(profesores, materias, salones, horarios_disponibles, profesor_materia):
+# Función para combinar horarios, profesor-materia y materias en una sola tabla
+def combinar_datos_ml(profesores, materias, horarios_disponibles, profesor_materia):
     # Crear DataFrames
     df_profesores = pd.DataFrame(profesores)
     df_materias = pd.DataFrame(materias)
-    df_salones = pd.DataFrame(salones)
     df_horarios = pd.DataFrame(horarios_disponibles)
     df_prof_mat = pd.DataFrame(profesor_materia)
     
-    # Combinar datos
+    # Combinar datos (solo con las columnas que se usan como características)
     df_combined = pd.merge(df_horarios, df_prof_mat, on='profesor_id')
-    df_combined = pd.merge(df_combined, df_materias, left_on='materia_id', right_on='id')
-    df_combined = pd.merge(df_combined, df_profesores, left_on='profesor_id', right_on='id')
+    df_combined = pd.merge(df_combined, df_materias[['id', 'alumnos']].rename(columns={'id': 'materia_id'}), on='materia_id')
+    df_combined = df_combined[df_combined['profesor_id'].isin(df_profesores['id'])]
     
-    # One-hot encoding para variables categóricas
-    encoder = OneHotEncoder(sparse=False)
-    encoded_features = encoder.fit_transform(df_combined[['dia', 'hora_inicio', 'profesor_id', 'materia_id']])
+    return df_combined.reset_index(drop=True)
+
+# Función para etiquetar cada fila combinada con el salón (posición en `salones`) que
+# tiene esa clase en un horario guardado, uniendo por profesor, materia, día y hora
+# de inicio. Las filas sin clase guardada quedan en -1.
+def etiquetas_salon(df_combined, salones, clases):
+    clave = ['profesor_id', 'materia_id', 'dia', 'hora_inicio']
+    guardadas = pd.DataFrame({
+        'profesor_id': clases['profesor_id'].to_numpy(dtype=np.int64),
+        'materia_id': clases['materia_id'].to_numpy(dtype=np.int64),
+        'dia': clases['dia_semana'].astype(str).str.lower().to_numpy(),
+        'hora_inicio': horas_a_minutos(clases['hora_inicio']).astype(np.int64),
+        'salon': pd.Index(pd.DataFrame(salones)['id']).get_indexer(clases['salon_id'].to_numpy()),
+    }).drop_duplicates(clave)
+    filas = pd.DataFrame({
+        'profesor_id': df_combined['profesor_id'].to_numpy(dtype=np.int64),
+        'materia_id': df_combined['materia_id'].to_numpy(dtype=np.int64),
+        'dia': df_combined['dia'].astype(str).str.lower().to_numpy(),
+        'hora_inicio': horas_a_minutos(df_combined['hora_inicio']).astype(np.int64),
+    })
+    return filas.merge(guardadas, on=clave, how='left')['salon'].fillna(-1).to_numpy(dtype=np.int64)
+
+# Función para armar los datos de entrenamiento de la red
+# La etiqueta es el salón de cada clase en el horario guardado (/api/clases); solo
+# se entrena con las filas que tienen una. Sin ninguna se lanza ValueError.
+def preprocesar_datos_ml(profesores, materias, salones, horarios_disponibles, profesor_materia, clases, encoder=None):
+    df_combined = combinar_datos_ml(profesores, materias, horarios_disponibles, profesor_materia)
+    X, encoder = codificar_caracteristicas(df_combined, encoder)
+    y = etiquetas_salon(df_combined, salones, clases) if clases is not None else np.full(X.shape[0], -1)
+    etiquetadas = y >= 0
+    if not etiquetadas.any():
+        raise ValueError("No hay etiquetas para entrenar la red: ninguna clase del horario guardado "
+                         "(/api/clases) coincide con la disponibilidad y las materias de los profesores")
+    return X[etiquetadas], y[etiquetadas], encoder
+
+# Función para construir la matriz de características a partir de la tabla combinada
+def codificar_caracteristicas(df_combined, encoder=None):
+    # One-hot encoding disperso para variables categóricas: la matriz crece con
+    # las filas, no con filas × (profesores + materias + franjas)
+    columnas = df_combined[['dia', 'hora_inicio', 'profesor_id', 'materia_id']]
+    if encoder is None:
+        encoder = OneHotEncoder(handle_unknown='ignore', dtype=np.float32)
+        encoded_features = encoder.fit_transform(columnas)
+    else:
+        encoded_features = encoder.transform(columnas)
     
     # Crear matriz de características
-    X = np.hstack((encoded_features, df_combined[['alumnos']].values))
+    X = sparse.hstack((encoded_features, sparse.csr_matrix(df_combined[['alumnos']].values, dtype=np.float32)), format='csr')
+    
+    return X, encoder
+
+# Función para recorrer la matriz dispersa por lotes con tf.data
+# Cada lote se densifica solo al momento de entregarlo al modelo.
+def crear_dataset(X, y=None, filas=None, batch_size=TAMANO_LOTE, shuffle=False, seed=42):
+    if filas is None:
+        filas = np.arange(X.shape[0])
+    rng = np.random.default_rng(seed)
+    
+    def generador():
+        orden = rng.permutation(filas) if shuffle else filas
+        for inicio in range(0, len(orden), batch_size):
+            lote = orden[inicio:inicio + batch_size]
+            if y is None:
+                yield X[lote].toarray()
+            else:
+                yield X[lote].toarray(), y[lote]
     
-    # La variable objetivo podría ser la asignación de salón
-    y = df_combined['salon_id'].values
+    spec_x = tf.TensorSpec(shape=(None, X.shape[1]), dtype=tf.float32)
+    if y is None:
+        signature = spec_x
+    else:
+        signature = (spec_x, tf.TensorSpec(shape=(None,), dtype=tf.int64))
     
-    return X, y, encoder
+    dataset = tf.data.Dataset.from_generator(generador, output_signature=signature)
+    return dataset.prefetch(tf.data.AUTOTUNE)
 
 def crear_modelo(input_shape, num_salones):
     model = Sequential([
@@ -91,66 +170,144 @@ def crear_modelo(input_shape, num_salones):
 
 def entrenar_modelo(X, y, num_salones):
     model = crear_modelo(X.shape[1], num_salones)
-    history = model.fit(X, y, epochs=50, batch_size=32, validation_split=0.2, verbose=1)
+    
+    # Separar el 20% final para validación, igual que validation_split
+    # Con muy pocas filas se entrena con todas y sin validación (un conjunto vacío hace fallar a fit)
+    y = np.asarray(y, dtype=np.int64)
+    if X.shape[0] < MIN_FILAS_VALIDACION:
+        corte = X.shape[0]
+    else:
+        corte = min(int(X.shape[0] * 0.8), X.shape[0] - 1)
+    dataset_entrenamiento = crear_dataset(X, y, filas=np.arange(corte), shuffle=True)
+    dataset_validacion = crear_dataset(X, y, filas=np.arange(corte, X.shape[0])) if corte < X.shape[0] else None
+    
+    history = model.fit(dataset_entrenamiento, validation_data=dataset_validacion, epochs=50, verbose=1)
     return model, history
 
 def generar_horario_ml(model, encoder, profesores, materias, salones, horarios_disponibles, profesor_materia):
     # Preprocesar datos de entrada
-    X, _, _ = preprocesar_datos_ml(profesores, materias, salones, horarios_disponibles, profesor_materia)
+    df_combined = combinar_datos_ml(profesores, materias, horarios_disponibles, profesor_materia)
+    X, _ = codificar_caracteristicas(df_combined, encoder)
     
-    # Predecir asignaciones de salones
-    predicciones = model.predict(X)
-    salon_asignados = np.argmax(predicciones, axis=1)
+    # Decodificar las predicciones respetando capacidad y choques
+    salon_asignados = decodificar_salones(model, X, df_combined, salones)
+    
+    # Crear horario solo con las filas que recibieron un salón válido
+    asignadas = salon_asignados >= 0
+    df_horario = df_combined.loc[asignadas, ['dia', 'hora_inicio', 'hora_fin', 'alumnos', 'materia_id', 'profesor_id']]
+    df_horario = df_horario.rename(columns={'dia': 'dia_semana'})
+    df_horario['dia_semana'] = df_horario['dia_semana'].astype(str)
+    for columna in ('hora_inicio', 'hora_fin'):
+        if pd.api.types.is_integer_dtype(df_horario[columna]):
+            df_horario[columna] = minutos_a_hora(df_horario[columna]).to_numpy()
+    df_horario['salon_id'] = pd.DataFrame(salones)['id'].to_numpy()[salon_asignados[asignadas]]
     
-    # Crear horario
     horario_generado = []
-    for i, (_, horario) in enumerate(pd.DataFrame(horarios_disponibles).iterrows()):
-        clase_data = {
-            'grupo': generar_acronimo(),
-            'dia_semana': horario['dia'],
-            'hora_inicio': horario['hora_inicio'],
-            'hora_fin': horario['hora_fin'],
-            'alumnos': int(materias[i]['alumnos']),
-            'materia_id': int(materias[i]['id']),
-            'salon_id': int(salones[salon_asignados[i]]['id']),
-            'profesor_id': int(profesores[i]['id'])
-        }
+    for clase in df_horario.to_dict('records'):
+        clase_data = {'grupo': generar_acronimo()}
+        clase_data.update({k: (v.item() if hasattr(v, 'item') else v) for k, v in clase.items()})
         horario_generado.append(clase_data)
     
     return horario_generado
 
-# En la función main
+# Función para decodificar las probabilidades del modelo en salones válidos
+# Se predice por lotes de tamaño fijo con el modelo ya cargado. En cada lote se
+# anulan (probabilidad 0) los salones sin capacidad suficiente y los que ya
+# están ocupados en esa franja, y se asigna de forma voraz empezando por las
+# filas con mayor confianza. Devuelve el índice del salón por fila (-1 si no hay).
+def decodificar_salones(model, X, df_combined, salones):
+    capacidades = pd.DataFrame(salones)['capacidad_alumnos'].to_numpy()
+    alumnos = df_combined['alumnos'].to_numpy()
+    franjas = df_combined.groupby(['dia', 'hora_inicio'], sort=False, observed=True).ngroup().to_numpy()
+    profesores_idx = pd.factorize(df_combined['profesor_id'])[0]
+    
+    n_franjas = franjas.max() + 1 if len(franjas) else 0
+    salon_ocupado = np.zeros((n_franjas, len(salones)), dtype=bool)
+    profesor_ocupado = np.zeros((n_franjas, profesores_idx.max() + 1 if len(franjas) else 0), dtype=bool)
+    asignacion = np.full(X.shape[0], -1, dtype=np.int64)
+    
+    for inicio in range(0, X.shape[0], TAMANO_LOTE_PREDICCION):
+        filas = np.arange(inicio, min(inicio + TAMANO_LOTE_PREDICCION, X.shape[0]))
+        probabilidades = np.asarray(model.predict_on_batch(X[filas].toarray()))
+        probabilidades[alumnos[filas, None] > capacidades[None, :]] = 0
+        
+        for r in np.argsort(-probabilidades.max(axis=1), kind='stable'):
+            fila = filas[r]
+            franja = franjas[fila]
+            if profesor_ocupado[franja, profesores_idx[fila]]:
+                continue
+            candidatos = np.where(salon_ocupado[franja], 0, probabilidades[r])
+            salon = candidatos.argmax()
+            if candidatos[salon] <= 0:
+                continue
+            asignacion[fila] = salon
+            salon_ocupado[franja, salon] = True
+            profesor_ocupado[franja, profesores_idx[fila]] = True
+    
+    return asignacion
+
+# Función para cargar los datos una sola vez entre reruns de Streamlit
+@st.cache_data
+def cargar_datos():
+    return cargar_tablas()
+
+# Función para cargar el horario guardado, del que salen las etiquetas de la red
+@st.cache_data
+def cargar_clases():
+    return cargar_tabla('clases')
+
+# Función para entrenar el modelo o reutilizar el que ya está en la sesión
+def obtener_modelo(huella, profesores, materias, salones, horarios_disponibles, profesor_materia, clases):
+    guardado = st.session_state.get('modelo_ml')
+    if guardado is not None and guardado['huella'] == huella:
+        return guardado['model'], guardado['encoder']
+    
+    X, y, encoder = preprocesar_datos_ml(profesores, materias, salones, horarios_disponibles, profesor_materia, clases)
+    model, history = entrenar_modelo(X, y, len(salones))
+    st.session_state['modelo_ml'] = {'huella': huella, 'model': model, 'encoder': encoder, 'history': history.history}
+    return model, encoder
+
 def main():
     st.title('Generador de Horarios UTS con Machine Learning')
     
-    # Obtener datos
-    profesores = get_data('profesores')
-    materias = get_data('materias')
-    salones = get_data('salones')
-    horarios_disponibles = get_data('horarios_disponibles')
-    profesor_materia = get_data('profesor_materia')
+    # Obtener datos directamente en columnas tipadas (ids int32, dia categórico, horas en minutos)
+    profesores, materias, salones, horarios_disponibles, profesor_materia = cargar_datos()
     
-    if all([profesores, materias, salones, horarios_disponibles, profesor_materia]):
+    if all(df is not None for df in [profesores, materias, salones, horarios_disponibles, profesor_materia]):
         st.success("Datos cargados correctamente")
         
+        # Modelo y horario quedan en la sesión: los reruns no reentrenan ni regeneran
+        # La red se entrena con los salones del horario guardado, que también entra en la huella
+        clases = cargar_clases()
+        huella = huella_datos(profesores, materias, salones, horarios_disponibles, profesor_materia, clases)
         if st.button('Entrenar modelo y generar horario'):
-            with st.spinner('Entrenando modelo de ML...'):
-                X, y, encoder = preprocesar_datos_ml(profesores, materias, salones, horarios_disponibles, profesor_materia)
-                model, history = entrenar_modelo(X, y, len(salones))
+            try:
+                with st.spinner('Entrenando modelo de ML...'):
+                    model, encoder = obtener_modelo(huella, profesores, materias, salones, horarios_disponibles, profesor_materia, clases)
+            except ValueError as e:
+                st.error(str(e))
+                return
                 
             st.success('Modelo entrenado. Generando horario...')
             
-            horario_generado = generar_horario_ml(model, encoder, profesores, materias, salones, horarios_disponibles, profesor_materia)
-            
+            ejecutar_con_cache('ml', huella, generar_horario_ml, model, encoder, profesores, materias, salones, horarios_disponibles, profesor_materia)
+        
+        entrada = obtener_resultado('ml', huella)
+        if entrada is not None:
+            horario_generado = entrada['resultado']
             if horario_generado:
-                st.success('Horario generado con éxito')
-                df_horario = crear_vista_horario(horario_generado, pd.DataFrame(profesores), pd.DataFrame(materias), pd.DataFrame(salones))
+                st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+                
+                # La red no revisa choques ni habilitación: el horario se valida antes de mostrarlo
+                instancia = Instancia(profesores, materias, salones, horarios_disponibles, profesor_materia)
+                for mensaje in mensajes(resumen_violaciones(validar_horario(horario_generado, instancia))):
+                    st.warning(mensaje)
                 st.write("Vista del Horario:")
-                st.dataframe(df_horario.style.set_properties(**{'white-space': 'pre-wrap'}))
+                mostrar_vista_horario(horario_generado, profesores, materias, salones, clave='ml')
             else:
                 st.error('No fue posible generar el horario')
     else:
         st.error('No se pudieron cargar todos los datos necesarios.')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
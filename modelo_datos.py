@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+from ingesta import ESQUEMAS, BufferColumnas, minutos_a_hora
+
+# Definir los días de la semana y los bloques de horario
+DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
+BLOQUES = ['06:00-07:30', '07:30-09:00', '09:00-10:30', '10:30-12:00', '12:00-13:30',
+           '13:30-15:00', '15:00-16:30', '16:30-18:00', '18:00-19:30', '19:30-21:00']
+
+
+# Función para convertir una columna de horas 'HH:MM' a minutos desde medianoche
+# Si la columna ya viene en minutos (ingesta tipada) se devuelve tal cual.
+def horas_a_minutos(horas):
+    horas = pd.Series(horas)
+    if pd.api.types.is_integer_dtype(horas):
+        return horas.to_numpy(dtype=np.int16)
+    partes = horas.astype(str).str.extract(r'^\s*(\d{1,2}):(\d{2})')
+    return (partes[0].astype(int) * 60 + partes[1].astype(int)).to_numpy(dtype=np.int16)
+
+
+# Inicio y fin de cada bloque en minutos, calculado una sola vez
+BLOQUES_MINUTOS = np.array([horas_a_minutos(b.split('-')) for b in BLOQUES], dtype=np.int16)
+
+
+# Función para construir una tabla tipada a partir de la lista JSON de la API
+def tabla_desde_json(endpoint, registros):
+    if isinstance(registros, pd.DataFrame):
+        return registros
+    buffer = BufferColumnas(ESQUEMAS[endpoint])
+    for registro in registros:
+        buffer.agregar(registro)
+    return buffer.a_dataframe()
+
+
+# Una clase del horario con códigos compactos (índices en la Instancia)
+class Clase:
+    __slots__ = ('profesor', 'materia', 'salon', 'dia', 'inicio', 'fin')
+
+    def __init__(self, profesor, materia, salon, dia, inicio, fin):
+        self.profesor = profesor
+        self.materia = materia
+        self.salon = salon
+        self.dia = dia
+        self.inicio = inicio
+        self.fin = fin
+
+    def __repr__(self):
+        return f"Clase(profesor={self.profesor}, materia={self.materia}, salon={self.salon}, dia={self.dia}, inicio={self.inicio}, fin={self.fin})"
+
+
+# Representación compacta compartida de los datos de un problema de horarios
+# Profesores, materias, salones y días se guardan como códigos enteros densos
+# (0..n-1) y cada tabla como arreglos de numpy. Los ids de la API solo se usan
+# al entrar (desde_json / constructor) y al salir (clases_a_json).
+class Instancia:
+    __slots__ = ('profesor_ids', 'profesor_cedulas', 'materia_ids', 'materia_nombres', 'materia_alumnos',
+                 'salon_ids', 'salon_codigos', 'salon_capacidad', 'dias',
+                 'disp_profesor', 'disp_dia', 'disp_inicio', 'disp_fin',
+                 'pm_profesor', 'pm_materia', 'pm_experiencia', 'pm_calificacion')
+
+    def __init__(self, df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia):
+        self.profesor_ids = df_profesores['id'].to_numpy(dtype=np.int32)
+        self.profesor_cedulas = df_profesores['cedula'].to_numpy() if 'cedula' in df_profesores else self.profesor_ids
+        self.materia_ids = df_materias['id'].to_numpy(dtype=np.int32)
+        self.materia_nombres = df_materias['nombre'].to_numpy(dtype=object)
+        self.materia_alumnos = df_materias['alumnos'].to_numpy(dtype=np.int32)
+        self.salon_ids = df_salones['id'].to_numpy(dtype=np.int32)
+        self.salon_codigos = df_salones['codigo'].to_numpy(dtype=object)
+        self.salon_capacidad = df_salones['capacidad_alumnos'].to_numpy(dtype=np.int32)
+
+        self._cargar_disponibilidad(df_horarios_disponibles)
+        self._cargar_profesor_materia(df_profesor_materia)
+
+    # Disponibilidad: se descartan filas de profesores que no existen
+    def _cargar_disponibilidad(self, df_horarios_disponibles):
+        disp_profesor = self.codigos_profesor(df_horarios_disponibles['profesor_id'])
+        validas = disp_profesor >= 0
+        dias_tabla = df_horarios_disponibles['dia'].astype(str).to_numpy()[validas]
+        self.dias = DIAS + sorted(set(dias_tabla) - set(DIAS))
+        self.disp_profesor = disp_profesor[validas]
+        self.disp_dia = pd.Index(self.dias).get_indexer(dias_tabla).astype(np.int8)
+        self.disp_inicio = horas_a_minutos(df_horarios_disponibles['hora_inicio'])[validas]
+        self.disp_fin = horas_a_minutos(df_horarios_disponibles['hora_fin'])[validas]
+
+    # Profesor-materia: se descartan relaciones con profesor o materia inexistente
+    def _cargar_profesor_materia(self, df_profesor_materia):
+        pm_profesor = self.codigos_profesor(df_profesor_materia['profesor_id'])
+        pm_materia = self.codigos_materia(df_profesor_materia['materia_id'])
+        validas = (pm_profesor >= 0) & (pm_materia >= 0)
+        self.pm_profesor = pm_profesor[validas]
+        self.pm_materia = pm_materia[validas]
+        self.pm_experiencia = df_profesor_materia['experiencia'].to_numpy(dtype=np.int32)[validas]
+        self.pm_calificacion = df_profesor_materia['calificacion_alumno'].to_numpy(dtype=np.int32)[validas]
+
+    # Devuelve una instancia al día con las tablas nuevas, recalculando solo lo que cambió
+    # Si cambian profesores, materias o salones los códigos densos se mueven y se
+    # reconstruye todo; si solo cambian disponibilidad o profesor-materia se
+    # reutilizan los arreglos de entidades y se recalculan esas tablas.
+    def actualizar(self, tablas_cambiadas, df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia):
+        if set(tablas_cambiadas) & {'profesores', 'materias', 'salones'}:
+            return Instancia(df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia)
+        nueva = object.__new__(Instancia)
+        for atributo in Instancia.__slots__:
+            setattr(nueva, atributo, getattr(self, atributo))
+        if 'horarios_disponibles' in tablas_cambiadas:
+            nueva._cargar_disponibilidad(df_horarios_disponibles)
+        if 'profesor_materia' in tablas_cambiadas:
+            nueva._cargar_profesor_materia(df_profesor_materia)
+        return nueva
+
+    @classmethod
+    def desde_json(cls, profesores, materias, salones, horarios_disponibles, profesor_materia):
+        return cls(tabla_desde_json('profesores', profesores),
+                   tabla_desde_json('materias', materias),
+                   tabla_desde_json('salones', salones),
+                   tabla_desde_json('horarios_disponibles', horarios_disponibles),
+                   tabla_desde_json('profesor_materia', profesor_materia))
+
+    @property
+    def n_profesores(self):
+        return len(self.profesor_ids)
+
+    @property
+    def n_materias(self):
+        return len(self.materia_ids)
+
+    @property
+    def n_salones(self):
+        return len(self.salon_ids)
+
+    def codigos_profesor(self, ids):
+        return pd.Index(self.profesor_ids).get_indexer(np.asarray(ids)).astype(np.int32)
+
+    def codigos_materia(self, ids):
+        return pd.Index(self.materia_ids).get_indexer(np.asarray(ids)).astype(np.int32)
+
+    def codigos_salon(self, ids):
+        return pd.Index(self.salon_ids).get_indexer(np.asarray(ids)).astype(np.int32)
+
+    # Pares (fila de disponibilidad, fila de profesor-materia) del mismo profesor
+    # Son las únicas combinaciones en las que un profesor puede dictar una materia.
+    def pares_disponibilidad(self):
+        orden = np.argsort(self.pm_profesor, kind='stable')
+        pm_ordenado = self.pm_profesor[orden]
+        inicio = np.searchsorted(pm_ordenado, self.disp_profesor, side='left')
+        cuantos = np.searchsorted(pm_ordenado, self.disp_profesor, side='right') - inicio
+        horario = np.repeat(np.arange(len(self.disp_profesor)), cuantos)
+        desplazamiento = np.arange(cuantos.sum()) - np.repeat(np.cumsum(cuantos) - cuantos, cuantos)
+        return horario, orden[np.repeat(inicio, cuantos) + desplazamiento]
+
+    # Ventanas de filas de disponibilidad que se cruzan en el tiempo, por día (y por
+    # profesor si por_profesor): por cada hora de inicio, las filas que la contienen.
+    # Dos filas que se cruzan contienen ambas el inicio de la más tardía, así que basta
+    # a lo sumo una clase por ventana para que no haya choques. Se omiten las ventanas
+    # contenidas en la siguiente.
+    def ventanas_solapadas(self, por_profesor=True):
+        grupo = self.disp_dia.astype(np.int64)
+        if por_profesor:
+            grupo = self.disp_profesor.astype(np.int64) * len(self.dias) + grupo
+        orden = np.lexsort((self.disp_inicio, grupo))
+        cortes = np.flatnonzero(np.diff(grupo[orden])) + 1
+        ventanas = []
+        for filas in np.split(orden, cortes):
+            inicio = self.disp_inicio[filas].astype(np.int32)
+            fin = np.maximum(self.disp_fin[filas].astype(np.int32), inicio + 1)
+            puntos = np.unique(inicio)
+            for punto, siguiente in zip(puntos, np.append(puntos[1:], np.iinfo(np.int32).max)):
+                dentro = (inicio <= punto) & (fin > punto)
+                if not (fin[dentro] > siguiente).all():
+                    ventanas.append(filas[dentro])
+        return ventanas
+
+    # Convierte clases (lista de Clase) a un DataFrame con los ids de la API
+    def clases_a_dataframe(self, clases):
+        profesor = np.fromiter((c.profesor for c in clases), dtype=np.int32, count=len(clases))
+        materia = np.fromiter((c.materia for c in clases), dtype=np.int32, count=len(clases))
+        salon = np.fromiter((c.salon for c in clases), dtype=np.int32, count=len(clases))
+        dia = np.fromiter((c.dia for c in clases), dtype=np.int8, count=len(clases))
+        inicio = np.fromiter((c.inicio for c in clases), dtype=np.int16, count=len(clases))
+        fin = np.fromiter((c.fin for c in clases), dtype=np.int16, count=len(clases))
+        return self.codigos_a_dataframe(profesor, materia, salon, dia, inicio, fin)
+
+    # Igual que clases_a_dataframe pero a partir de arreglos de códigos
+    def codigos_a_dataframe(self, profesor, materia, salon, dia, inicio, fin):
+        return pd.DataFrame({
+            'dia_semana': np.asarray(self.dias, dtype=object)[dia],
+            'hora_inicio': minutos_a_hora(inicio).to_numpy(),
+            'hora_fin': minutos_a_hora(fin).to_numpy(),
+            'alumnos': self.materia_alumnos[materia],
+            'materia_id': self.materia_ids[materia],
+            'salon_id': self.salon_ids[salon],
+            'profesor_id': self.profesor_ids[profesor],
+        })
+
+    # Convierte clases a la lista de dicts que espera /api/clases
+    def clases_a_json(self, clases):
+        registros = self.clases_a_dataframe(clases).to_dict('records')
+        return [{k: (v.item() if hasattr(v, 'item') else v) for k, v in registro.items()} for registro in registros]
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import ortools
+from ortools.sat.python import cp_model
+
+# Carpeta donde se guardan los modelos CP-SAT construidos, junto a este módulo (no
+# donde se lanzó Streamlit); cada función acepta otro `directorio`
+DIRECTORIO_MODELOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos_cp')
+
+# Versión de las funciones que construyen los modelos: subirla cuando cambien sus
+# variables o restricciones, para que no se carguen modelos viejos de la caché
+VERSION_MODELOS = 3
+
+# Límites de la caché: se borran los modelos sin usar hace más de MAX_DIAS_MODELOS
+# días y, si aun así la carpeta pasa de MAX_MB_MODELOS, los menos usados
+MAX_DIAS_MODELOS = 30
+MAX_MB_MODELOS = 1024
+
+
+# Función para calcular la clave de un modelo en caché
+# Depende del motor, de la huella de los datos de entrada, de las opciones que
+# cambian las restricciones, de la versión del código que arma los modelos y de la
+# versión de OR-Tools que escribió el proto.
+def clave_modelo(motor, huella, **opciones):
+    texto = json.dumps({'motor': motor, 'huella': huella, 'opciones': opciones, 'version': VERSION_MODELOS,
+                        'ortools': ortools.__version__}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+# Función para agregar las restricciones de choque de profesores y salones
+# `variables` son las variables del modelo y horario_idx / salon_idx sus códigos.
+# 1. Un profesor no puede dar más de una clase al mismo tiempo -> a lo sumo una
+#    variable activa por ventana de sus filas de disponibilidad que se cruzan
+#    (filas repetidas o solapadas del mismo profesor cuentan como una franja).
+# 2. Un salón no puede tener más de una clase al mismo tiempo -> lo mismo por salón,
+#    con las ventanas de todas las filas del día, de cualquier profesor.
+def agregar_exclusividad(model, variables, instancia, horario_idx, salon_idx):
+    # Variables de cada fila de disponibilidad: orden[inicios[i]:inicios[i + 1]]
+    orden = np.argsort(horario_idx, kind='stable')
+    inicios = np.searchsorted(horario_idx[orden], np.arange(len(instancia.disp_profesor) + 1))
+
+    def variables_de(filas):
+        return np.concatenate([orden[inicios[f]:inicios[f + 1]] for f in filas])
+
+    restricciones = 0
+    for ventana in instancia.ventanas_solapadas(por_profesor=True):
+        grupo = variables_de(ventana)
+        if len(grupo) > 1:
+            model.AddAtMostOne(variables[g] for g in grupo)
+            restricciones += 1
+
+    for ventana in instancia.ventanas_solapadas(por_profesor=False):
+        grupo = variables_de(ventana)
+        grupo = grupo[np.argsort(salon_idx[grupo], kind='stable')]
+        cortes = np.flatnonzero(np.diff(salon_idx[grupo])) + 1
+        for por_salon in np.split(grupo, cortes):
+            if len(por_salon) > 1:
+                model.AddAtMostOne(variables[g] for g in por_salon)
+                restricciones += 1
+    return restricciones
+
+
+def _rutas(clave, directorio):
+    return os.path.join(directorio, f'{clave}.pbtxt'), os.path.join(directorio, f'{clave}.npz')
+
+
+# Función para guardar un modelo y sus arreglos de índices (índice de cada variable
+# en el proto y los códigos que representa) en la caché de disco
+# Se escribe en temporales y se renombra al final: quien lea a la vez nunca ve un
+# modelo a medias. El proto se guarda en formato texto porque es el único que el
+# CpModel de OR-Tools 9.15 sabe volver a leer (parse_text_format).
+def guardar_modelo(clave, model, directorio=DIRECTORIO_MODELOS, **arreglos):
+    os.makedirs(directorio, exist_ok=True)
+    ruta_modelo, ruta_arreglos = _rutas(clave, directorio)
+    temporal = f'{clave}.{os.getpid()}.tmp'
+    temporal_modelo = os.path.join(directorio, f'{temporal}.pbtxt')
+    temporal_arreglos = os.path.join(directorio, f'{temporal}.npz')
+
+    np.savez(temporal_arreglos, **arreglos)
+    if not model.ExportToFile(temporal_modelo):
+        os.remove(temporal_arreglos)
+        return False
+    os.replace(temporal_arreglos, ruta_arreglos)
+    os.replace(temporal_modelo, ruta_modelo)
+    limpiar_cache(directorio)
+    return True
+
+
+# Función para acotar la caché de disco
+# La fecha de modificación de cada modelo marca su último uso (cargar_modelo la
+# actualiza). Se borran los vencidos y luego los más viejos hasta quedar bajo el
+# tamaño máximo; el más reciente (el que se acaba de guardar) nunca se borra.
+# Devuelve cuántos modelos se borraron.
+def limpiar_cache(directorio=DIRECTORIO_MODELOS, max_dias=MAX_DIAS_MODELOS, max_mb=MAX_MB_MODELOS):
+    if not os.path.isdir(directorio):
+        return 0
+    modelos = []
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.pbtxt') and not nombre.endswith('.tmp.pbtxt'):
+            rutas = _rutas(nombre[:-len('.pbtxt')], directorio)
+            try:
+                modelos.append((os.path.getmtime(rutas[0]), sum(os.path.getsize(r) for r in rutas if os.path.exists(r)), rutas))
+            except FileNotFoundError:
+                pass
+    modelos.sort()
+
+    limite = time.time() - max_dias * 86400
+    total = sum(tamano for _, tamano, _ in modelos)
+    borrados = 0
+    for usado, tamano, rutas in modelos[:-1]:
+        if usado >= limite and total <= max_mb * 2**20:
+            break
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+        total -= tamano
+        borrados += 1
+    return borrados
+
+
+# Función para leer un modelo de la caché; devuelve (model, arreglos) o None
+def cargar_modelo(clave, directorio=DIRECTORIO_MODELOS):
+    ruta_modelo, ruta_arreglos = _rutas(clave, directorio)
+    if not (os.path.exists(ruta_modelo) and os.path.exists(ruta_arreglos)):
+        return None
+    model = cp_model.CpModel()
+    try:
+        with open(ruta_modelo, encoding='utf-8') as archivo:
+            model.Proto().parse_text_format(archivo.read())
+        with np.load(ruta_arreglos) as datos:
+            arreglos = {nombre: datos[nombre] for nombre in datos.files}
+        os.utime(ruta_modelo)
+    except FileNotFoundError:
+        # Otro proceso lo borró al limpiar la caché: se vuelve a construir
+        return None
+    model.rebuild_constant_map()
+    return model, arreglos
+
+
+# Función para obtener un modelo de la caché o construirlo y guardarlo
+# `construir` devuelve (model, arreglos) o None si no hay modelo que construir.
+# El tercer valor indica si el modelo vino de la caché.
+def modelo_en_cache(clave, construir, directorio=DIRECTORIO_MODELOS):
+    guardado = cargar_modelo(clave, directorio)
+    if guardado is not None:
+        return guardado[0], guardado[1], True
+    construido = construir()
+    if construido is None:
+        return None, None, False
+    model, arreglos = construido
+    guardar_modelo(clave, model, directorio, **arreglos)
+    return model, arreglos, False
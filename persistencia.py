@@ -0,0 +1,138 @@
+import hashlib
+import string
+import numpy as np
+import pandas as pd
+import requests
+import ingesta
+from ingesta import cargar_tabla
+from modelo_datos import horas_a_minutos
+from extraccion import COLUMNAS_API
+from validacion import validar_horario, resumen_violaciones
+from diagnostico import mensajes
+
+# Columnas que identifican una clase entre ejecuciones (sin el salón ni el grupo,
+# que pueden cambiar y se consideran una actualización)
+CLAVE_CLASE = ['materia_id', 'profesor_id', 'dia_semana', 'hora_inicio']
+
+# Columnas cuyo cambio convierte una clase existente en una actualización
+CAMPOS_ACTUALIZABLES = ['grupo', 'hora_fin', 'alumnos', 'salon_id']
+
+
+# Función para llevar un horario (generado o persistido) a una forma comparable
+# Horas en minutos, día como texto e ids enteros; `n` numera las clases repetidas
+# con la misma clave para que también se puedan emparejar.
+def normalizar_horario(df):
+    df = pd.DataFrame(df).copy()
+    for columna in ('hora_inicio', 'hora_fin'):
+        df[columna] = horas_a_minutos(df[columna]).astype(np.int32)
+    df['dia_semana'] = df['dia_semana'].astype(str)
+    for columna in ('alumnos', 'materia_id', 'salon_id', 'profesor_id'):
+        df[columna] = df[columna].astype(np.int64)
+    df['n'] = df.groupby(CLAVE_CLASE, sort=False).cumcount()
+    df['clave'] = claves_clase(df)
+    return df
+
+
+# Función para calcular una clave estable por contenido para cada clase
+def claves_clase(df):
+    texto = (df['materia_id'].astype(str) + '|' + df['profesor_id'].astype(str) + '|' +
+             df['dia_semana'].str.lower() + '|' + df['hora_inicio'].astype(str) + '|' + df['n'].astype(str))
+    return texto.map(lambda t: hashlib.sha1(t.encode('utf-8')).hexdigest()).to_numpy()
+
+
+# Función para derivar un código de grupo estable ('ABC123') a partir de la clave
+def grupo_estable(clave):
+    valor = int(clave[:12], 16)
+    letras = ''
+    for _ in range(3):
+        valor, resto = divmod(valor, 26)
+        letras += string.ascii_uppercase[resto]
+    return f"{letras}{valor % 1000:03d}"
+
+
+# Función para asignar códigos de grupo estables a un horario
+def asignar_grupos(horario_df):
+    horario_df = horario_df.copy()
+    horario_df['grupo'] = [grupo_estable(clave) for clave in normalizar_horario(horario_df)['clave']]
+    return horario_df
+
+
+# Función para comparar el horario nuevo con el persistido
+# Devuelve las clases a insertar, actualizar (con el id de la API) y eliminar.
+def calcular_diff(horario_nuevo, horario_actual):
+    nuevo = normalizar_horario(horario_nuevo)
+    if horario_actual is None or len(horario_actual) == 0:
+        vacio = pd.DataFrame(columns=['id'])
+        return {'insertar': nuevo, 'actualizar': vacio, 'eliminar': vacio}
+
+    actual = normalizar_horario(horario_actual)
+    cruce = nuevo.merge(actual[['clave', 'id'] + CAMPOS_ACTUALIZABLES], on='clave', how='outer',
+                        suffixes=('', '_actual'), indicator=True)
+
+    insertar = cruce[cruce['_merge'] == 'left_only']
+    eliminar = cruce.loc[cruce['_merge'] == 'right_only', ['id']]
+    ambos = cruce[cruce['_merge'] == 'both']
+    cambiados = np.zeros(len(ambos), dtype=bool)
+    for campo in CAMPOS_ACTUALIZABLES:
+        cambiados |= ambos[campo].to_numpy() != ambos[f'{campo}_actual'].to_numpy()
+    actualizar = ambos[cambiados]
+
+    return {'insertar': insertar, 'actualizar': actualizar, 'eliminar': eliminar}
+
+
+# Función para convertir filas normalizadas al cuerpo que espera /api/clases
+def _cuerpos(df):
+    if len(df) == 0:
+        return []
+    df = df.copy()
+    for columna in ('hora_inicio', 'hora_fin'):
+        df[columna] = ingesta.minutos_a_hora(df[columna].astype(int)).to_numpy()
+    for columna in ('alumnos', 'materia_id', 'salon_id', 'profesor_id'):
+        df[columna] = df[columna].astype(int)
+    registros = df[COLUMNAS_API].to_dict('records')
+    return [{k: (v.item() if hasattr(v, 'item') else v) for k, v in registro.items()} for registro in registros]
+
+
+# Función para escribir solo las diferencias en la API
+def aplicar_diff(diff, session=None):
+    session = session or requests.Session()
+    url = f"{ingesta.BASE_URL}/clases"
+    resumen = {'insertadas': 0, 'actualizadas': 0, 'eliminadas': 0, 'errores': []}
+
+    def enviar(metodo, destino, **kwargs):
+        try:
+            response = session.request(metodo, destino, **kwargs)
+            response.raise_for_status()
+            return True
+        except requests.RequestException as e:
+            resumen['errores'].append(f"{metodo} {destino}: {str(e)}")
+            return False
+
+    for data in _cuerpos(diff['insertar']):
+        resumen['insertadas'] += enviar('POST', url, json=data)
+    for id_clase, data in zip(diff['actualizar']['id'].astype(int), _cuerpos(diff['actualizar'])):
+        resumen['actualizadas'] += enviar('PUT', f"{url}/{id_clase}", json=data)
+    for id_clase in diff['eliminar']['id'].astype(int):
+        resumen['eliminadas'] += enviar('DELETE', f"{url}/{id_clase}")
+
+    return resumen
+
+
+# Función para guardar un horario de forma idempotente: lee lo persistido,
+# calcula el diff y escribe solo inserciones, actualizaciones y eliminaciones
+# Antes de escribir se valida el horario (con la Instancia, si se pasa, también
+# capacidad, habilitación y disponibilidad); si tiene violaciones no se envía nada
+# y el resumen trae el reporte en 'violaciones'.
+def guardar_horario(horario_df, instancia=None, validar=True):
+    if validar:
+        violaciones = validar_horario(horario_df, instancia)
+        if len(violaciones):
+            return {'insertadas': 0, 'actualizadas': 0, 'eliminadas': 0,
+                    'errores': ['Horario no guardado: ' + m for m in mensajes(resumen_violaciones(violaciones))],
+                    'violaciones': violaciones}
+    session = requests.Session()
+    horario_actual = cargar_tabla('clases', session)
+    if horario_actual is None:
+        return None
+    horario_df = horario_df if 'grupo' in horario_df else asignar_grupos(horario_df)
+    return aplicar_diff(calcular_diff(horario_df, horario_actual), session)
@@ -0,0 +1,149 @@
+import numpy as np
+from diagnostico import diagnosticar_instancia, hay_errores, mensajes
+
+# Motores disponibles, del más exacto al más aproximado (en ese orden se desempata)
+MOTORES = {
+    'datelive': 'CP-SAT exacto (datelive.py)',
+    'godness': 'Descompuesto: ML + asignación de salones por franja (godness.py)',
+    'ga': 'Algoritmo genético (horario_generator.py)',
+    'ml': 'Red neuronal + asignación voraz (machine.py)',
+}
+
+# Presupuesto por defecto de una generación
+PRESUPUESTO = {'segundos': 300, 'memoria_mb': 4096, 'variables': 5_000_000}
+
+# Costos unitarios medidos en un núcleo con snapshots de datos.py (30 a 1000 profesores)
+COSTOS = {
+    'cp_construir_s': 10e-6,       # construir una variable (NewBoolVar + restricciones + objetivo)
+    'cp_resolver_s': 4e-6,         # resolverla (CP-SAT, 1 núcleo)
+    'cp_bytes': 1024,              # memoria por variable (Python + proto + solver)
+    'ga_evaluacion_s': 8e-3,       # evaluar un individuo (dominado por la predicción del bosque)
+    'ga_gen_s': 2e-6,              # costo por gen en evaluación, selección y cruce
+    'ga_bytes_gen': 120,           # memoria por gen (tupla de 5 enteros)
+    'bosque_fila_s': 600e-6,       # entrenar y predecir el RandomForest (un salón por clase) por fila
+    'flujo_arco_s': 0.5e-6,        # arco del flujo de costo mínimo por franja
+    'flujo_bytes_arco': 64,
+    'red_muestra_s': 120e-6,       # una muestra por época (Keras, ~4 ms por lote de 32)
+    'red_epocas': 50,
+    'red_bytes_celda': 8,          # celda de la matriz dispersa y de las probabilidades por salón
+}
+
+# Memoria base de cualquier proceso de generación (intérprete, pandas, OR-Tools)
+MEMORIA_BASE_MB = 300
+
+
+# Función para contar, sin crearlas, las variables y restricciones del modelo de datelive
+# Por cada relación profesor-materia k: horarios de su profesor × salones en los que cabe.
+def contar_modelo_cp(instancia, min_alumnos=0, filtrar_capacidad=True):
+    horarios_por_profesor = np.bincount(instancia.disp_profesor, minlength=instancia.n_profesores)
+    if filtrar_capacidad:
+        alumnos = instancia.materia_alumnos[instancia.pm_materia]
+        capacidades = np.sort(instancia.salon_capacidad)
+        salones_validos = instancia.n_salones - np.searchsorted(capacidades, alumnos, side='left')
+        salones_validos = np.where(alumnos >= min_alumnos, salones_validos, 0)
+    else:
+        salones_validos = np.full(len(instancia.pm_profesor), instancia.n_salones)
+
+    variables = int((horarios_por_profesor[instancia.pm_profesor] * salones_validos).sum())
+    # Un AtMostOne por ventana de horarios del profesor que se cruzan, y uno por salón
+    # en cada ventana del día (cota superior: salones sin variables no cuentan)
+    restricciones = (len(instancia.ventanas_solapadas(por_profesor=True)) +
+                     len(instancia.ventanas_solapadas(por_profesor=False)) * instancia.n_salones)
+    pares = int(horarios_por_profesor[instancia.pm_profesor].sum())
+    return variables, restricciones, pares
+
+
+# Función para armar una estimación con el mismo formato para todos los motores
+def estimacion(variables, restricciones, segundos, memoria_bytes, **detalle):
+    return dict(variables=int(variables), restricciones=int(restricciones), segundos=float(segundos),
+                memoria_mb=MEMORIA_BASE_MB + memoria_bytes / 2**20, **detalle)
+
+
+# Función para estimar tamaño, memoria y tiempo de cada motor a partir de las cardinalidades
+def estimar(instancia, min_alumnos=25, ngen=50, poblacion=300, cxpb=0.5, mutpb=0.2):
+    estimaciones = {}
+
+    variables, restricciones, pares = contar_modelo_cp(instancia, min_alumnos)
+    estimaciones['datelive'] = estimacion(
+        variables, restricciones,
+        variables * (COSTOS['cp_construir_s'] + COSTOS['cp_resolver_s']),
+        variables * COSTOS['cp_bytes'])
+
+    # godness: una fila por par (disponibilidad, profesor-materia); luego un flujo por
+    # franja con un arco por clase y salón
+    arcos = pares * (instancia.n_salones + 2)
+    estimaciones['godness'] = estimacion(
+        arcos, pares,
+        pares * COSTOS['bosque_fila_s'] + arcos * COSTOS['flujo_arco_s'],
+        arcos * COSTOS['flujo_bytes_arco'] + pares * instancia.n_salones * COSTOS['red_bytes_celda'],
+        filas=pares)
+
+    # GA: un individuo tiene un gen por materia; por generación se reevalúa la
+    # fracción de la población que cruza o muta
+    genes = instancia.n_materias
+    evaluaciones = poblacion * (1 + ngen * (cxpb + mutpb - cxpb * mutpb))
+    estimaciones['ga'] = estimacion(
+        genes * poblacion, 0,
+        evaluaciones * (COSTOS['ga_evaluacion_s'] + genes * COSTOS['ga_gen_s']),
+        2 * poblacion * genes * COSTOS['ga_bytes_gen'],
+        evaluaciones=int(evaluaciones))
+
+    # ml: entrenar la red sobre las filas combinadas y decodificar por lotes
+    estimaciones['ml'] = estimacion(
+        pares * instancia.n_salones, 0,
+        pares * COSTOS['red_epocas'] * COSTOS['red_muestra_s'],
+        pares * instancia.n_salones * COSTOS['red_bytes_celda'],
+        filas=pares)
+
+    return estimaciones
+
+
+# Función para explicar por qué una estimación no cabe en el presupuesto (None si cabe)
+def exceso(est, presupuesto=PRESUPUESTO):
+    motivos = []
+    if est['variables'] > presupuesto['variables']:
+        motivos.append(f"{est['variables']:,} variables (límite {presupuesto['variables']:,})")
+    if est['memoria_mb'] > presupuesto['memoria_mb']:
+        motivos.append(f"~{est['memoria_mb']:,.0f} MB (límite {presupuesto['memoria_mb']:,} MB)")
+    if est['segundos'] > presupuesto['segundos']:
+        motivos.append(f"~{est['segundos']:,.0f} s (límite {presupuesto['segundos']:,} s)")
+    return '; '.join(motivos) or None
+
+
+# Función para elegir el motor más rápido que cabe en el presupuesto y dejar registrada la razón
+# godness exige que todas las materias se puedan dictar; si el diagnóstico lo
+# impide se descarta aunque quepa en el presupuesto.
+def planificar(instancia, presupuesto=PRESUPUESTO, motores=None, **opciones):
+    estimaciones = estimar(instancia, **opciones)
+    motores = [m for m in MOTORES if motores is None or m in motores]
+    for motor in motores:
+        estimaciones[motor]['descarte'] = exceso(estimaciones[motor], presupuesto)
+    if 'godness' in motores and estimaciones['godness']['descarte'] is None:
+        problemas = [p for p in diagnosticar_instancia(instancia, requiere_todas=True) if p['severidad'] == 'error']
+        if hay_errores(problemas):
+            estimaciones['godness']['descarte'] = mensajes(problemas)[0]
+
+    candidatos = [m for m in motores if estimaciones[m]['descarte'] is None]
+    if not candidatos:
+        razon = 'Ningún motor cabe en el presupuesto: ' + ' | '.join(
+            f"{m}: {estimaciones[m]['descarte']}" for m in motores)
+        return {'motor': None, 'razon': razon, 'estimaciones': estimaciones, 'presupuesto': presupuesto}
+
+    elegido = min(candidatos, key=lambda m: (estimaciones[m]['segundos'], motores.index(m)))
+    est = estimaciones[elegido]
+    descartados = [f"{m} ({estimaciones[m]['descarte']})" for m in motores if m not in candidatos]
+    razon = (f"{MOTORES[elegido]}: ~{est['segundos']:,.1f} s, ~{est['memoria_mb']:,.0f} MB y "
+             f"{est['variables']:,} variables; es el más rápido de {len(candidatos)} motores dentro del presupuesto")
+    if descartados:
+        razon += '. Descartados: ' + ', '.join(descartados)
+    return {'motor': elegido, 'razon': razon, 'estimaciones': estimaciones, 'presupuesto': presupuesto}
+
+
+# Función para rechazar un modelo CP-SAT antes de crearlo si no cabe en el presupuesto
+# Devuelve el mensaje de rechazo o None si se puede construir.
+def rechazar_modelo_cp(variables, restricciones=0, presupuesto=PRESUPUESTO):
+    est = estimacion(variables, restricciones,
+                     variables * (COSTOS['cp_construir_s'] + COSTOS['cp_resolver_s']),
+                     variables * COSTOS['cp_bytes'])
+    motivo = exceso(est, presupuesto)
+    return None if motivo is None else f"Modelo demasiado grande, no se construye: {motivo}"
@@ -0,0 +1,93 @@
+import streamlit as st
+import pandas as pd
+import requests
+from sesion import huella_datos
+from planificacion import MOTORES, PRESUPUESTO, planificar
+from trabajos import MOTORES as MOTORES_TRABAJO, enviar_trabajo, seguir_trabajo
+from horario_generator import entrenar_modelo
+from sincronizacion import Replica
+from vistas import mostrar_vista_horario
+
+# Función para abrir la réplica local una sola vez por servidor
+# Las tablas y la Instancia se actualizan con deltas al sincronizar.
+@st.cache_resource
+def obtener_replica():
+    replica = Replica.abrir()
+    replica.sincronizar()
+    return replica
+
+# Función para mostrar cuántas filas cambió una sincronización por colección
+def mostrar_cambios(cambios):
+    st.dataframe(pd.DataFrame({endpoint: {'modo': cambio['modo'], 'insertados': len(cambio['insertados']),
+                                          'actualizados': len(cambio['actualizados']),
+                                          'eliminados': len(cambio['eliminados'])}
+                               for endpoint, cambio in cambios.items()}).T)
+
+# Función para armar los argumentos de cada motor que se lanza como trabajo
+def argumentos_trabajo(motor, instancia, tablas):
+    if motor == 'ga':
+        return (instancia, entrenar_modelo(instancia))
+    return tablas
+
+# Aplicación Streamlit
+def main():
+    st.title('Planificador de generación de horarios UTS')
+
+    try:
+        replica = obtener_replica()
+    except requests.RequestException:
+        st.error('No se pudieron cargar todos los datos necesarios. Por favor, verifica la conexión con la API.')
+        return
+
+    if st.sidebar.button('Sincronizar datos'):
+        try:
+            mostrar_cambios(replica.sincronizar())
+        except requests.RequestException as e:
+            st.error(f"No se pudo sincronizar con la API: {e}")
+    tablas = replica.tupla()
+
+    # Presupuesto configurable de la generación
+    st.sidebar.header('Presupuesto')
+    presupuesto = {
+        'segundos': st.sidebar.number_input('Tiempo máximo (s)', min_value=1, value=PRESUPUESTO['segundos']),
+        'memoria_mb': st.sidebar.number_input('Memoria máxima (MB)', min_value=256, value=PRESUPUESTO['memoria_mb']),
+        'variables': st.sidebar.number_input('Variables máximas', min_value=1000, value=PRESUPUESTO['variables']),
+    }
+
+    instancia = replica.instancia
+    plan = planificar(instancia, presupuesto)
+
+    st.write("Estimación por motor:")
+    estimaciones = pd.DataFrame(plan['estimaciones']).T
+    estimaciones.insert(0, 'motor', [MOTORES[m] for m in estimaciones.index])
+    st.dataframe(estimaciones[['motor', 'variables', 'restricciones', 'memoria_mb', 'segundos', 'descarte']])
+
+    if plan['motor'] is None:
+        st.error(plan['razon'])
+        return
+    st.success(f"Motor elegido: {plan['razon']}")
+
+    # El plan queda registrado en la sesión junto a la huella de los datos
+    huella = huella_datos(*tablas)
+    st.session_state.setdefault('planes', {})[huella] = plan
+
+    motor = plan['motor']
+    if motor not in MOTORES_TRABAJO:
+        st.info(f"Este motor se ejecuta desde su propia aplicación: {MOTORES[motor]}")
+        return
+
+    if st.button(f'Generar horario con {motor}'):
+        enviar_trabajo(motor, huella, *argumentos_trabajo(motor, instancia, tablas))
+
+    entrada = seguir_trabajo(motor, huella)
+    if entrada is not None:
+        resultado = entrada['resultado']
+        horario = resultado.get('horario') if isinstance(resultado, dict) else resultado
+        st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+        if isinstance(resultado, dict):
+            st.write({k: v for k, v in resultado.items() if k not in ('horario', 'horario_generado')})
+        if horario is not None:
+            mostrar_vista_horario(horario, *tablas[:3], clave=motor)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
+import io
 import streamlit as st
 import pandas as pd
 import numpy as np
 from ortools.sat.python import cp_model
 import requests
+from modelo_datos import Instancia
+from extraccion import extraer_horario, exportar_horario
+from persistencia import asignar_grupos, guardar_horario
+from sesion import huella_datos, ejecutar_con_cache, obtener_resultado
+from modelos_cp import clave_modelo, modelo_en_cache, agregar_exclusividad
+from planificacion import contar_modelo_cp, rechazar_modelo_cp
+from vistas import mostrar_vista_horario
 
 # URL base para las solicitudes a la API
 BASE_URL = "http://localhost:8000/api"
 
 # Función para obtener los datos desde la API
+@st.cache_data
 def get_data(endpoint):
     try:
         response = requests.get(f"{BASE_URL}/{endpoint}")
@@ -37,6 +46,36 @@ def preprocesar_datos(profesores, materias, salones, horarios_disponibles, profe
     
     return df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia
 
+# Función para construir el modelo CP-SAT del horario
+# Devuelve el modelo y los arreglos que relacionan cada variable (su índice en el
+# proto) con sus códigos (horario i, salón j, profesor-materia k).
+def construir_modelo(instancia):
+    model = cp_model.CpModel()
+    
+    # Variables: solo las combinaciones (horario i, salón j, profesor-materia k) que pueden valer 1.
+    # 3. Respetar la disponibilidad de los profesores -> el profesor de k es el del horario i
+    # 4. Respetar la capacidad de los salones -> alumnos de la materia de k <= capacidad de j
+    # Cualquier otra combinación queda fija en 0, así que no se crea.
+    horario_par, pm_par = instancia.pares_disponibilidad()
+    alumnos_par = instancia.materia_alumnos[instancia.pm_materia[pm_par]]
+    par_idx, salon_idx = np.nonzero(instancia.salon_capacidad[None, :] >= alumnos_par[:, None])
+    horario_idx = horario_par[par_idx]
+    pm_idx = pm_par[par_idx]
+    
+    variables = [model.NewBoolVar(f'clase_h{i}_s{j}_pm{k}') for i, j, k in zip(horario_idx.tolist(), salon_idx.tolist(), pm_idx.tolist())]
+    indices = np.array([variable.Index() for variable in variables], dtype=np.int64)
+    
+    # Restricciones
+    # 1. Un profesor no puede dar más de una clase al mismo tiempo
+    # 2. Un salón no puede tener más de una clase al mismo tiempo
+    # Ambas por ventanas de horarios que se cruzan (ver agregar_exclusividad).
+    agregar_exclusividad(model, variables, instancia, horario_idx, salon_idx)
+    
+    # Función objetivo: maximizar el número de clases asignadas
+    model.Maximize(sum(variables))
+    
+    return model, {'indices': indices, 'horario_idx': horario_idx, 'salon_idx': salon_idx, 'pm_idx': pm_idx}
+
 # Función para generar el horario y hacer el POST a la API
 def generar_horario(profesores, materias, salones, horarios_disponibles, profesor_materia):
     df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia = preprocesar_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
@@ -48,64 +87,26 @@ def generar_horario(profesores, materias, salones, horarios_disponibles, profeso
     st.write(f"Horarios disponibles: {len(df_horarios_disponibles)}")
     st.write(f"Relaciones profesor-materia: {len(df_profesor_materia)}")
     
-    model = cp_model.CpModel()
-    
-    # Variables
-    clases = {}
-    for i, horario in df_horarios_disponibles.iterrows():
-        for j, salon in df_salones.iterrows():
-            for k, prof_mat in df_profesor_materia.iterrows():
-                clave = (i, j, k)
-                clases[clave] = model.NewBoolVar(f'clase_h{i}_s{j}_pm{k}')
-    
-    st.write(f"Variables creadas: {len(clases)}")
+    instancia = Instancia(df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia)
     
-    # Restricciones
-    restricciones_aplicadas = 0
+    # Tamaño del modelo antes de crearlo: un modelo desbocado se rechaza sin asignar memoria
+    variables, restricciones, _ = contar_modelo_cp(instancia)
+    rechazo = rechazar_modelo_cp(variables, restricciones)
+    if rechazo:
+        st.error(rechazo)
+        return None
     
-    # 1. Un profesor no puede dar más de una clase al mismo tiempo
-    for i, horario in df_horarios_disponibles.iterrows():
-        for profesor_id in df_profesores['id']:
-            model.Add(sum(clases[(i, j, k)] 
-                          for j in df_salones.index 
-                          for k in df_profesor_materia[df_profesor_materia['profesor_id'] == profesor_id].index) <= 1)
-            restricciones_aplicadas += 1
+    # El modelo construido se guarda en disco: con los mismos datos se carga directamente
+    clave = clave_modelo('prueba', huella_datos(df_profesores, df_materias, df_salones, df_horarios_disponibles, df_profesor_materia))
+    model, arreglos, en_cache = modelo_en_cache(clave, lambda: construir_modelo(instancia))
+    indices, horario_idx, salon_idx, pm_idx = (arreglos[n] for n in ('indices', 'horario_idx', 'salon_idx', 'pm_idx'))
     
-    # 2. Un salón no puede tener más de una clase al mismo tiempo
-    for i, horario in df_horarios_disponibles.iterrows():
-        for j in df_salones.index:
-            model.Add(sum(clases[(i, j, k)] for k in df_profesor_materia.index) <= 1)
-            restricciones_aplicadas += 1
-    
-    # 3. Respetar la disponibilidad de los profesores
-    for i, horario in df_horarios_disponibles.iterrows():
-        for k, prof_mat in df_profesor_materia.iterrows():
-            if prof_mat['profesor_id'] != horario['profesor_id']:
-                for j in df_salones.index:
-                    model.Add(clases[(i, j, k)] == 0)
-                    restricciones_aplicadas += 1
- # 4. Respetar la capacidad de los salones
-   # for j, salon in df_salones.iterrows():
-       # for i in df_horarios_disponibles.index:
-           # for k, prof_mat in df_profesor_materia.iterrows():
-              #  materia = df_materias.loc[df_materias['id'] == prof_mat['materia_id']].iloc[0]
-             #   model.Add(clases[(i, j, k)] * materia['alumnos'] <= salon['capacidad_alumnos'])
-              #  restricciones_aplicadas += 1
-    
-    # 5. Asegurar que todas las materias se impartan al menos una vez
-    #for materia_id in df_materias['id']:
-     #   model.Add(sum(clases[(i, j, k)] 
-      #                for i in df_horarios_disponibles.index 
-       #               for j in df_salones.index 
-        #              for k in df_profesor_materia[df_profesor_materia['materia_id'] == materia_id].index) >= 1)
-        #restricciones_aplicadas += 1
-    # Función objetivo: maximizar el número de clases asignadas
-
-    # Función objetivo: maximizar el número de clases asignadas
-    model.Maximize(sum(clases.values()))
+    st.write(f"Variables creadas: {len(indices)}" + (" (modelo en caché)" if en_cache else ""))
     
-    # Resolver el modelo
+    # Resolver el modelo (sin presolve: con salones compartidos tarda más que la búsqueda,
+    # ver PARAMETROS_SOLVER en datelive.py)
     solver = cp_model.CpSolver()
+    solver.parameters.cp_model_presolve = False
     st.write("Resolviendo el modelo...")
     status = solver.Solve(model)
     
@@ -113,40 +114,17 @@ def generar_horario(profesores, materias, salones, horarios_disponibles, profeso
     
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         st.write("Se encontró una solución")
-        horario_generado = []
-        for i, horario in df_horarios_disponibles.iterrows():
-            for j, salon in df_salones.iterrows():
-                for k, prof_mat in df_profesor_materia.iterrows():
-                    if solver.BooleanValue(clases[(i, j, k)]):
-                        materia = df_materias.loc[df_materias['id'] == prof_mat['materia_id']].iloc[0]
-                        
-                        # Añadir manejo de errores y logging
-                        profesor_match = df_profesores.loc[df_profesores['id'] == prof_mat['profesor_id']]
-                        if profesor_match.empty:
-                            st.warning(f"No se encontró profesor con cédula {prof_mat['profesor_id']}. Datos del profesor_materia: {prof_mat}")
-                            continue
-                        profesor = profesor_match.iloc[0]
-                        
-                        clase_data = {
-                            'grupo': materia['alumnos'],
-                            'dia_semana': horario['dia'],
-                            'hora_inicio': horario['hora_inicio'],
-                            'hora_fin': horario['hora_fin'],
-                            'alumnos': materia['alumnos'],
-                            'materia_id': materia['id'],
-                            'salon_id': salon['id'],
-                            'profesor_id': profesor['id']
-                        }
-                        
-                        # Convertir valores a tipos de Python nativos
-                        clase_data = {k: (v.item() if hasattr(v, 'item') else v) for k, v in clase_data.items()}
-                        
-                        # Enviar los datos a la API
-                        response = post_data('clases', clase_data)
-                        if response is not None:
-                            st.success(f"Clase creada: {clase_data}")
-                        else:
-                            st.error(f"Error al crear la clase: {clase_data}")
+        horario = extraer_horario(solver, indices, horario_idx, salon_idx, pm_idx, instancia)
+        horario = asignar_grupos(horario)
+        
+        # Guardar en la API solo lo que cambió respecto al horario persistido
+        resumen = guardar_horario(horario, instancia)
+        if resumen is not None:
+            st.success(f"Clases insertadas: {resumen['insertadas']}, actualizadas: {resumen['actualizadas']}, eliminadas: {resumen['eliminadas']}")
+            for error in resumen['errores']:
+                st.error(f"Error al guardar la clase: {error}")
+        
+        return horario
 
 
 
@@ -165,13 +143,19 @@ def main():
     if all([profesores, materias, salones, horarios_disponibles, profesor_materia]):
         st.success("Todos los datos se cargaron correctamente")
         
+        # El resultado queda en la sesión: descargar o interactuar no vuelve a resolver
+        huella = huella_datos(profesores, materias, salones, horarios_disponibles, profesor_materia)
         if st.button('Generar Horario para los profesores'):
             with st.spinner('Generando horario...'):
-                horario_df = generar_horario(profesores, materias, salones, horarios_disponibles, profesor_materia)
-            
+                ejecutar_con_cache('prueba', huella, generar_horario, profesores, materias, salones, horarios_disponibles, profesor_materia)
+        
+        entrada = obtener_resultado('prueba', huella)
+        if entrada is not None:
+            horario_df = entrada['resultado']
             if horario_df is not None:
-                st.success('Horario generado con éxito')
-                st.write(horario_df)
+                st.success(f"Horario generado con éxito ({entrada['metricas']['duracion']:.1f} s)")
+                mostrar_vista_horario(horario_df, profesores, materias, salones, clave='prueba')
+                st.download_button('Descargar horario (Parquet)', exportar_horario(horario_df, io.BytesIO()).getvalue(), file_name='horario.parquet')
             else:
                 st.error('No fue posible generar el horario')
     else:
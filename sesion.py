@@ -0,0 +1,49 @@
+import hashlib
+import json
+import time
+import pandas as pd
+import streamlit as st
+
+
+# Función para calcular una huella estable de los datos de entrada
+# Sirve como clave de resultados en caché: mismos datos -> misma huella.
+def huella_datos(*colecciones):
+    h = hashlib.sha1()
+    for coleccion in colecciones:
+        if isinstance(coleccion, pd.DataFrame):
+            h.update(','.join(map(str, coleccion.columns)).encode('utf-8'))
+            h.update(pd.util.hash_pandas_object(coleccion, index=False).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(coleccion, sort_keys=True, default=str).encode('utf-8'))
+        h.update(b'|')
+    return h.hexdigest()
+
+
+# Función para leer un resultado guardado en la sesión de Streamlit
+def obtener_resultado(motor, huella):
+    return st.session_state.get('resultados', {}).get((motor, huella))
+
+
+# Función para guardar un resultado (y sus métricas) en la sesión de Streamlit
+def guardar_resultado(motor, huella, resultado, **metricas):
+    entrada = {'resultado': resultado, 'metricas': metricas}
+    st.session_state.setdefault('resultados', {})[(motor, huella)] = entrada
+    st.session_state.setdefault('ultimo_resultado', {})[motor] = huella
+    return entrada
+
+
+# Función para obtener el último resultado de un motor, sea cual sea la huella
+def ultimo_resultado(motor):
+    huella = st.session_state.get('ultimo_resultado', {}).get(motor)
+    return None if huella is None else obtener_resultado(motor, huella)
+
+
+# Función para ejecutar un motor solo si no hay ya un resultado para estos datos
+# Los reruns de Streamlit (guardar, filtrar, ver) reutilizan el resultado guardado.
+def ejecutar_con_cache(motor, huella, funcion, *args, **kwargs):
+    existente = obtener_resultado(motor, huella)
+    if existente is not None:
+        return existente
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return guardar_resultado(motor, huella, resultado, duracion=time.perf_counter() - inicio)
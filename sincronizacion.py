@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from pandas.api.types import union_categoricals
+from ingesta import ESQUEMAS, BufferColumnas, iterar_registros
+from modelo_datos import Instancia
+from sesion import huella_datos
+
+# Carpeta de la réplica local (una tabla Parquet por colección y el estado de sincronización)
+DIRECTORIO_REPLICA = 'replica'
+
+# Colecciones que forman una instancia, en el orden que esperan los generadores
+ENDPOINTS = ('profesores', 'materias', 'salones', 'horarios_disponibles', 'profesor_materia')
+
+# Parámetros de consulta para pedir solo los cambios y columnas que los describen
+PARAMETRO_ACTUALIZADO = 'updated_since'
+PARAMETRO_ID = 'since_id'
+COLUMNA_ACTUALIZADO = 'updated_at'
+COLUMNA_ELIMINADO = 'deleted_at'
+
+# Con marca de id solo se ven inserciones: cada cierto número de deltas se hace una
+# descarga completa para recoger modificaciones y eliminaciones
+DELTAS_POR_COMPLETA = 20
+
+
+# Función para concatenar tablas tipadas conservando las columnas categóricas
+def concatenar(partes):
+    resultado = pd.concat(partes, ignore_index=True)
+    for columna in partes[0].columns:
+        if isinstance(partes[0][columna].dtype, pd.CategoricalDtype):
+            resultado[columna] = union_categoricals([parte[columna] for parte in partes], ignore_order=True)
+    return resultado
+
+
+# Función para comparar dos versiones de una tabla por id
+# Devuelve los ids insertados, actualizados (algún valor distinto) y eliminados.
+def diferencias(anterior, nueva):
+    ids_anterior = anterior['id'].to_numpy()
+    ids_nueva = nueva['id'].to_numpy()
+    comunes = np.intersect1d(ids_nueva, ids_anterior)
+    a = anterior.set_index('id').loc[comunes]
+    b = nueva.set_index('id').loc[comunes]
+    cambiados = np.zeros(len(comunes), dtype=bool)
+    for columna in a.columns:
+        x = a[columna].astype(object).to_numpy()
+        y = b[columna].astype(object).to_numpy()
+        cambiados |= ~((x == y) | (pd.isna(x) & pd.isna(y)))
+    return np.setdiff1d(ids_nueva, ids_anterior), comunes[cambiados], np.setdiff1d(ids_anterior, ids_nueva)
+
+
+# Función para aplicar un delta (filas nuevas o modificadas e ids eliminados) a una tabla
+def aplicar_delta(tabla, filas, eliminados):
+    quitar = np.concatenate([filas['id'].to_numpy(), np.asarray(eliminados, dtype=np.int64)])
+    restantes = tabla[~tabla['id'].isin(quitar)]
+    return concatenar([restantes, filas]).sort_values('id', kind='stable').reset_index(drop=True)
+
+
+# Función para saber qué tablas cambiaron según un conjunto de cambios
+def tablas_cambiadas(cambios):
+    return [endpoint for endpoint, cambio in cambios.items()
+            if len(cambio['insertados']) or len(cambio['actualizados']) or len(cambio['eliminados'])]
+
+
+# Réplica local de las cinco colecciones, sincronizada por deltas
+# Cada colección guarda su cursor: la mayor marca updated_at si la API la envía,
+# o el mayor id si no. Si la API ignora el filtro (devuelve filas viejas) la
+# respuesta se trata como descarga completa y se compara contra la réplica.
+class Replica:
+    def __init__(self, directorio=DIRECTORIO_REPLICA):
+        self.directorio = directorio
+        self.tablas = {}
+        self.estado = {}
+        self.instancia = None
+        self.lock = threading.Lock()
+
+    # Abre la réplica guardada en disco (vacía si no existe)
+    @classmethod
+    def abrir(cls, directorio=DIRECTORIO_REPLICA):
+        replica = cls(directorio)
+        ruta_estado = os.path.join(directorio, 'estado.json')
+        if os.path.exists(ruta_estado):
+            with open(ruta_estado, encoding='utf-8') as archivo:
+                replica.estado = json.load(archivo)
+            for endpoint in replica.estado:
+                ruta = os.path.join(directorio, f'{endpoint}.parquet')
+                if os.path.exists(ruta):
+                    replica.tablas[endpoint] = pd.read_parquet(ruta)
+        return replica
+
+    def guardar(self, endpoints=None):
+        os.makedirs(self.directorio, exist_ok=True)
+        for endpoint in endpoints if endpoints is not None else self.tablas:
+            ruta = os.path.join(self.directorio, f'{endpoint}.parquet')
+            self.tablas[endpoint].to_parquet(f'{ruta}.tmp', index=False)
+            os.replace(f'{ruta}.tmp', ruta)
+        ruta_estado = os.path.join(self.directorio, 'estado.json')
+        with open(f'{ruta_estado}.tmp', 'w', encoding='utf-8') as archivo:
+            json.dump(self.estado, archivo)
+        os.replace(f'{ruta_estado}.tmp', ruta_estado)
+
+    # Las cinco tablas en el orden de ENDPOINTS
+    def tupla(self):
+        return tuple(self.tablas.get(endpoint) for endpoint in ENDPOINTS)
+
+    # Trae los cambios de todas las colecciones, los aplica a las tablas en memoria y a la
+    # Instancia derivada, guarda la réplica y devuelve el conjunto de cambios por colección
+    def sincronizar(self, session=None, completo=False):
+        with self.lock:
+            session = session or requests.Session()
+            # Se aplica todo o nada: si falla una colección la réplica queda como estaba
+            resultados = {endpoint: self._sincronizar_tabla(endpoint, session, completo) for endpoint in ENDPOINTS}
+            cambios = {}
+            for endpoint, (tabla, estado, cambio) in resultados.items():
+                self.tablas[endpoint] = tabla
+                self.estado[endpoint] = estado
+                cambios[endpoint] = cambio
+            cambiadas = tablas_cambiadas(cambios)
+            if self.instancia is None:
+                self.instancia = Instancia(*self.tupla())
+            elif cambiadas:
+                self.instancia = self.instancia.actualizar(cambiadas, *self.tupla())
+            if cambiadas or completo:
+                self.guardar(cambiadas)
+            return cambios
+
+    def _sincronizar_tabla(self, endpoint, session, completo):
+        estado = self.estado.get(endpoint, {})
+        anterior = self.tablas.get(endpoint)
+        filtros = None
+        if not completo and anterior is not None and estado.get('cursor') is not None \
+                and estado.get('deltas', 0) < DELTAS_POR_COMPLETA:
+            parametro = PARAMETRO_ACTUALIZADO if estado['modo'] == COLUMNA_ACTUALIZADO else PARAMETRO_ID
+            filtros = {parametro: estado['cursor']}
+
+        # Se leen los registros en columnas tipadas, anotando cursores y eliminaciones
+        buffer = BufferColumnas(ESQUEMAS[endpoint])
+        eliminados = []
+        maximo_actualizado = minimo_actualizado = None
+        maximo_id = minimo_id = None
+        for registro in iterar_registros(endpoint, session, filtros=filtros):
+            actualizado = registro.get(COLUMNA_ACTUALIZADO)
+            if actualizado is not None:
+                maximo_actualizado = actualizado if maximo_actualizado is None else max(maximo_actualizado, actualizado)
+                minimo_actualizado = actualizado if minimo_actualizado is None else min(minimo_actualizado, actualizado)
+            id_registro = int(registro['id'])
+            maximo_id = id_registro if maximo_id is None else max(maximo_id, id_registro)
+            minimo_id = id_registro if minimo_id is None else min(minimo_id, id_registro)
+            if registro.get(COLUMNA_ELIMINADO) is not None:
+                eliminados.append(id_registro)
+            else:
+                buffer.agregar(registro)
+        filas = buffer.a_dataframe().sort_values('id', kind='stable').reset_index(drop=True)
+
+        # ¿La API aplicó el filtro? Si devolvió filas anteriores al cursor, no
+        es_delta = filtros is not None
+        if es_delta and estado['modo'] == COLUMNA_ACTUALIZADO and minimo_actualizado is not None:
+            es_delta = minimo_actualizado > estado['cursor']
+        elif es_delta and estado['modo'] == 'id' and minimo_id is not None:
+            es_delta = minimo_id > estado['cursor']
+
+        if es_delta:
+            insertados, actualizados, _ = diferencias(anterior[anterior['id'].isin(filas['id'])], filas)
+            eliminados = np.intersect1d(eliminados, anterior['id'].to_numpy())
+            nueva = aplicar_delta(anterior, filas, eliminados) if len(filas) or len(eliminados) else anterior
+            deltas = estado.get('deltas', 0) + 1
+        else:
+            if anterior is None:
+                insertados, actualizados, eliminados = filas['id'].to_numpy(), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+            else:
+                insertados, actualizados, eliminados = diferencias(anterior, filas)
+            nueva = filas
+            deltas = 0
+
+        # El cursor solo avanza: un delta vacío conserva el anterior
+        if maximo_actualizado is not None or estado.get('modo') == COLUMNA_ACTUALIZADO:
+            modo, ultimo = COLUMNA_ACTUALIZADO, maximo_actualizado
+        else:
+            modo, ultimo = 'id', maximo_id
+        cursores = [c for c in (estado.get('cursor') if es_delta else None, ultimo) if c is not None]
+        cursor = max(cursores) if cursores else None
+
+        estado = {'modo': modo, 'cursor': cursor, 'deltas': deltas, 'filas': len(nueva)}
+        return nueva, estado, {
+            'modo': 'delta' if es_delta else 'completo',
+            'insertados': [int(i) for i in insertados],
+            'actualizados': [int(i) for i in actualizados],
+            'eliminados': [int(i) for i in eliminados],
+            'huella': huella_datos(nueva),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincronizar la réplica local con la API')
+    parser.add_argument('--completo', action='store_true', help='Descargar todo en lugar de solo los cambios')
+    parser.add_argument('--directorio', default=DIRECTORIO_REPLICA)
+    args = parser.parse_args()
+
+    replica = Replica.abrir(args.directorio)
+    cambios = replica.sincronizar(completo=args.completo)
+    for endpoint, cambio in cambios.items():
+        print(f"{endpoint}: {cambio['modo']}, {len(cambio['insertados'])} insertados, "
+              f"{len(cambio['actualizados'])} actualizados, {len(cambio['eliminados'])} eliminados")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+import importlib
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import streamlit as st
+from ortools.sat.python import cp_model
+from sesion import guardar_resultado, obtener_resultado
+
+# Funciones de generación que se pueden ejecutar como trabajo ('modulo:funcion')
+# Se importan por nombre dentro del proceso de trabajo: Streamlit ejecuta los
+# scripts como __main__ y sus funciones no se pueden serializar directamente.
+MOTORES = {
+    'ga': 'horario_generator:generar_mejor_horario',
+    'datelive': 'datelive:generar_horario',
+}
+
+# Carpeta donde se guardan los resultados terminados
+DIRECTORIO_RESULTADOS = 'trabajos'
+
+# Límites de los trabajos terminados que se conservan (en memoria y en disco):
+# se descartan los de más de MAX_EDAD_TRABAJOS segundos y, de los demás, los más
+# viejos por encima de MAX_TRABAJOS_TERMINADOS
+MAX_EDAD_TRABAJOS = 24 * 3600
+MAX_TRABAJOS_TERMINADOS = 50
+
+# Cada cuánto se revisa si un trabajo fue cancelado mientras CP-SAT resuelve
+INTERVALO_CANCELACION = 0.5
+
+
+# Error que lanza una función de generación cuando su trabajo fue cancelado
+class TrabajoCancelado(Exception):
+    pass
+
+
+# Canal de progreso y cancelación entre la interfaz y el proceso de trabajo
+# Sin diccionarios compartidos (ejecución directa) reportar no hace nada y
+# cancelado siempre es False, así las funciones sirven igual fuera de la cola.
+class Progreso:
+    def __init__(self, id_trabajo=None, avances=None, cancelaciones=None):
+        self.id_trabajo = id_trabajo
+        self.avances = avances
+        self.cancelaciones = cancelaciones
+
+    def reportar(self, **datos):
+        if self.avances is not None:
+            self.avances[self.id_trabajo] = dict(datos, actualizado=time.time())
+
+    def cancelado(self):
+        return self.cancelaciones is not None and self.cancelaciones.get(self.id_trabajo, False)
+
+    def verificar(self):
+        if self.cancelado():
+            raise TrabajoCancelado(self.id_trabajo)
+
+
+# Callback de CP-SAT que reporta cada solución mejorada (objetivo y cota)
+class ProgresoSolver(cp_model.CpSolverSolutionCallback):
+    def __init__(self, progreso):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.progreso = progreso
+        self.soluciones = 0
+
+    def on_solution_callback(self):
+        self.soluciones += 1
+        self.progreso.reportar(etapa='resolviendo', soluciones=self.soluciones,
+                               objetivo=self.ObjectiveValue(), cota=self.BestObjectiveBound(),
+                               tiempo=self.WallTime())
+
+
+# Función para resolver un modelo CP-SAT reportando progreso y atendiendo cancelaciones
+# Un hilo vigila la cancelación y detiene la búsqueda; CP-SAT devuelve entonces la
+# mejor solución encontrada hasta el momento (FEASIBLE) o UNKNOWN. Se puede pasar
+# un callback propio (subclase de ProgresoSolver) para guardar las soluciones.
+def resolver_con_progreso(solver, model, progreso, callback=None):
+    terminado = threading.Event()
+
+    def vigilar():
+        while not terminado.wait(INTERVALO_CANCELACION):
+            if progreso.cancelado():
+                solver.StopSearch()
+                return
+
+    vigilante = threading.Thread(target=vigilar, daemon=True)
+    vigilante.start()
+    try:
+        status = solver.Solve(model, callback or ProgresoSolver(progreso))
+    finally:
+        terminado.set()
+        vigilante.join()
+    progreso.verificar()
+    return status
+
+
+# Función que corre dentro del proceso de trabajo
+def _ejecutar(motor, id_trabajo, avances, cancelaciones, directorio, args, kwargs):
+    modulo, nombre = MOTORES[motor].split(':')
+    funcion = getattr(importlib.import_module(modulo), nombre)
+    progreso = Progreso(id_trabajo, avances, cancelaciones)
+    progreso.verificar()
+    progreso.reportar(etapa='iniciando')
+    resultado = funcion(*args, progreso=progreso, **kwargs)
+    if directorio:
+        with open(os.path.join(directorio, f'{id_trabajo}.pkl'), 'wb') as archivo:
+            pickle.dump(resultado, archivo)
+    return resultado
+
+
+# Cola local de trabajos de generación sobre un pool de procesos
+# La concurrencia se limita al número de núcleos; los trabajos de más esperan en cola.
+# Los resultados terminados quedan en memoria y en disco para consultarlos después,
+# hasta que limpiar (llamado en cada envío) los descarta por edad o cantidad.
+class GestorTrabajos:
+    def __init__(self, max_workers=None, directorio=DIRECTORIO_RESULTADOS):
+        contexto = multiprocessing.get_context('spawn')
+        self.max_workers = max_workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=contexto)
+        self.manager = contexto.Manager()
+        self.avances = self.manager.dict()
+        self.cancelaciones = self.manager.dict()
+        self.directorio = directorio
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.trabajos = {}
+        self.lock = threading.Lock()
+
+    # Envía un trabajo y devuelve su id; `etiqueta` (p. ej. (motor, huella)) permite
+    # encontrarlo desde otra sesión y no lanzar dos veces el mismo cálculo
+    def enviar(self, motor, *args, etiqueta=None, **kwargs):
+        self.limpiar()
+        with self.lock:
+            if etiqueta is not None:
+                existente = self.buscar(etiqueta)
+                if existente is not None and self.estado(existente)['estado'] in ('en_cola', 'ejecutando', 'terminado'):
+                    return existente
+            id_trabajo = uuid.uuid4().hex[:12]
+            future = self.executor.submit(_ejecutar, motor, id_trabajo, self.avances, self.cancelaciones,
+                                          self.directorio, args, kwargs)
+            self.trabajos[id_trabajo] = {'motor': motor, 'etiqueta': etiqueta, 'future': future,
+                                         'enviado': time.time(), 'terminado': None}
+            future.add_done_callback(lambda _, t=self.trabajos[id_trabajo]: t.update(terminado=time.time()))
+            return id_trabajo
+
+    # Descarta los trabajos terminados viejos o que sobran, de memoria y de disco
+    # Los que siguen en cola o ejecutándose no se tocan. Devuelve cuántos se borraron.
+    def limpiar(self, max_edad=MAX_EDAD_TRABAJOS, max_terminados=MAX_TRABAJOS_TERMINADOS):
+        limite = time.time() - max_edad
+        with self.lock:
+            terminados = sorted((t['terminado'], i) for i, t in self.trabajos.items()
+                                if t['future'].done() and t['terminado'] is not None)
+            sobran = len(terminados) - max_terminados
+            borrar = [i for n, (fin, i) in enumerate(terminados) if fin < limite or n < sobran]
+            for id_trabajo in borrar:
+                del self.trabajos[id_trabajo]
+                self.avances.pop(id_trabajo, None)
+                self.cancelaciones.pop(id_trabajo, None)
+                self._borrar_archivo(self._ruta(id_trabajo))
+
+            # Archivos de resultados sin trabajo en memoria (p. ej. de un servidor anterior)
+            if not self.directorio or not os.path.isdir(self.directorio):
+                return len(borrar)
+            archivos = []
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith('.pkl') and nombre[:-len('.pkl')] not in self.trabajos:
+                    ruta = os.path.join(self.directorio, nombre)
+                    try:
+                        archivos.append((os.path.getmtime(ruta), ruta))
+                    except FileNotFoundError:
+                        pass
+            archivos.sort()
+            sobran = len(archivos) + len(terminados) - len(borrar) - max_terminados
+            viejos = [ruta for n, (fecha, ruta) in enumerate(archivos) if fecha < limite or n < sobran]
+            for ruta in viejos:
+                self._borrar_archivo(ruta)
+            return len(borrar) + len(viejos)
+
+    def _borrar_archivo(self, ruta):
+        if ruta:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    # Devuelve el último trabajo con esa etiqueta, o None
+    def buscar(self, etiqueta):
+        candidatos = [i for i, t in self.trabajos.items() if t['etiqueta'] == etiqueta]
+        return max(candidatos, key=lambda i: self.trabajos[i]['enviado']) if candidatos else None
+
+    def estado(self, id_trabajo):
+        trabajo = self.trabajos.get(id_trabajo)
+        if trabajo is None:
+            ruta = self._ruta(id_trabajo)
+            return {'estado': 'terminado' if ruta and os.path.exists(ruta) else 'desconocido', 'progreso': {}}
+
+        future = trabajo['future']
+        avance = dict(self.avances.get(id_trabajo, {}))
+        if future.cancelled():
+            estado = 'cancelado'
+        elif not future.done():
+            estado = 'ejecutando' if avance else 'en_cola'
+        elif isinstance(future.exception(), TrabajoCancelado):
+            estado = 'cancelado'
+        elif future.exception() is not None:
+            estado = 'error'
+        else:
+            estado = 'terminado'
+
+        fin = trabajo['terminado'] or time.time()
+        info = {'estado': estado, 'motor': trabajo['motor'], 'progreso': avance,
+                'duracion': fin - trabajo['enviado']}
+        if estado == 'error':
+            info['error'] = str(future.exception())
+        return info
+
+    # Pide cancelar un trabajo: si sigue en cola no llega a ejecutarse y si ya
+    # corre, la función de generación se detiene en su siguiente punto de control
+    def cancelar(self, id_trabajo):
+        trabajo = self.trabajos.get(id_trabajo)
+        if trabajo is None or trabajo['future'].done():
+            return False
+        self.cancelaciones[id_trabajo] = True
+        trabajo['future'].cancel()
+        return True
+
+    # Devuelve el resultado de un trabajo terminado (de memoria o de disco), o None
+    def resultado(self, id_trabajo):
+        trabajo = self.trabajos.get(id_trabajo)
+        if trabajo is not None and trabajo['future'].done() and not trabajo['future'].cancelled() \
+                and trabajo['future'].exception() is None:
+            return trabajo['future'].result()
+        ruta = self._ruta(id_trabajo)
+        if ruta and os.path.exists(ruta):
+            with open(ruta, 'rb') as archivo:
+                return pickle.load(archivo)
+        return None
+
+    def listar(self):
+        return {id_trabajo: self.estado(id_trabajo) for id_trabajo in list(self.trabajos)}
+
+    def cerrar(self):
+        for id_trabajo in list(self.trabajos):
+            self.cancelar(id_trabajo)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.manager.shutdown()
+
+    def _ruta(self, id_trabajo):
+        return os.path.join(self.directorio, f'{id_trabajo}.pkl') if self.directorio else None
+
+
+# Gestor único para todo el servidor de Streamlit (compartido entre sesiones)
+@st.cache_resource
+def obtener_gestor():
+    return GestorTrabajos()
+
+
+# Función para enviar la generación de un motor como trabajo en segundo plano
+# Si ya hay un resultado en la sesión para estos datos no se envía nada.
+def enviar_trabajo(motor, huella, *args, **kwargs):
+    if obtener_resultado(motor, huella) is not None:
+        return None
+    id_trabajo = obtener_gestor().enviar(motor, *args, etiqueta=(motor, huella), **kwargs)
+    st.session_state.setdefault('trabajos', {})[(motor, huella)] = id_trabajo
+    return id_trabajo
+
+
+# Función para describir el progreso de un trabajo en una línea
+def texto_progreso(info):
+    avance = info['progreso']
+    if 'generacion' in avance:
+        return f"Generación {avance['generacion']} de {avance['total']} · mejor fitness {avance['mejor']:.1f}"
+    if 'objetivo' in avance:
+        return f"Soluciones: {avance['soluciones']} · mejor objetivo {avance['objetivo']:.0f} (cota {avance['cota']:.0f})"
+    return avance.get('etapa', 'En cola')
+
+
+# Función para seguir el trabajo de un motor desde la interfaz
+# Mientras corre muestra el progreso y un botón de cancelar, y vuelve a
+# ejecutar el script cada `intervalo` segundos. Al terminar guarda el resultado
+# en la sesión y lo devuelve como lo haría ejecutar_con_cache.
+def seguir_trabajo(motor, huella, intervalo=1.0):
+    existente = obtener_resultado(motor, huella)
+    if existente is not None:
+        return existente
+
+    gestor = obtener_gestor()
+    id_trabajo = st.session_state.get('trabajos', {}).get((motor, huella))
+    if id_trabajo is None:
+        # Trabajo lanzado desde otra sesión: solo se sigue si está vivo o terminado; uno
+        # cancelado o con error ya se informó y no debe repetirse en cada recarga
+        id_trabajo = gestor.buscar((motor, huella))
+        if id_trabajo is None or gestor.estado(id_trabajo)['estado'] not in ('en_cola', 'ejecutando', 'terminado'):
+            return None
+
+    info = gestor.estado(id_trabajo)
+    if info['estado'] == 'terminado':
+        st.session_state.get('trabajos', {}).pop((motor, huella), None)
+        return guardar_resultado(motor, huella, gestor.resultado(id_trabajo), duracion=info.get('duracion'))
+    if info['estado'] in ('cancelado', 'error', 'desconocido'):
+        st.session_state.get('trabajos', {}).pop((motor, huella), None)
+        if info['estado'] == 'error':
+            st.error(f"Error en el trabajo {id_trabajo}: {info['error']}")
+        elif info['estado'] == 'cancelado':
+            st.warning(f"El trabajo {id_trabajo} fue cancelado")
+        else:
+            st.error(f"No se encontró el trabajo {id_trabajo}")
+        return None
+
+    avance = info['progreso']
+    st.info(f"Trabajo {id_trabajo} ({info['estado']}, {info['duracion']:.0f} s): {texto_progreso(info)}")
+    if 'generacion' in avance:
+        st.progress(avance['generacion'] / max(avance['total'], 1))
+    if st.button('Cancelar generación', key=f'cancelar_{id_trabajo}'):
+        gestor.cancelar(id_trabajo)
+        st.rerun()
+    time.sleep(intervalo)
+    st.rerun()
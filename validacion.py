@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+from modelo_datos import horas_a_minutos
+from ingesta import minutos_a_hora
+from diagnostico import problema
+
+# Tipos de violación, en el orden en que se reportan
+TIPOS = {
+    'intervalo': 'clases terminan antes de empezar (o a la misma hora)',
+    'referencia': 'clases tienen profesor, materia o salón inexistente',
+    'profesor_doble': 'clases repiten profesor en la misma franja',
+    'profesor_solapado': 'clases se cruzan con otra del mismo profesor',
+    'salon_doble': 'clases repiten salón en la misma franja',
+    'salon_solapado': 'clases se cruzan con otra en el mismo salón',
+    'capacidad': 'clases tienen más alumnos que la capacidad del salón',
+    'sin_habilitacion': 'clases son de una materia que el profesor no tiene en profesor_materia',
+    'fuera_disponibilidad': 'clases caen fuera de la disponibilidad del profesor',
+}
+
+# Columnas del reporte: una fila por violación. `fila` y `otra_fila` son posiciones
+# (0..n-1) en el horario validado; -1 cuando no aplica.
+COLUMNAS_REPORTE = ['tipo', 'fila', 'otra_fila', 'recurso_id', 'dia_semana', 'hora_inicio', 'hora_fin', 'valor', 'limite']
+
+
+def _parte(tipo, filas, otras=None, recurso=None, valor=None, limite=None):
+    n = len(filas)
+    vacio = np.full(n, -1, dtype=np.int64)
+    return pd.DataFrame({
+        'tipo': np.full(n, tipo, dtype=object),
+        'fila': np.asarray(filas, dtype=np.int64),
+        'otra_fila': vacio if otras is None else np.asarray(otras, dtype=np.int64),
+        'recurso_id': vacio if recurso is None else np.asarray(recurso, dtype=np.int64),
+        'valor': vacio if valor is None else np.asarray(valor, dtype=np.int64),
+        'limite': vacio if limite is None else np.asarray(limite, dtype=np.int64),
+    })
+
+
+# Función para encontrar con un solo ordenamiento las clases que se cruzan con una
+# anterior del mismo grupo (recurso y día)
+# Tras ordenar por (grupo, inicio), una clase choca si empieza antes del mayor fin
+# visto en su grupo. Devuelve (filas, otras_filas, misma_franja).
+def _solapes(grupo, inicio, fin):
+    n = len(grupo)
+    if n < 2:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, np.zeros(0, dtype=bool)
+    orden = np.lexsort((inicio, grupo))
+    g = grupo[orden].astype(np.int64)
+    a = inicio[orden].astype(np.int64)
+    b = fin[orden].astype(np.int64)
+    base = int(b.max()) + 1
+
+    # Mayor fin acumulado por grupo y posición (ordenada) de la clase que lo tiene;
+    # los grupos crecen en el orden, así que basta un máximo acumulado global
+    clave = (g * base + b) * n + np.arange(n)
+    previo = np.empty(n, dtype=np.int64)
+    previo[0] = -1
+    previo[1:] = np.maximum.accumulate(clave)[:-1]
+    mismo_grupo = (previo >= 0) & (previo // (base * n) == g)
+    choca = mismo_grupo & (a < (previo // n) % base)
+    otra = previo % n
+
+    # Si la clase inmediatamente anterior empieza a la misma hora es la misma franja
+    misma_franja = np.zeros(n, dtype=bool)
+    misma_franja[1:] = (g[1:] == g[:-1]) & (a[1:] == a[:-1])
+    otra = np.where(misma_franja, np.arange(n) - 1, otra)
+    choca |= misma_franja
+
+    return orden[choca], orden[otra[choca]], misma_franja[choca]
+
+
+# Función para unir los intervalos de disponibilidad contiguos o solapados de cada grupo
+# Devuelve las claves (grupo * base + inicio) ordenadas de cada bloque unido y su fin.
+def _cubrimiento(grupo, inicio, fin, base):
+    orden = np.lexsort((inicio, grupo))
+    g = grupo[orden].astype(np.int64)
+    a = inicio[orden].astype(np.int64)
+    b = fin[orden].astype(np.int64)
+    if len(g) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    acumulado = np.maximum.accumulate(g * base + b)
+    nuevo = np.ones(len(g), dtype=bool)
+    nuevo[1:] = (g[1:] != g[:-1]) | (a[1:] > acumulado[:-1] - g[1:] * base)
+    inicios = np.flatnonzero(nuevo)
+    return g[inicios] * base + a[inicios], np.maximum.reduceat(b, inicios)
+
+
+# Función para validar cualquier horario (DataFrame con dia_semana, hora_inicio,
+# hora_fin, profesor_id, salon_id y, opcionalmente, materia_id y alumnos)
+# Los choques de profesor y salón se detectan solo con el horario; capacidad,
+# habilitación y disponibilidad necesitan la Instancia. Todo es O(n log n).
+def validar_horario(horario_df, instancia=None):
+    horario_df = pd.DataFrame(horario_df)
+    if len(horario_df) == 0:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+
+    filas = np.arange(len(horario_df))
+    dia_texto = horario_df['dia_semana'].astype(str).str.lower().to_numpy()
+    inicio = horas_a_minutos(horario_df['hora_inicio']).astype(np.int64)
+    fin = horas_a_minutos(horario_df['hora_fin']).astype(np.int64)
+    profesor_id = horario_df['profesor_id'].to_numpy(dtype=np.int64)
+    salon_id = horario_df['salon_id'].to_numpy(dtype=np.int64)
+
+    dias = pd.Index(pd.unique(dia_texto))
+    if instancia is not None:
+        dias = dias.append(pd.Index([d.lower() for d in instancia.dias])).unique()
+    dia = dias.get_indexer(dia_texto).astype(np.int64)
+
+    partes = []
+    malas = fin <= inicio
+    partes.append(_parte('intervalo', filas[malas], valor=inicio[malas], limite=fin[malas]))
+
+    # Choques: grupo = (recurso, día)
+    for recurso, ids in (('profesor', profesor_id), ('salon', salon_id)):
+        codigos = pd.factorize(ids)[0].astype(np.int64)
+        una, otra, misma_franja = _solapes(codigos * len(dias) + dia, inicio, fin)
+        partes.append(_parte(f'{recurso}_doble', una[misma_franja], otra[misma_franja], ids[una[misma_franja]]))
+        partes.append(_parte(f'{recurso}_solapado', una[~misma_franja], otra[~misma_franja], ids[una[~misma_franja]]))
+
+    if instancia is not None:
+        profesor = instancia.codigos_profesor(profesor_id).astype(np.int64)
+        salon = instancia.codigos_salon(salon_id).astype(np.int64)
+        materia = (instancia.codigos_materia(horario_df['materia_id'].to_numpy(dtype=np.int64)).astype(np.int64)
+                   if 'materia_id' in horario_df else None)
+
+        inexistente = (profesor < 0) | (salon < 0) | (materia < 0 if materia is not None else False)
+        partes.append(_parte('referencia', filas[inexistente]))
+
+        # Capacidad: alumnos de la clase (o de la materia) frente al salón
+        con_salon = salon >= 0
+        if 'alumnos' in horario_df:
+            alumnos = horario_df['alumnos'].to_numpy(dtype=np.int64)
+        elif materia is not None:
+            alumnos = np.where(materia >= 0, instancia.materia_alumnos[np.maximum(materia, 0)], 0)
+        else:
+            alumnos = np.zeros(len(filas), dtype=np.int64)
+        capacidad = np.where(con_salon, instancia.salon_capacidad[np.maximum(salon, 0)], 0)
+        excedida = con_salon & (alumnos > capacidad)
+        partes.append(_parte('capacidad', filas[excedida], recurso=salon_id[excedida],
+                             valor=alumnos[excedida], limite=capacidad[excedida]))
+
+        # Habilitación: el par (profesor, materia) debe existir en profesor_materia
+        if materia is not None:
+            pares = np.unique(instancia.pm_profesor.astype(np.int64) * instancia.n_materias + instancia.pm_materia)
+            conocida = (profesor >= 0) & (materia >= 0)
+            habilitada = np.isin(profesor * instancia.n_materias + materia, pares)
+            sin_habilitacion = conocida & ~habilitada
+            partes.append(_parte('sin_habilitacion', filas[sin_habilitacion], recurso=profesor_id[sin_habilitacion]))
+
+        # Disponibilidad: la clase debe caber en un bloque continuo de disponibilidad
+        # del profesor ese día (los horarios de 45 minutos se unen en bloques)
+        base = int(max(fin.max(), instancia.disp_fin.max() if len(instancia.disp_fin) else 0)) + 1
+        disp_dia = dias.get_indexer(np.char.lower(np.asarray(instancia.dias, dtype=str))[instancia.disp_dia])
+        claves, fines = _cubrimiento(instancia.disp_profesor.astype(np.int64) * len(dias) + disp_dia,
+                                     instancia.disp_inicio, instancia.disp_fin, base)
+        grupo = profesor * len(dias) + dia
+        bloque = np.searchsorted(claves, grupo * base + inicio, side='right') - 1
+        cubierta = (bloque >= 0) & (claves[np.maximum(bloque, 0)] // base == grupo) & (fines[np.maximum(bloque, 0)] >= fin)
+        fuera = (profesor >= 0) & ~cubierta
+        partes.append(_parte('fuera_disponibilidad', filas[fuera], recurso=profesor_id[fuera]))
+
+    reporte = pd.concat(partes, ignore_index=True)
+    if len(reporte) == 0:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+    reporte['dia_semana'] = horario_df['dia_semana'].astype(str).to_numpy()[reporte['fila']]
+    reporte['hora_inicio'] = minutos_a_hora(inicio[reporte['fila']]).to_numpy()
+    reporte['hora_fin'] = minutos_a_hora(fin[reporte['fila']]).to_numpy()
+    orden_tipo = reporte['tipo'].map({tipo: i for i, tipo in enumerate(TIPOS)})
+    reporte = reporte.assign(_orden=orden_tipo).sort_values(['_orden', 'fila'], kind='stable')
+    return reporte[COLUMNAS_REPORTE].reset_index(drop=True)
+
+
+# Función para reparar un horario quitando las clases con violaciones
+# En cada choque se reporta la clase que se cruza con una anterior, así que al quitar
+# todas las filas reportadas (una sola pasada) el horario que queda es válido.
+def reparar_horario(horario_df, instancia=None):
+    horario_df = pd.DataFrame(horario_df)
+    reporte = validar_horario(horario_df, instancia)
+    quitar = np.zeros(len(horario_df), dtype=bool)
+    quitar[reporte['fila'].to_numpy(dtype=np.int64)] = True
+    return horario_df[~quitar].reset_index(drop=True)
+
+
+# Función para resumir el reporte en problemas (mismo formato que diagnostico.py)
+def resumen_violaciones(reporte):
+    problemas = []
+    for tipo, grupo in reporte.groupby('tipo', sort=False):
+        ejemplos = [f"fila {f}" if o < 0 else f"filas {f} y {o}" for f, o in zip(grupo['fila'], grupo['otra_fila'])]
+        problemas.append(problema('error', tipo, f"{len(grupo)} {TIPOS[tipo]}", ejemplos))
+    return problemas
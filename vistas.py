@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modelo_datos import DIAS, horas_a_minutos, tabla_desde_json
+from ingesta import minutos_a_hora
+from sesion import huella_datos
+
+# Vistas del horario: columna que identifica la entidad, título y qué se escribe en
+# cada celda de su grilla semanal
+TIPOS_VISTA = {
+    'profesor': {'columna': 'profesor_id', 'titulo': 'Profesor', 'celda': ('materia', 'salon')},
+    'salon': {'columna': 'salon_id', 'titulo': 'Salón', 'celda': ('materia', 'profesor')},
+    'materia': {'columna': 'materia_id', 'titulo': 'Materia', 'celda': ('profesor', 'salon')},
+    'grupo': {'columna': 'grupo', 'titulo': 'Grupo', 'celda': ('materia', 'profesor', 'salon')},
+}
+
+# Filas por página de la vista de tabla
+TAMANO_PAGINA = 100
+
+
+# Función para nombrar cada clase según una tabla de la API (id -> nombre)
+# Las clases cuyo id no está en la tabla quedan con "<título> <id>".
+def _nombres(ids, nombres, titulo):
+    ids = pd.Series(ids)
+    etiquetas = ids.map(nombres) if nombres is not None else pd.Series(np.nan, index=ids.index, dtype=object)
+    faltantes = etiquetas.isna()
+    etiquetas[faltantes] = titulo + ' ' + ids[faltantes].astype(str)
+    return etiquetas.astype(str).to_numpy(dtype=object)
+
+
+# Función para armar los nombres (id -> nombre) de profesores, materias y salones
+# Se usan las tablas de la API si vienen; si no, la Instancia (cédula, nombre de
+# materia y código de salón) o las columnas que ya traiga el horario.
+def nombres_entidades(horario, profesores=None, materias=None, salones=None, instancia=None):
+    nombres = {}
+    for tipo, endpoint, tabla, columna in (('profesor', 'profesores', profesores, 'nombre'),
+                                           ('materia', 'materias', materias, 'nombre'),
+                                           ('salon', 'salones', salones, 'codigo')):
+        if tabla is not None:
+            tabla = tabla_desde_json(endpoint, tabla)
+            nombres[tipo] = pd.Series(tabla[columna].astype(str).to_numpy(), index=tabla['id'].to_numpy())
+    if instancia is not None:
+        nombres.setdefault('profesor', pd.Series(instancia.profesor_cedulas, index=instancia.profesor_ids).astype(str))
+        nombres.setdefault('materia', pd.Series(instancia.materia_nombres, index=instancia.materia_ids))
+        nombres.setdefault('salon', pd.Series(instancia.salon_codigos, index=instancia.salon_ids))
+    for tipo, columna in (('profesor', 'profesor_cedula'), ('materia', 'materia_nombre'), ('salon', 'salon_codigo')):
+        if tipo not in nombres and columna in horario:
+            nombres[tipo] = pd.Series(horario[columna].astype(str).to_numpy(),
+                                      index=horario[TIPOS_VISTA[tipo]['columna']].to_numpy())
+            nombres[tipo] = nombres[tipo][~nombres[tipo].index.duplicated()]
+    return nombres
+
+
+# Horario preparado para verlo por entidad
+# Al crearla se calculan una sola vez, con arreglos, la franja y el día de cada
+# clase y sus etiquetas; la grilla (franjas x días) de cada entidad se arma al
+# pedirla, recorriendo solo sus clases, y queda guardada para los siguientes reruns.
+class VistaHorario:
+    def __init__(self, horario, nombres):
+        horario = pd.DataFrame(horario).reset_index(drop=True)
+        self.n = len(horario)
+        inicio = horas_a_minutos(horario['hora_inicio']).astype(np.int32) if self.n else np.zeros(0, dtype=np.int32)
+        fin = horas_a_minutos(horario['hora_fin']).astype(np.int32) if self.n else np.zeros(0, dtype=np.int32)
+
+        # Franjas: pares (inicio, fin) distintos, en orden de hora
+        pares, franja = np.unique(inicio * 1440 + fin, return_inverse=True)
+        self.franjas = [f"{minutos_a_hora(par // 1440)}-{minutos_a_hora(par % 1440)}" for par in pares]
+
+        # Días en el orden de DIAS sin distinguir mayúsculas; los demás al final
+        canonicos = {dia.lower(): dia for dia in DIAS}
+        texto = horario['dia_semana'].astype(str).str.strip() if self.n else pd.Series(dtype=str)
+        texto = texto.str.lower().map(canonicos).fillna(texto)
+        presentes = pd.unique(texto)
+        self.dias = [d for d in DIAS if d in set(presentes)] + sorted(set(presentes) - set(DIAS))
+        dia = pd.Index(self.dias).get_indexer(texto)
+
+        self.celda = franja.astype(np.int64) * len(self.dias) + dia
+        self.franja = franja
+        self.dia = dia
+        self.ids = {}
+        self.etiquetas = {}
+        for tipo, vista in TIPOS_VISTA.items():
+            if vista['columna'] in horario:
+                self.ids[tipo] = horario[vista['columna']].to_numpy()
+                self.etiquetas[tipo] = (self.ids[tipo].astype(str).astype(object) if tipo == 'grupo'
+                                        else _nombres(self.ids[tipo], nombres.get(tipo), vista['titulo']))
+        self._indices = {}
+        self._grillas = {}
+        self._orden_tabla = None
+
+    # Tipos de vista que admite este horario
+    def tipos(self):
+        return list(self.ids)
+
+    # Posiciones de las clases ordenadas por entidad y dónde empieza cada una
+    def _indice(self, tipo):
+        if tipo not in self._indices:
+            orden = np.argsort(self.ids[tipo], kind='stable')
+            unicos, inicios = np.unique(self.ids[tipo][orden], return_index=True)
+            self._indices[tipo] = (orden, unicos, np.append(inicios, self.n))
+        return self._indices[tipo]
+
+    # Entidades del tipo con clases en el horario (id -> etiqueta), en orden de etiqueta
+    def entidades(self, tipo):
+        orden, unicos, inicios = self._indice(tipo)
+        etiquetas = self.etiquetas[tipo][orden[inicios[:-1]]]
+        return pd.Series(etiquetas, index=unicos).sort_values(kind='stable')
+
+    # Grilla semanal (franjas x días) de una entidad; las clases de una misma celda
+    # (choques) se muestran juntas, una por línea
+    def grilla(self, tipo, entidad):
+        if (tipo, entidad) not in self._grillas:
+            orden, unicos, inicios = self._indice(tipo)
+            posicion = np.searchsorted(unicos, entidad)
+            if posicion < len(unicos) and unicos[posicion] == entidad:
+                filas = orden[inicios[posicion]:inicios[posicion + 1]]
+            else:
+                filas = np.zeros(0, dtype=np.int64)
+            textos = pd.Series(self.etiquetas[TIPOS_VISTA[tipo]['celda'][0]][filas])
+            for otro in TIPOS_VISTA[tipo]['celda'][1:]:
+                if otro in self.etiquetas:
+                    textos = textos + '\n' + self.etiquetas[otro][filas]
+            por_celda = textos.groupby(self.celda[filas]).agg('\n'.join)
+            valores = np.full(len(self.franjas) * len(self.dias), '', dtype=object)
+            valores[por_celda.index.to_numpy()] = por_celda.to_numpy()
+            self._grillas[(tipo, entidad)] = pd.DataFrame(valores.reshape(len(self.franjas), len(self.dias)),
+                                                          index=self.franjas, columns=self.dias)
+        return self._grillas[(tipo, entidad)]
+
+    # Una página de la tabla de clases (ordenada por día y franja), con nombres
+    def pagina(self, numero, tamano=TAMANO_PAGINA):
+        if self._orden_tabla is None:
+            self._orden_tabla = np.lexsort((self.franja, self.dia))
+        filas = self._orden_tabla[(numero - 1) * tamano:numero * tamano]
+        tabla = pd.DataFrame({'Día': np.asarray(self.dias, dtype=object)[self.dia[filas]],
+                              'Franja': np.asarray(self.franjas, dtype=object)[self.franja[filas]]})
+        for tipo in self.etiquetas:
+            tabla[TIPOS_VISTA[tipo]['titulo']] = self.etiquetas[tipo][filas]
+        return tabla
+
+
+# Función para preparar la vista de un horario (DataFrame o lista de dicts)
+def crear_vista_horario(horario, profesores=None, materias=None, salones=None, instancia=None):
+    horario = pd.DataFrame(horario)
+    return VistaHorario(horario, nombres_entidades(horario, profesores, materias, salones, instancia))
+
+
+# Función para mostrar un horario por entidad en Streamlit
+# Solo se arma y se dibuja la grilla de la entidad elegida, o una página de la
+# tabla; la vista queda en la sesión mientras el horario no cambie.
+def mostrar_vista_horario(horario, profesores=None, materias=None, salones=None, instancia=None, clave='vista'):
+    huella = huella_datos(horario)
+    guardada = st.session_state.setdefault('vistas', {}).get(clave)
+    if guardada is None or guardada[0] != huella:
+        guardada = st.session_state['vistas'][clave] = (huella, crear_vista_horario(horario, profesores, materias, salones, instancia))
+    vista = guardada[1]
+
+    if vista.n == 0:
+        st.info('El horario no tiene clases')
+        return
+
+    tipos = vista.tipos() + ['tabla']
+    tipo = st.radio('Ver horario por', tipos, horizontal=True, key=f'{clave}_tipo',
+                    format_func=lambda t: TIPOS_VISTA[t]['titulo'] if t in TIPOS_VISTA else 'Tabla completa')
+    if tipo == 'tabla':
+        paginas = -(-vista.n // TAMANO_PAGINA)
+        pagina = int(st.number_input(f'Página (de {paginas})', min_value=1, max_value=paginas, value=1, step=1,
+                                     key=f'{clave}_pagina_{huella}'))
+        st.caption(f"Clases {(pagina - 1) * TAMANO_PAGINA + 1}-{min(pagina * TAMANO_PAGINA, vista.n)} de {vista.n:,}")
+        st.dataframe(vista.pagina(pagina), hide_index=True)
+        return
+
+    entidades = vista.entidades(tipo)
+    entidad = st.selectbox(TIPOS_VISTA[tipo]['titulo'], entidades.index, key=f'{clave}_{tipo}',
+                           format_func=lambda e: f"{entidades[e]} ({e})" if tipo != 'grupo' else e)
+    grilla = vista.grilla(tipo, entidad)
+    st.dataframe(grilla.style.set_properties(**{'white-space': 'pre-wrap'}))